@@ -0,0 +1,226 @@
+"""
+Load test: async routers (AsyncSession + aiosqlite) vs. the previous sync stack.
+
+Both stacks are served by uvicorn in a subprocess against the same seeded
+SQLite file and hit with the same mix of authenticated GET requests:
+/parking/all?limit=50, /parking/{id} and /user/get. The sync stack replicates
+the pre-async code: `def` routes on the threadpool with a blocking Session and
+an `async def` get_current_user doing blocking lookups on the event loop.
+
+Past ~15 concurrent requests the sync stack stalls: get_current_user blocks
+the event loop waiting for a pooled connection while the connections are held
+by requests that need the event loop to finish. Each stall lasts until the
+30s pool timeout, so high --concurrency runs take very long with the sync
+stack; the async stack waits for connections without blocking.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_async_load.py
+    PYTHONPATH=src python benchmarks/bench_async_load.py --stacks async --requests 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+LOTS = 500
+
+
+def seed(db_dir: str) -> str:
+    """Create the benchmark database and return a bearer token."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+
+    from app import auth, geo
+    from app.migrations import run_migrations
+    from models import Base
+    from models.parking import Parking
+    from models.user import User
+
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'chari-spot.db')}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    rng = random.Random(7)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(User), [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}])
+        rows = []
+        for i in range(LOTS):
+            lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+            rows.append({
+                "name": f"lot-{i}", "address": "benchmark", "latitude": lat, "longitude": lon,
+                "total_slots": 10, "avail_slots": 5, "owner_id": 1, "geohash": geo.geohash_encode(lat, lon),
+            })
+        db.execute(insert(Parking), rows)
+        db.commit()
+    engine.dispose()
+    return auth.create_access_token({"user_id": 1})
+
+
+def build_sync_app():
+    """The routes under test as they were before the async database layer."""
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from jose import jwt
+    from sqlalchemy.orm import Session
+
+    from app import auth
+    from app.database import get_db
+    from crud import parking as parking_crud
+    from crud import user as user_crud
+    from schemas.parking import ParkingResponse
+
+    async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        user = user_crud.get_user(db, payload.get("user_id"))
+        if not user:
+            raise HTTPException(status_code=401)
+        return user
+
+    app = FastAPI()
+
+    @app.get("/api/hello")
+    def hello():
+        return {"message": "Hello from FastAPI!"}
+
+    @app.get("/parking/all")
+    def get_all(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        parkings = parking_crud.get_parkings(db, skip=skip, limit=limit)
+        return JSONResponse(content=jsonable_encoder([ParkingResponse.model_validate(p) for p in parkings]))
+
+    @app.get("/parking/{parking_id}")
+    def get_one(parking_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return JSONResponse(content=jsonable_encoder(
+            ParkingResponse.model_validate(parking_crud.get_parking(db, parking_id))
+        ))
+
+    @app.get("/user/get")
+    def get_user(db: Session = Depends(get_db), user=Depends(get_current_user)):
+        user_obj = user_crud.get_user(db, user.id)
+        return JSONResponse(content={"id": user_obj.id, "username": user_obj.username, "email": user_obj.email})
+
+    return app
+
+
+def serve(stack: str, port: int) -> None:
+    import uvicorn
+
+    if stack == "sync":
+        app = build_sync_app()
+    else:
+        from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            try:
+                if (await client.get(f"{base_url}/api/hello")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+async def load(
+    base_url: str, token: str, requests: int, concurrency: int, timeout: float
+) -> tuple[float, list[float], int]:
+    rng = random.Random(11)
+    paths = []
+    for i in range(requests):
+        kind = i % 3
+        if kind == 0:
+            paths.append("/parking/all?limit=50")
+        elif kind == 1:
+            paths.append(f"/parking/{rng.randint(1, LOTS)}")
+        else:
+            paths.append("/user/get")
+    latencies: list[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={"Authorization": f"Bearer {token}"}, limits=limits, timeout=timeout
+    ) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors
+
+
+def run_stack(stack: str, db_dir: str, token: str, requests: int, concurrency: int, timeout: float) -> None:
+    port = free_port()
+    # The server runs inside db_dir, so make a relative PYTHONPATH absolute.
+    pythonpath = os.pathsep.join(os.path.abspath(p) for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", stack, "--port", str(port)],
+        cwd=db_dir, stdout=subprocess.DEVNULL, env={**os.environ, "PYTHONPATH": pythonpath},
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url))
+        asyncio.run(load(base_url, token, min(requests, 200), concurrency, timeout))  # warm-up
+        elapsed, latencies, errors = asyncio.run(load(base_url, token, requests, concurrency, timeout))
+    finally:
+        proc.terminate()
+        proc.wait()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{stack:>5} stack | {requests / elapsed:8.1f} req/s | p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | errors {errors}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--stacks", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--serve", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        token = seed(db_dir)
+        print(f"{args.requests} requests, concurrency {args.concurrency}, {LOTS} lots")
+        for stack in args.stacks:
+            run_stack(stack, db_dir, token, args.requests, args.concurrency, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: authenticated requests with and without the token-claims cache.
+
+Sends the same stream of authenticated GET /user/get and /parking/{id}
+requests through the TestClient twice, once with app.auth.principal_cache
+disabled (every request decodes the JWT and loads the user) and once with it
+enabled, using a small pool of users and tokens. Reports request latency and
+the cache's own hit ratio and saved lookup time (as served by /api/stats).
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_auth_cache.py
+    PYTHONPATH=src python benchmarks/bench_auth_cache.py --requests 20000 --users 50
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+
+def seed(session_factory, users: int) -> None:
+    from app import geo
+    from models.parking import Parking
+    from models.user import User
+
+    with session_factory() as db:
+        db.execute(insert(User), [
+            {"id": i, "username": f"user-{i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(1, users + 1)
+        ])
+        db.execute(insert(Parking), [
+            {
+                "id": i, "name": f"lot-{i}", "address": "benchmark", "latitude": 35.6, "longitude": 139.7,
+                "total_slots": 8, "avail_slots": 8, "owner_id": 1, "geohash": geo.geohash_encode(35.6, 139.7),
+            }
+            for i in range(1, 101)
+        ])
+        db.commit()
+
+
+def run(client, tokens: list[str], requests: int) -> list[float]:
+    rng = random.Random(9)
+    latencies = []
+    for i in range(requests):
+        path = "/user/get" if i % 2 else f"/parking/{rng.randint(1, 100)}"
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database opens ./chari-spot.db, so import the app from inside tmp.
+        os.chdir(tmp)
+        from fastapi.testclient import TestClient
+
+        from app import auth
+        from app.database import SessionLocal
+        from app.main import app
+
+        seed(SessionLocal, args.users)
+        tokens = [auth.create_access_token({"user_id": i}) for i in range(1, args.users + 1)]
+        ttl = auth.principal_cache.ttl
+
+        with TestClient(app) as client:
+            for label, cache_ttl in (("no cache", 0), ("cache", ttl)):
+                auth.principal_cache.ttl = cache_ttl
+                auth.principal_cache.clear()
+                auth.principal_cache.stats = type(auth.principal_cache.stats)()
+                run(client, tokens, min(args.requests, 500))  # warm-up
+                latencies = sorted(run(client, tokens, args.requests))
+                p50 = statistics.median(latencies) * 1000
+                p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+                stats = client.get("/api/stats").json()["auth_cache"]
+                print(
+                    f"{label:>8} | {args.requests / sum(latencies):7.1f} req/s | p50 {p50:6.2f} ms | "
+                    f"p99 {p99:6.2f} ms | hit ratio {stats['hit_ratio']:.3f} | "
+                    f"user lookup {stats['avg_load_ms']:.3f} ms | saved {stats['saved_ms']:.0f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
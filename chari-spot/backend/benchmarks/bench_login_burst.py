@@ -0,0 +1,174 @@
+"""
+Benchmark: map request latency during a burst of logins.
+
+Serves the app with uvicorn in a subprocess and fires --logins concurrent
+POST /user/login requests while a second client keeps requesting
+GET /parking/all?limit=50. Map latency is reported before and during the
+burst for two stacks: "blocking" replicates the previous code, where bcrypt
+ran on the event loop inside authenticate_user, and "pool" is the current
+code with the hashing executor (app.auth.hash_executor). Logins rejected by
+the queue limit (CHARI_SPOT_HASH_QUEUE_LIMIT) are counted as 503s.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_login_burst.py
+    CHARI_SPOT_HASH_WORKERS=4 PYTHONPATH=src python benchmarks/bench_login_burst.py --logins 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+LOTS = 500
+PASSWORD = "benchmark-password"
+
+
+def seed(db_dir: str) -> str:
+    """Create the benchmark database and return a bearer token."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+
+    from app import auth, geo
+    from app.migrations import run_migrations
+    from models import Base
+    from models.parking import Parking
+    from models.user import User
+
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'chari-spot.db')}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    rng = random.Random(7)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(User), [{
+            "id": 1, "username": "bench", "email": "bench@example.com",
+            "password": auth.get_password_hash(PASSWORD),
+        }])
+        rows = []
+        for i in range(LOTS):
+            lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+            rows.append({
+                "name": f"lot-{i}", "address": "benchmark", "latitude": lat, "longitude": lon,
+                "total_slots": 10, "avail_slots": 5, "owner_id": 1, "geohash": geo.geohash_encode(lat, lon),
+            })
+        db.execute(insert(Parking), rows)
+        db.commit()
+    engine.dispose()
+    return auth.create_access_token({"user_id": 1})
+
+
+def serve(stack: str, port: int) -> None:
+    import uvicorn
+
+    from app import auth
+    from app.main import app
+
+    if stack == "blocking":
+        async def verify_on_event_loop(plain_password: str, hashed_password: str) -> bool:
+            return auth.verify_password(plain_password, hashed_password)
+
+        auth.verify_password_async = verify_on_event_loop
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            try:
+                if (await client.get(f"{base_url}/api/hello")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+async def map_requests(client: httpx.AsyncClient, token: str, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/parking/all?limit=50", headers={"Authorization": f"Bearer {token}"})
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+async def measure(base_url: str, token: str, logins: int, idle_seconds: float) -> None:
+    limits = httpx.Limits(max_connections=logins + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        stop = asyncio.Event()
+        idle = asyncio.create_task(map_requests(client, token, stop))
+        await asyncio.sleep(idle_seconds)
+        stop.set()
+        idle_latencies = await idle
+
+        stop = asyncio.Event()
+        busy = asyncio.create_task(map_requests(client, token, stop))
+        form = {"username": "bench@example.com", "password": PASSWORD}
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/user/login", data=form) for _ in range(logins)))
+        burst_seconds = time.perf_counter() - started
+        stop.set()
+        busy_latencies = await busy
+
+    codes = [r.status_code for r in responses]
+    for label, values in (("idle", idle_latencies), ("burst", busy_latencies)):
+        values = sorted(values)
+        p50 = statistics.median(values) * 1000
+        p99 = values[max(0, int(len(values) * 0.99) - 1)] * 1000
+        print(f"    map {label:>5} | {len(values):5d} requests | p50 {p50:8.1f} ms | p99 {p99:8.1f} ms | max {values[-1] * 1000:8.1f} ms")
+    print(f"    logins      | {codes.count(200)} ok, {codes.count(503)} rejected (503) in {burst_seconds:.1f} s")
+
+
+def run_stack(stack: str, db_dir: str, token: str, logins: int, idle_seconds: float) -> None:
+    port = free_port()
+    # The server runs inside db_dir, so make a relative PYTHONPATH absolute.
+    pythonpath = os.pathsep.join(os.path.abspath(p) for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", stack, "--port", str(port)],
+        cwd=db_dir, stdout=subprocess.DEVNULL, env={**os.environ, "PYTHONPATH": pythonpath},
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url))
+        print(f"{stack} stack")
+        asyncio.run(measure(base_url, token, logins, idle_seconds))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--stacks", nargs="+", choices=["blocking", "pool"], default=["blocking", "pool"])
+    parser.add_argument("--serve", choices=["blocking", "pool"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        token = seed(db_dir)
+        print(f"{args.logins} concurrent logins, {LOTS} lots")
+        for stack in args.stacks:
+            run_stack(stack, db_dir, token, args.logins, args.idle_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: geohash-indexed nearby search vs. a full-table scan.
+
+The full scan mirrors what the map did before /parking/nearby existed:
+load every lot and filter by haversine distance on the client.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_nearby_search.py
+    PYTHONPATH=src python benchmarks/bench_nearby_search.py --sizes 10000 100000 --radius 2
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import geo
+from crud import parking as crud
+from models import Base
+from models.parking import Parking
+from models.user import User
+
+# Lots are spread over mainland Japan.
+LAT_RANGE = (31.0, 43.0)
+LON_RANGE = (130.0, 145.0)
+
+
+def populate(session_factory, size: int, rng: random.Random) -> None:
+    with session_factory() as db:
+        db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+        batch = []
+        for i in range(size):
+            lat = rng.uniform(*LAT_RANGE)
+            lon = rng.uniform(*LON_RANGE)
+            batch.append({
+                "name": f"lot-{i}",
+                "address": "benchmark",
+                "latitude": lat,
+                "longitude": lon,
+                "total_slots": 10,
+                "avail_slots": 5,
+                "owner_id": 1,
+                "geohash": geo.geohash_encode(lat, lon),
+            })
+            if len(batch) == 50_000:
+                db.execute(insert(Parking), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(Parking), batch)
+        db.commit()
+
+
+def full_scan(db, lat: float, lon: float, radius_km: float):
+    hits = []
+    for p in db.query(Parking).all():
+        distance = geo.haversine_km(lat, lon, p.latitude, p.longitude)
+        if distance <= radius_km:
+            hits.append((p, distance))
+    hits.sort(key=lambda hit: hit[1])
+    return hits
+
+
+def time_queries(session_factory, fn, points, radius_km: float) -> tuple[list[float], list[list[int]]]:
+    timings, ids = [], []
+    for lat, lon in points:
+        with session_factory() as db:
+            start = time.perf_counter()
+            hits = fn(db, lat, lon, radius_km)
+            timings.append(time.perf_counter() - start)
+            ids.append([p.id for p, _ in hits])
+    return timings, ids
+
+
+def run(size: int, queries: int, scan_queries: int, radius_km: float, seed: int) -> None:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+
+        start = time.perf_counter()
+        populate(session_factory, size, rng)
+        load_s = time.perf_counter() - start
+
+        points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(queries)]
+        indexed, indexed_ids = time_queries(session_factory, crud.get_parkings_nearby, points, radius_km)
+        scanned, scanned_ids = time_queries(session_factory, full_scan, points[:scan_queries], radius_km)
+        assert indexed_ids[:scan_queries] == scanned_ids, "indexed search disagrees with full scan"
+        engine.dispose()
+
+    indexed_ms = statistics.median(indexed) * 1000
+    scanned_ms = statistics.median(scanned) * 1000
+    avg_hits = statistics.mean(len(ids) for ids in indexed_ids)
+    print(
+        f"{size:>9,} lots | load {load_s:6.1f}s | avg hits {avg_hits:6.1f} | "
+        f"indexed p50 {indexed_ms:8.2f} ms | full scan p50 {scanned_ms:9.1f} ms | "
+        f"speedup x{scanned_ms / indexed_ms:,.0f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200, help="indexed queries per size")
+    parser.add_argument("--scan-queries", type=int, default=5, help="full-scan queries per size")
+    parser.add_argument("--radius", type=float, default=5.0, help="search radius in km")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.queries, min(args.scan_queries, args.queries), args.radius, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: occupancy counters under concurrent kiosks.
+
+Kiosk threads flip random slots between parked and vacant through
+crud.payment.upsert_payment (single events) and upsert_payments (batches)
+against one SQLite file with the production engine profile. Afterwards
+every lot's avail_slots is compared with total_slots minus its parked
+payments, which must match exactly, and reading a page of lots with the
+stored counter is timed against deriving it with COUNT(*) per lot.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_occupancy.py
+    PYTHONPATH=src python benchmarks/bench_occupancy.py --kiosks 8 --seconds 10
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import geo
+from app.database import ENGINE_PROFILES, create_db_engine
+from crud import parking as parking_crud
+from crud import payment as payment_crud
+from models import Base
+from models.parking import Parking
+from models.payment import Payment
+from models.user import User
+from schemas.payment import PaymentEvent
+
+LOTS = 500
+SLOTS_PER_LOT = 8
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kiosks", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", ENGINE_PROFILES["production"])
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        with session_factory() as db:
+            db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+            db.execute(insert(Parking), [
+                {
+                    "id": i, "name": f"lot-{i}", "address": "benchmark", "latitude": 35.6, "longitude": 139.7,
+                    "total_slots": SLOTS_PER_LOT, "avail_slots": SLOTS_PER_LOT, "owner_id": 1,
+                    "geohash": geo.geohash_encode(35.6, 139.7),
+                }
+                for i in range(1, LOTS + 1)
+            ])
+            db.commit()
+
+        stop = threading.Event()
+        counts = {"events": 0, "locked": 0}
+        lock = threading.Lock()
+
+        def kiosk(seed: int) -> None:
+            rng = random.Random(seed)
+            with session_factory() as db:
+                while not stop.is_set():
+                    try:
+                        if rng.random() < 0.5:
+                            payment_crud.upsert_payment(
+                                db, rng.randint(1, LOTS), rng.randrange(SLOTS_PER_LOT), parked=rng.random() < 0.5
+                            )
+                            n = 1
+                        else:
+                            events = [
+                                PaymentEvent(
+                                    spot_id=rng.randint(1, LOTS), slot_id=rng.randrange(SLOTS_PER_LOT),
+                                    parked=rng.random() < 0.5,
+                                )
+                                for _ in range(20)
+                            ]
+                            payment_crud.upsert_payments(db, events)
+                            n = len(events)
+                        with lock:
+                            counts["events"] += n
+                    except OperationalError:
+                        db.rollback()
+                        with lock:
+                            counts["locked"] += 1
+
+        threads = [threading.Thread(target=kiosk, args=(i,)) for i in range(args.kiosks)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        with session_factory() as db:
+            parked = dict(db.execute(
+                select(Payment.spot_id, func.count()).where(Payment.parked).group_by(Payment.spot_id)
+            ).all())
+            drifted = [
+                p.id for p in db.query(Parking)
+                if p.avail_slots != p.total_slots - parked.get(p.id, 0)
+            ]
+            print(
+                f"{args.kiosks} kiosks | {counts['events'] / args.seconds:8.0f} events/s | "
+                f"locked errors {counts['locked']} | drifted lots {len(drifted)}"
+            )
+            assert parking_crud.reconcile_avail_slots(db) == drifted
+
+            def stored():
+                db.execute(select(Parking.id, Parking.avail_slots).limit(100)).all()
+
+            def derived():
+                count = (
+                    select(func.count()).where(Payment.spot_id == Parking.id, Payment.parked).scalar_subquery()
+                )
+                db.execute(select(Parking.id, Parking.total_slots - count).limit(100)).all()
+
+            for label, fn in (("stored counter", stored), ("COUNT(*) per lot", derived)):
+                started = time.perf_counter()
+                for _ in range(200):
+                    fn()
+                print(f"{label:>16} | {(time.perf_counter() - started) / 200 * 1000:6.3f} ms per 100-lot page")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: OFFSET vs keyset pagination, column projection, and streamed export.
+
+Seeds --lots parking rows and reports:
+  * a deep page (the last 100 rows) fetched with skip= vs after_id=,
+  * a 1000-row page loaded as ORM objects vs projected to 4 columns,
+  * peak Python memory (tracemalloc) of the /parking/all?limit=<all> route
+    vs the streamed /parking/export route. The route functions are called
+    directly and their bodies consumed in-process, because the TestClient
+    buffers whole response bodies.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_pagination.py
+    PYTHONPATH=src python benchmarks/bench_pagination.py --lots 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+
+BATCH = 50_000
+
+
+def seed(session_factory, lots: int) -> None:
+    from app import geo
+    from models.parking import Parking
+    from models.user import User
+
+    rng = random.Random(3)
+    with session_factory() as db:
+        db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+        for start in range(0, lots, BATCH):
+            rows = []
+            for i in range(start, min(start + BATCH, lots)):
+                lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+                rows.append({
+                    "name": f"lot-{i}", "address": "benchmark address", "latitude": lat, "longitude": lon,
+                    "total_slots": 10, "avail_slots": 5, "owner_id": 1, "geohash": geo.geohash_encode(lat, lon),
+                })
+            db.execute(insert(Parking), rows)
+        db.commit()
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def peak_memory(fn) -> tuple[float, float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed, size
+
+
+async def compare_exports(lots: int) -> None:
+    from app.database import ReadAsyncSessionLocal, async_engine
+    from routers import parking as parking_router
+
+    async def fetch_all() -> int:
+        async with ReadAsyncSessionLocal() as db:
+            response = await parking_router.get_all_parkings(
+                skip=0, limit=lots, after_id=None, cursor=None, fields=None, db=db
+            )
+        return len(response.body)
+
+    async def fetch_export() -> int:
+        response = await parking_router.export_parkings(fields=None)
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        return size
+
+    for label, fn in (("/parking/all", fetch_all), ("/parking/export", fetch_export)):
+        peak, elapsed, size = await peak_memory(fn)
+        print(f"{label:<22} | peak {peak:8.1f} MiB | {elapsed:6.1f} s | body {size / 2**20:6.1f} MiB")
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lots", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database opens ./chari-spot.db, so import the app from inside tmp.
+        os.chdir(tmp)
+        from app import main  # noqa: F401  creates the tables
+        from app.database import SessionLocal
+        from crud import parking as parking_crud
+
+        seed(SessionLocal, args.lots)
+        print(f"{args.lots} lots")
+
+        with SessionLocal() as db:
+            last_id = args.lots - 100
+            offset_ms = timed(lambda: parking_crud.get_parkings(db, skip=last_id, limit=100))
+            keyset_ms = timed(lambda: parking_crud.get_parkings(db, after_id=last_id, limit=100))
+            print(f"deep page (last 100)   | skip= {offset_ms:8.2f} ms | after_id= {keyset_ms:8.2f} ms")
+
+            fields = ["id", "latitude", "longitude", "avail_slots"]
+            full_ms = timed(lambda: parking_crud.get_parkings(db, limit=1000))
+            projected_ms = timed(lambda: parking_crud.get_parkings(db, limit=1000, fields=fields))
+            print(f"1000-row page          | ORM   {full_ms:8.2f} ms | fields=   {projected_ms:8.2f} ms")
+
+        asyncio.run(compare_exports(args.lots))
+
+
+if __name__ == "__main__":
+    main()
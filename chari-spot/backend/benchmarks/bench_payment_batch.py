@@ -0,0 +1,114 @@
+"""
+Benchmark: ingesting kiosk slot events one request at a time vs. /payments/batch.
+
+A burst of parked/paid events (several per slot, as a kiosk replays its
+buffer after a reconnect) is applied three ways against a fresh database:
+one upsert_payment call per event, one upsert_payments call for the whole
+burst, and POST /payments/batch through the TestClient with a JSON array
+and with NDJSON. Reports events per second for each.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_payment_batch.py
+    PYTHONPATH=src python benchmarks/bench_payment_batch.py --events 50000 --lots 2000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+
+def make_events(lots: int, slots: int, count: int) -> list[dict]:
+    rng = random.Random(5)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    events = []
+    for i in range(count):
+        event = {"spot_id": rng.randint(1, lots), "slot_id": rng.randrange(slots)}
+        event["parked" if rng.random() < 0.6 else "paid"] = rng.random() < 0.5
+        event["ts"] = (start + timedelta(milliseconds=i)).isoformat()
+        events.append(event)
+    return events
+
+
+def seed(session_factory, lots: int) -> None:
+    from app import geo
+    from models.parking import Parking
+    from models.payment import Payment
+    from models.user import User
+
+    with session_factory() as db:
+        db.query(Payment).delete()
+        if db.query(User).count() == 0:
+            db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+            db.execute(insert(Parking), [
+                {
+                    "id": i, "name": f"lot-{i}", "address": "benchmark", "latitude": 35.6, "longitude": 139.7,
+                    "total_slots": 8, "avail_slots": 8, "owner_id": 1, "geohash": geo.geohash_encode(35.6, 139.7),
+                }
+                for i in range(1, lots + 1)
+            ])
+        db.commit()
+
+
+def report(label: str, events: int, elapsed: float) -> None:
+    print(f"{label:>27} | {events / elapsed:10.0f} events/s | {elapsed * 1000:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.database opens ./chari-spot.db, so import the app from inside tmp.
+        os.chdir(tmp)
+        from fastapi.testclient import TestClient
+
+        from app import auth
+        from app.database import SessionLocal
+        from app.main import app
+        from crud import payment as payment_crud
+        from schemas.payment import PaymentEvent
+
+        raw = make_events(args.lots, args.slots, args.events)
+        events = [PaymentEvent.model_validate(e) for e in raw]
+        print(f"{args.events} events over {args.lots} lots x {args.slots} slots")
+
+        with TestClient(app) as client:
+            seed(SessionLocal, args.lots)
+            started = time.perf_counter()
+            with SessionLocal() as db:
+                for e in events:
+                    payment_crud.upsert_payment(db, e.spot_id, e.slot_id, e.parked, e.paid)
+            report("upsert_payment per event", args.events, time.perf_counter() - started)
+
+            seed(SessionLocal, args.lots)
+            started = time.perf_counter()
+            with SessionLocal() as db:
+                payment_crud.upsert_payments(db, events)
+            report("upsert_payments", args.events, time.perf_counter() - started)
+
+            headers = {"Authorization": f"Bearer {auth.create_access_token({'user_id': 1})}"}
+            seed(SessionLocal, args.lots)
+            body = json.dumps(raw)
+            started = time.perf_counter()
+            response = client.post("/payments/batch", content=body, headers={**headers, "Content-Type": "application/json"})
+            report("POST /payments/batch", args.events, time.perf_counter() - started)
+            assert response.status_code == 200 and response.json()["failed"] == 0, response.text
+
+            seed(SessionLocal, args.lots)
+            body = "\n".join(json.dumps(e) for e in raw)
+            started = time.perf_counter()
+            response = client.post("/payments/batch", content=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+            report("POST /payments/batch ndjson", args.events, time.perf_counter() - started)
+            assert response.status_code == 200 and response.json()["failed"] == 0, response.text
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Microbenchmark: serializing the /parking/all payload.
+
+Loads --rows parking rows as ORM objects from an in-memory database and
+builds the /parking/all response body two ways:
+  * before: JSONResponse(content=jsonable_encoder([ParkingResponse.model_validate(p) ...]))
+  * after:  app.responses.json_response(rows, list[ParkingResponse], from_attributes=True)
+Reports the best wall time over --repeat runs and the peak memory allocated
+while building one response (tracemalloc), and checks both bodies decode
+to the same JSON.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_serialization.py
+    PYTHONPATH=src python benchmarks/bench_serialization.py --rows 100000
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import geo
+from app.responses import json_response
+from models import Base
+from models.parking import Parking
+from models.user import User
+from schemas.parking import ParkingResponse
+
+
+def load_rows(count: int) -> list[Parking]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(4)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+        rows = []
+        for i in range(count):
+            lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+            rows.append({
+                "name": f"駐輪場 {i}", "address": "東京都千代田区", "latitude": lat, "longitude": lon,
+                "total_slots": 10, "avail_slots": rng.randint(0, 10), "owner_id": 1,
+                "geohash": geo.geohash_encode(lat, lon),
+            })
+        db.execute(insert(Parking), rows)
+        db.commit()
+        parkings = db.query(Parking).all()
+        db.expunge_all()
+    engine.dispose()
+    return parkings
+
+
+def before(parkings: list[Parking]) -> bytes:
+    response_data = [ParkingResponse.model_validate(p) for p in parkings]
+    return JSONResponse(
+        content=jsonable_encoder(response_data),
+        media_type="application/json; charset=utf-8"
+    ).body
+
+
+def after(parkings: list[Parking]) -> bytes:
+    return json_response(parkings, list[ParkingResponse], from_attributes=True).body
+
+
+def measure(fn, parkings: list[Parking], repeat: int) -> tuple[float, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(parkings)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(parkings)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    parkings = load_rows(args.rows)
+    assert json.loads(before(parkings)) == json.loads(after(parkings))
+    print(f"{args.rows} rows, {len(after(parkings)) / 2**20:.1f} MiB body")
+    for label, fn in (("jsonable_encoder", before), ("TypeAdapter.dump_json", after)):
+        elapsed, peak = measure(fn, parkings, args.repeat)
+        print(f"{label:>22} | {elapsed:8.1f} ms | peak alloc {peak:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
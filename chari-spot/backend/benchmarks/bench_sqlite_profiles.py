@@ -0,0 +1,134 @@
+"""
+Benchmark: concurrent map reads and kiosk payment writes per SQLite engine profile.
+
+Reader threads page through /parking/all's query while writer threads flip
+payment states, all against one database file. Reports read and write
+throughput plus "database is locked" failures for each profile in
+app.database.ENGINE_PROFILES.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_sqlite_profiles.py
+    PYTHONPATH=src python benchmarks/bench_sqlite_profiles.py --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import geo
+from app.database import ENGINE_PROFILES, create_db_engine
+from crud import parking as parking_crud
+from crud import payment as payment_crud
+from models import Base
+from models.parking import Parking
+from models.payment import Payment
+from models.user import User
+
+LOTS = 2_000
+SLOTS_PER_LOT = 4
+
+
+def seed(session_factory) -> None:
+    rng = random.Random(3)
+    with session_factory() as db:
+        db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+        lots, payments = [], []
+        for i in range(1, LOTS + 1):
+            lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+            lots.append({
+                "id": i, "name": f"lot-{i}", "address": "benchmark", "latitude": lat, "longitude": lon,
+                "total_slots": SLOTS_PER_LOT, "avail_slots": SLOTS_PER_LOT, "owner_id": 1,
+                "geohash": geo.geohash_encode(lat, lon),
+            })
+            payments.extend(
+                {"spot_id": i, "slot_id": s, "parked": False, "paid": False} for s in range(SLOTS_PER_LOT)
+            )
+        db.execute(insert(Parking), lots)
+        db.execute(insert(Payment), payments)
+        db.commit()
+
+
+def run_profile(name: str, readers: int, writers: int, seconds: float) -> None:
+    profile = ENGINE_PROFILES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", profile)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        seed(session_factory)
+
+        stop = threading.Event()
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        latencies = {"reads": [], "writes": []}
+        lock = threading.Lock()
+
+        def record(kind: str, started: float) -> None:
+            with lock:
+                counts[kind] += 1
+                latencies[kind].append(time.perf_counter() - started)
+
+        def reader(seed_: int) -> None:
+            rng = random.Random(seed_)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    with session_factory() as db:
+                        parking_crud.get_parkings(db, skip=rng.randrange(0, LOTS - 100), limit=100)
+                    record("reads", started)
+                except OperationalError:
+                    with lock:
+                        counts["locked"] += 1
+
+        def writer(seed_: int) -> None:
+            rng = random.Random(seed_)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    with session_factory() as db:
+                        payment_crud.update_payment(
+                            db, rng.randint(1, LOTS), rng.randrange(SLOTS_PER_LOT), parked=rng.random() < 0.5
+                        )
+                    record("writes", started)
+                except OperationalError:
+                    with lock:
+                        counts["locked"] += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(100 + i,)) for i in range(writers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    def p99(values: list[float]) -> float:
+        values = sorted(values)
+        return values[max(0, int(len(values) * 0.99) - 1)] * 1000 if values else float("nan")
+
+    print(
+        f"{name:>10} | reads {counts['reads'] / seconds:8.1f}/s (p99 {p99(latencies['reads']):7.1f} ms) | "
+        f"writes {counts['writes'] / seconds:7.1f}/s (p99 {p99(latencies['writes']):7.1f} ms) | "
+        f"locked errors {counts['locked']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=6)
+    parser.add_argument("--writers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--profiles", nargs="+", choices=sorted(ENGINE_PROFILES), default=["basic", "production"])
+    args = parser.parse_args()
+    for name in args.profiles:
+        run_profile(name, args.readers, args.writers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
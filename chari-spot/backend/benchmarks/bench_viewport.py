@@ -0,0 +1,101 @@
+"""
+Benchmark: /parking/viewport cluster payloads vs. shipping every lot.
+
+For each lot count, a phone-sized viewport is queried at several zoom levels
+and the JSON payload size and query time are compared with the full list that
+/parking/all used to send to the map.
+
+Usage (from chari-spot/backend):
+    PYTHONPATH=src python benchmarks/bench_viewport.py
+    PYTHONPATH=src python benchmarks/bench_viewport.py --sizes 10000 100000
+"""
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import geo
+from app.clusters import TILE_PX, ClusterIndex
+from models import Base
+from models.parking import Parking
+from models.user import User
+from schemas.parking import ParkingCluster, ParkingResponse
+
+# Greater Tokyo
+LAT_RANGE = (35.4, 36.0)
+LON_RANGE = (139.3, 140.1)
+
+# Phone screen in logical pixels (width, height).
+SCREEN_PX = (412, 892)
+
+
+def populate(db, size: int, rng: random.Random) -> None:
+    db.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"}])
+    rows = []
+    for i in range(size):
+        lat, lon = rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+        rows.append({
+            "name": f"lot-{i}", "address": "benchmark", "latitude": lat, "longitude": lon,
+            "total_slots": 10, "avail_slots": 5, "owner_id": 1, "geohash": geo.geohash_encode(lat, lon),
+        })
+    db.execute(insert(Parking), rows)
+    db.commit()
+
+
+def viewport(zoom: int) -> tuple[float, float, float, float]:
+    lat_c, lon_c = sum(LAT_RANGE) / 2, sum(LON_RANGE) / 2
+    deg_per_px = 360.0 / (TILE_PX * (1 << zoom))
+    d_lon = SCREEN_PX[0] * deg_per_px / 2
+    d_lat = SCREEN_PX[1] * deg_per_px * math.cos(math.radians(lat_c)) / 2
+    return (max(-85.0, lat_c - d_lat), max(-180.0, lon_c - d_lon), min(85.0, lat_c + d_lat), min(180.0, lon_c + d_lon))
+
+
+def run(size: int, zooms: list[int], repeats: int, seed: int) -> None:
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        populate(db, size, random.Random(seed))
+
+        start = time.perf_counter()
+        full = [ParkingResponse.model_validate(p).model_dump() for p in db.query(Parking).all()]
+        full_bytes = len(json.dumps(full, ensure_ascii=False))
+        full_ms = (time.perf_counter() - start) * 1000
+
+        index = ClusterIndex()
+        start = time.perf_counter()
+        index.ensure_loaded(db)
+        build_s = time.perf_counter() - start
+
+        print(f"{size:,} lots: /parking/all {full_bytes / 1024:,.0f} KiB in {full_ms:,.0f} ms, index build {build_s:.1f}s")
+        for zoom in zooms:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                clusters = index.query(*viewport(zoom), zoom)
+                timings.append(time.perf_counter() - start)
+            payload = [ParkingCluster.model_validate(c).model_dump() for c in clusters]
+            print(
+                f"  zoom {zoom:>2}: {len(clusters):>4} clusters, "
+                f"{len(json.dumps(payload)) / 1024:6.1f} KiB, p50 {statistics.median(timings) * 1000:6.2f} ms"
+            )
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--zooms", type=int, nargs="+", default=[6, 9, 11, 13])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.zooms, args.repeats, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
 # src/app/auth.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,9 +11,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.cache import TTLCache
+from app.database import get_async_read_db
 from models import user as user_model
 from crud import user as user_crud
 
@@ -20,6 +26,23 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
 
+# Users resolved from bearer tokens, keyed by token and tagged with the user id.
+# crud.user drops a user's entries when the user is updated or deleted.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("CHARI_SPOT_AUTH_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CHARI_SPOT_AUTH_CACHE_TTL", "60")),
+)
+
+
+# bcrypt takes ~250ms per call and releases the GIL, so async routes hash on
+# a dedicated pool instead of the event loop. Calls beyond the queue limit are
+# rejected with 503 rather than piling up behind a login burst.
+HASH_WORKERS = int(os.getenv("CHARI_SPOT_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("CHARI_SPOT_HASH_QUEUE_LIMIT", "64"))
+
+hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -29,9 +52,34 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = user_crud.get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password):
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool."""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool."""
+    return await _run_hashing(get_password_hash, password)
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await user_crud.get_user_by_email_async(db, email)
+    # End the read transaction so the pooled connection is not held while bcrypt runs.
+    await db.commit()
+    if not user or not await verify_password_async(password, user.password):
         return None
     return user
 
@@ -45,22 +93,39 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 )-> user_model.User:
-    credentials_exc = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid authentication credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    user = await resolve_token(db, token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def resolve_token(db: AsyncSession, token: str) -> Optional[user_model.User]:
+    """Return the user a bearer token belongs to, or None when it is invalid."""
+    # Entries never outlive the token's exp, so a hit needs no decode.
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        u_id: int = payload.get("user_id")
-        if not u_id:
-            raise credentials_exc
     except JWTError:
-        raise credentials_exc
+        return None
+    u_id: int = payload.get("user_id")
+    if not u_id:
+        return None
 
-    user = user_crud.get_user(db, u_id)
+    epoch = principal_cache.epoch
+    started = time.perf_counter()
+    user = await user_crud.get_user_async(db, u_id)
+    principal_cache.record_load(time.perf_counter() - started)
     if not user:
-        raise credentials_exc
+        return None
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    principal_cache.set(token, user, tag=user.id, ttl=ttl, epoch=epoch)
     return user
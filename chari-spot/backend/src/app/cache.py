@@ -0,0 +1,133 @@
+"""
+Small in-process TTL/LRU cache with hit statistics.
+
+Entries expire after a per-entry TTL and the least recently used entry is
+evicted once maxsize is reached. An entry may carry a tag (e.g. a user id)
+so every entry derived from the same row can be dropped at once when that
+row changes. Like app.clusters, the cache assumes a single API worker
+process owns the writes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    # Total time spent producing values on misses, as reported by record_load.
+    load_seconds: float = 0.0
+    loads: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        avg_load = self.load_seconds / self.loads if self.loads else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "avg_load_ms": avg_load * 1000,
+            # Every hit skipped one load of average cost.
+            "saved_ms": self.hits * avg_load * 1000,
+        }
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire and are evicted in LRU order."""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expires_at, tag, value)
+        self._entries: OrderedDict[Hashable, tuple[float, Optional[Hashable], Any]] = OrderedDict()
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        # Bumped on every invalidation, see set().
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def epoch(self) -> int:
+        """Invalidation counter; read it before loading a value to pass to set()."""
+        return self._epoch
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[2]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tag: Optional[Hashable] = None,
+        ttl: Optional[float] = None,
+        epoch: Optional[int] = None,
+    ) -> None:
+        """
+        Store a value. When epoch is given and an invalidation happened since it
+        was read, the value may predate that invalidation and is not stored.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._drop(key)
+            self._entries[key] = (self._clock() + ttl, tag, value)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Drop every entry stored with the given tag."""
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def record_load(self, seconds: float) -> None:
+        """Account the cost of producing a value after a miss."""
+        with self._lock:
+            self.stats.load_seconds += seconds
+            self.stats.loads += 1
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[1] is None:
+            return
+        keys = self._tags.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry[1]]
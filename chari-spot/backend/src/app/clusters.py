@@ -0,0 +1,194 @@
+"""
+Precomputed map clusters for the /parking/viewport endpoint.
+
+Every lot is bucketed into a Web Mercator grid cell at each zoom level from
+0 to CLUSTER_MAX_ZOOM, and each cell keeps running sums (count, coordinates,
+slots). crud.parking keeps the buckets current on every create, update and
+delete, so a viewport query only touches the cells on screen no matter how
+many lots exist. Above CLUSTER_MAX_ZOOM the endpoint returns individual lots.
+
+The index lives in process memory and is loaded lazily from the database on
+first use; it assumes a single API worker process owns the writes.
+"""
+import math
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models.parking import Parking
+
+CLUSTER_MAX_ZOOM = 14
+
+# Cell edge length in screen pixels (a 256px tile is split into 4x4 cells).
+CELL_PX = 64
+TILE_PX = 256
+
+MAX_MERCATOR_LAT = 85.05112878
+
+
+@dataclass
+class _Cell:
+    count: int = 0
+    sum_lat: float = 0.0
+    sum_lon: float = 0.0
+    avail_slots: int = 0
+    total_slots: int = 0
+    # With count == 1 this is the id of the only lot in the cell.
+    sum_ids: int = 0
+
+
+@dataclass(frozen=True)
+class Cluster:
+    count: int
+    latitude: float
+    longitude: float
+    avail_slots: int
+    total_slots: int
+    parking_id: Optional[int] = None
+
+
+def _world_px(latitude: float, longitude: float, zoom: int) -> tuple[float, float]:
+    """Project a coordinate to Web Mercator pixel space at the given zoom."""
+    scale = TILE_PX * (1 << zoom)
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude))
+    sin_lat = math.sin(math.radians(lat))
+    x = (longitude + 180.0) / 360.0 * scale
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def _cell_key(latitude: float, longitude: float, zoom: int) -> tuple[int, int]:
+    x, y = _world_px(latitude, longitude, zoom)
+    return int(x // CELL_PX), int(y // CELL_PX)
+
+
+class ClusterIndex:
+    """Per-zoom grid aggregates of parking lots, updated incrementally."""
+
+    def __init__(self, max_zoom: int = CLUSTER_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Writes seen while a load is reading the table, replayed once it finishes.
+        self._pending: Optional[list[tuple]] = None
+        self._lots: dict[int, tuple[float, float, int, int]] = {}
+        self._levels: list[dict[tuple[int, int], _Cell]] = [{} for _ in range(max_zoom + 1)]
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Build the index from the parkings table the first time it is needed."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._pending is None:
+                self._pending = []
+        # The lock is not held across the query: with an AsyncSession the query
+        # yields to the event loop, and a write hook on the same thread would block.
+        rows = db.query(
+            Parking.id, Parking.latitude, Parking.longitude,
+            Parking.avail_slots, Parking.total_slots,
+        ).all()
+        with self._lock:
+            if self._loaded:
+                return
+            for row in rows:
+                self._add(row.id, row.latitude, row.longitude, row.avail_slots, row.total_slots)
+            for parking_id, state in self._pending:
+                self._remove(parking_id)
+                if state is not None:
+                    self._add(parking_id, *state)
+            self._pending = None
+            self._loaded = True
+
+    def reset(self) -> None:
+        """Drop all aggregates; the next query reloads from the database."""
+        with self._lock:
+            self._loaded = False
+            self._pending = None
+            self._lots.clear()
+            for level in self._levels:
+                level.clear()
+
+    def upsert(self, parking_id: int, latitude: float, longitude: float, avail_slots: int, total_slots: int) -> None:
+        """Record the current state of a lot, replacing any previous state."""
+        with self._lock:
+            if self._loaded:
+                self._remove(parking_id)
+                self._add(parking_id, latitude, longitude, avail_slots, total_slots)
+            elif self._pending is not None:
+                self._pending.append((parking_id, (latitude, longitude, avail_slots, total_slots)))
+            # Before the first load the database is the source of truth.
+
+    def remove(self, parking_id: int) -> None:
+        """Forget a deleted lot."""
+        with self._lock:
+            if self._loaded:
+                self._remove(parking_id)
+            elif self._pending is not None:
+                self._pending.append((parking_id, None))
+
+    def query(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, zoom: int) -> list[Cluster]:
+        """Return the clusters whose grid cells intersect the bounding box."""
+        zoom = max(0, min(zoom, self.max_zoom))
+        x_first, y_first = _cell_key(max_lat, min_lon, zoom)
+        x_last, y_last = _cell_key(min_lat, max_lon, zoom)
+        with self._lock:
+            level = self._levels[zoom]
+            if (x_last - x_first + 1) * (y_last - y_first + 1) <= len(level):
+                cells = (
+                    level.get((x, y))
+                    for x in range(x_first, x_last + 1)
+                    for y in range(y_first, y_last + 1)
+                )
+            else:
+                cells = (
+                    cell for (x, y), cell in level.items()
+                    if x_first <= x <= x_last and y_first <= y <= y_last
+                )
+            return [
+                Cluster(
+                    count=cell.count,
+                    latitude=cell.sum_lat / cell.count,
+                    longitude=cell.sum_lon / cell.count,
+                    avail_slots=cell.avail_slots,
+                    total_slots=cell.total_slots,
+                    parking_id=cell.sum_ids if cell.count == 1 else None,
+                )
+                for cell in cells if cell is not None
+            ]
+
+    def _add(self, parking_id: int, latitude: float, longitude: float, avail_slots: int, total_slots: int) -> None:
+        self._lots[parking_id] = (latitude, longitude, avail_slots, total_slots)
+        for zoom, level in enumerate(self._levels):
+            key = _cell_key(latitude, longitude, zoom)
+            cell = level.get(key)
+            if cell is None:
+                cell = level[key] = _Cell()
+            cell.count += 1
+            cell.sum_lat += latitude
+            cell.sum_lon += longitude
+            cell.avail_slots += avail_slots
+            cell.total_slots += total_slots
+            cell.sum_ids += parking_id
+
+    def _remove(self, parking_id: int) -> None:
+        lot = self._lots.pop(parking_id, None)
+        if lot is None:
+            return
+        latitude, longitude, avail_slots, total_slots = lot
+        for zoom, level in enumerate(self._levels):
+            key = _cell_key(latitude, longitude, zoom)
+            cell = level[key]
+            cell.count -= 1
+            if cell.count == 0:
+                del level[key]
+                continue
+            cell.sum_lat -= latitude
+            cell.sum_lon -= longitude
+            cell.avail_slots -= avail_slots
+            cell.total_slots -= total_slots
+            cell.sum_ids -= parking_id
+
+
+cluster_index = ClusterIndex()
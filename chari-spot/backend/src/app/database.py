@@ -1,16 +1,119 @@
-from sqlalchemy import create_engine
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 
 # SQLite Local Database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./chari-spot.db"
+# Same database file, driven through aiosqlite for the async routers
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./chari-spot.db"
+# Optional aiosqlite URL serving GET routes, e.g. a replica file kept in sync
+# by an external tool, or the primary file again for a dedicated read pool.
+READ_DATABASE_URL = os.getenv("CHARI_SPOT_READ_DATABASE_URL")
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Connection pragmas and pool sizing applied to every SQLite engine."""
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    mmap_size: Optional[int] = None       # bytes
+    cache_size: Optional[int] = None      # pages, or KiB when negative
+    busy_timeout_ms: Optional[int] = None
+    query_only: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+
+    def pragmas(self) -> list[str]:
+        settings = {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "mmap_size": self.mmap_size,
+            "cache_size": self.cache_size,
+            "busy_timeout": self.busy_timeout_ms,
+            "query_only": "ON" if self.query_only else None,
+        }
+        return [f"PRAGMA {name}={value}" for name, value in settings.items() if value is not None]
+
+
+ENGINE_PROFILES = {
+    # SQLite defaults: rollback journal, readers and writers block each other.
+    "basic": EngineProfile(),
+    # WAL lets map reads proceed while kiosks write; NORMAL sync is durable
+    # across application crashes and only fsyncs on checkpoints.
+    "production": EngineProfile(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        mmap_size=256 * 1024 * 1024,
+        cache_size=-64 * 1024,
+        busy_timeout_ms=5000,
+        pool_size=10,
+        max_overflow=20,
+    ),
+}
+
+DB_PROFILE = ENGINE_PROFILES[os.getenv("CHARI_SPOT_DB_PROFILE", "production")]
+if os.getenv("CHARI_SPOT_DB_POOL_SIZE"):
+    DB_PROFILE = replace(DB_PROFILE, pool_size=int(os.environ["CHARI_SPOT_DB_POOL_SIZE"]))
+
+
+def _apply_profile(target: Engine, profile: EngineProfile) -> None:
+    pragmas = profile.pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(target, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def create_db_engine(url: str, profile: EngineProfile = DB_PROFILE) -> Engine:
+    """Create a sync SQLite engine with the profile's pragmas and pool."""
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},  # SQLite needs check_same_thread=False
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+    )
+    _apply_profile(db_engine, profile)
+    return db_engine
+
+
+def create_async_db_engine(url: str, profile: EngineProfile = DB_PROFILE) -> AsyncEngine:
+    """Create an aiosqlite engine with the profile's pragmas and pool."""
+    db_engine = create_async_engine(
+        url,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+    )
+    _apply_profile(db_engine.sync_engine, profile)
+    return db_engine
+
 
 # create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}  # SQLite needs check_same_thread=False
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_db_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+read_async_engine = (
+    create_async_db_engine(READ_DATABASE_URL, replace(DB_PROFILE, query_only=True))
+    if READ_DATABASE_URL else async_engine
 )
 
 # create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay readable after commit: lazy refreshes are not possible outside
+# the greenlet bridge, so an expired attribute would fail inside a route.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+ReadAsyncSessionLocal = async_sessionmaker(bind=read_async_engine, autoflush=False, expire_on_commit=False)
 
 # create ORM
 Base = declarative_base()
@@ -20,4 +123,18 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Yield an AsyncSession for a request. The async crud variants run the sync
+    crud functions on it through AsyncSession.run_sync, so the query logic is
+    shared with the sync path while the I/O happens on aiosqlite.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Yield an AsyncSession for read-only routes, on the read replica when configured."""
+    async with ReadAsyncSessionLocal() as db:
+        yield db
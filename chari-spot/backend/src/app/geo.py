@@ -0,0 +1,117 @@
+import math
+from typing import Optional
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Precision stored on each Parking row (~4.8m x 4.8m cells).
+GEOHASH_PRECISION = 9
+
+# Upper bound on the number of geohash cells used to cover a search box.
+MAX_COVER_CELLS = 16
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Sorts after every geohash character, so [prefix, prefix + _PREFIX_END) is a prefix range.
+_PREFIX_END = "{"
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a base32 geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                bits = bits * 2 + 1
+                lon_lo = mid
+            else:
+                bits = bits * 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = bits * 2 + 1
+                lat_lo = mid
+            else:
+                bits = bits * 2
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> tuple[float, float]:
+    """Return the (latitude, longitude) extent in degrees of a geohash cell."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) enclosing a circle of radius_km."""
+    d_lat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    d_lon = 180.0 if cos_lat < 1e-9 else min(180.0, d_lat / cos_lat)
+    return (
+        max(-90.0, latitude - d_lat),
+        max(-180.0, longitude - d_lon),
+        min(90.0, latitude + d_lat),
+        min(180.0, longitude + d_lon),
+    )
+
+
+def covering_prefixes(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    max_cells: int = MAX_COVER_CELLS,
+) -> Optional[list[str]]:
+    """
+    Return the geohash prefixes whose cells cover the given box, using the finest
+    precision that needs at most max_cells cells. Returns None when the box is so
+    large that no prefix narrows the search.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lon = geohash_cell_size(precision)
+        lat_first = int((min_lat + 90.0) // cell_lat)
+        lat_last = int((min(max_lat, 90.0 - 1e-12) + 90.0) // cell_lat)
+        lon_first = int((min_lon + 180.0) // cell_lon)
+        lon_last = int((min(max_lon, 180.0 - 1e-12) + 180.0) // cell_lon)
+        if (lat_last - lat_first + 1) * (lon_last - lon_first + 1) > max_cells:
+            continue
+        return [
+            geohash_encode(
+                -90.0 + (i + 0.5) * cell_lat,
+                -180.0 + (j + 0.5) * cell_lon,
+                precision,
+            )
+            for i in range(lat_first, lat_last + 1)
+            for j in range(lon_first, lon_last + 1)
+        ]
+    return None
+
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """Return the half-open [low, high) string range matching every geohash with prefix."""
+    return prefix, prefix + _PREFIX_END
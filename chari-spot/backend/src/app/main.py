@@ -1,18 +1,54 @@
 # coding: utf-8
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers import user
 from routers import parking
 from routers import payment
+from routers import realtime
 from models import user as user_model
 from models import parking as parking_model
 from sqlalchemy.orm import Session
-from app.database import engine, SQLALCHEMY_DATABASE_URL, SessionLocal
-
-app = FastAPI()
+from app.auth import principal_cache
+from app.database import engine, SQLALCHEMY_DATABASE_URL, SessionLocal, AsyncSessionLocal
+from app.migrations import run_migrations
+from crud import parking as parking_crud
 
 import os
 
+logger = logging.getLogger(__name__)
+
+# 空き台数（avail_slots）を payments から再計算する間隔（秒，0で無効）
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("CHARI_SPOT_RECONCILE_INTERVAL", "300"))
+
+
+async def reconcile_periodically(interval: float) -> None:
+    """Recompute avail_slots from the payments table every interval seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                corrected = await parking_crud.reconcile_avail_slots_async(db)
+            if corrected:
+                logger.warning("Reconciled avail_slots of %d parkings: %s", len(corrected), corrected[:20])
+        except Exception:
+            logger.exception("avail_slots reconciliation failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = None
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        task = asyncio.create_task(reconcile_periodically(RECONCILE_INTERVAL_SECONDS))
+    yield
+    if task is not None:
+        task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
 print("### FastAPI working directory:", os.getcwd())
 print("### FastAPI using DB path:", SQLALCHEMY_DATABASE_URL)
 
@@ -23,14 +59,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ブラウザのJavaScriptからカーソルとETagを読めるようにする
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Build DB
 user_model.Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 # Include the user router
 app.include_router(user.router)
 
+# Include the realtime (WebSocket / SSE) router, before /parking/{parking_id}
+app.include_router(realtime.router)
+
 # Include the parking router
 app.include_router(parking.router)
 
@@ -40,3 +82,8 @@ app.include_router(payment.router)
 @app.get("/api/hello")
 def read_root():
     return {"message": "Hello from FastAPI!"}
+
+@app.get("/api/stats")
+def read_stats():
+    # プロセス内キャッシュのヒット率と節約できた時間
+    return {"auth_cache": principal_cache.stats.as_dict()}
@@ -0,0 +1,70 @@
+"""
+In-place schema upgrades for existing SQLite databases.
+
+``Base.metadata.create_all`` only creates missing tables, so columns and
+indexes added to a model after a database file was first created are
+applied here. Every step is idempotent and safe to run on each startup.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app import geo
+from models.payment import OCCUPANCY_TRIGGERS
+
+
+def run_migrations(engine: Engine) -> None:
+    """Bring an existing database up to the current models."""
+    with engine.begin() as conn:
+        _add_parking_geohash(conn)
+        _add_payment_spot_slot_unique_index(conn)
+        _add_occupancy_triggers(conn)
+
+
+def _add_parking_geohash(conn: Connection) -> None:
+    """Add the geohash column and index to parkings and backfill old rows."""
+    columns = {c["name"] for c in inspect(conn).get_columns("parkings")}
+    if "geohash" not in columns:
+        conn.execute(text("ALTER TABLE parkings ADD COLUMN geohash VARCHAR"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_parkings_geohash ON parkings (geohash)"))
+
+    rows = conn.execute(
+        text("SELECT id, latitude, longitude FROM parkings WHERE geohash IS NULL")
+    ).all()
+    if rows:
+        conn.execute(
+            text("UPDATE parkings SET geohash = :geohash WHERE id = :id"),
+            [{"id": r.id, "geohash": geo.geohash_encode(r.latitude, r.longitude)} for r in rows],
+        )
+
+
+def _add_payment_spot_slot_unique_index(conn: Connection) -> None:
+    """Collapse duplicate (spot_id, slot_id) payments and make the pair unique."""
+    if not inspect(conn).has_table("payments"):
+        return  # models.payment not imported; create_all will build the index
+    indexes = {i["name"] for i in inspect(conn).get_indexes("payments")}
+    if "ux_payments_spot_slot" in indexes:
+        return
+    # Keep the oldest row, which is the one the old first() lookups returned.
+    conn.execute(text(
+        "DELETE FROM payments WHERE id NOT IN "
+        "(SELECT MIN(id) FROM payments GROUP BY spot_id, slot_id)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX ux_payments_spot_slot ON payments (spot_id, slot_id)"))
+
+
+def _add_occupancy_triggers(conn: Connection) -> None:
+    """Install the avail_slots triggers and derive the counters they will maintain."""
+    if not inspect(conn).has_table("payments"):
+        return
+    existing = set(conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'payments'")
+    ).scalars())
+    if {"tr_payments_occupancy_insert", "tr_payments_occupancy_update", "tr_payments_occupancy_delete"} <= existing:
+        return
+    for trigger in OCCUPANCY_TRIGGERS:
+        conn.execute(text(trigger))
+    # Counters so far were edited by hand; start from the parked payments.
+    conn.execute(text(
+        "UPDATE parkings SET avail_slots = total_slots - "
+        "(SELECT COUNT(*) FROM payments WHERE payments.spot_id = parkings.id AND payments.parked)"
+    ))
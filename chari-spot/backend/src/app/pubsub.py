@@ -0,0 +1,259 @@
+"""
+Publish/subscribe for real-time availability updates.
+
+crud.parking and crud.payment publish a Delta after every committed write;
+the /parking/ws and /parking/stream endpoints hold one Subscription per
+client, filtered to a bounding box or a set of lot ids.
+
+Publishing never blocks on subscribers. Each subscription keeps only the
+latest delta per key (a lot, or one slot of a lot), so a burst of updates to
+the same lot reaches the client as one message, and a client that stops
+reading costs at most max_pending entries. Past that the backlog is dropped
+and the client is told to resync (re-fetch /parking/viewport).
+
+The module-level broker is an InProcessBroker, which only sees writes made
+by this process (like app.clusters). Deployments with several workers can
+install another Broker implementation with set_broker().
+"""
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable, Optional
+
+# Grids (cell size in degrees, finest first) used to find the bbox
+# subscriptions around a published lot. A bbox is registered on the finest grid
+# where it spans at most MAX_GRID_CELLS cells; wider ones are checked on every publish.
+GRID_DEGS = (0.05, 1.0)
+MAX_GRID_CELLS = 64
+
+DEFAULT_MAX_PENDING = 1000
+DEFAULT_COALESCE_SECONDS = 0.1
+
+
+@dataclass(frozen=True)
+class Delta:
+    """One change to publish. Deltas with the same key replace each other."""
+    key: Hashable
+    parking_id: int
+    latitude: Optional[float]
+    longitude: Optional[float]
+    payload: dict
+    # Where the lot was before the change, so subscribers of that area see it leave.
+    previous: Optional[tuple[float, float]] = None
+
+
+@dataclass(eq=False)
+class Subscription:
+    """Delivery state of one client. Read it with next_batch()."""
+    bbox: Optional[tuple[float, float, float, float]] = None
+    ids: Optional[frozenset[int]] = None
+    max_pending: int = DEFAULT_MAX_PENDING
+    coalesce_seconds: float = DEFAULT_COALESCE_SECONDS
+    pending: dict = field(default_factory=dict)
+    overflowed: bool = False
+    closed: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _event: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, repr=False)
+
+    def matches(self, parking_id: int, latitude: Optional[float], longitude: Optional[float]) -> bool:
+        if self.ids is not None:
+            return parking_id in self.ids
+        if latitude is None or longitude is None:
+            return False
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+
+    def offer(self, delta: Delta) -> None:
+        """Queue a delta, replacing an undelivered one with the same key."""
+        with self._lock:
+            if self.closed:
+                return
+            # The consumer was already woken for a non-empty backlog.
+            wake = not self.pending and not self.overflowed
+            if delta.key not in self.pending and len(self.pending) >= self.max_pending:
+                self.pending.clear()
+                self.overflowed = True
+            if not self.overflowed:
+                self.pending[delta.key] = delta.payload
+        if wake:
+            self._wake()
+
+    def drain(self) -> Optional[dict]:
+        """Take the queued updates as one message, or None when nothing is queued."""
+        with self._lock:
+            self._event.clear()
+            if self.overflowed:
+                self.overflowed = False
+                self.pending.clear()
+                return {"type": "resync"}
+            if not self.pending:
+                return None
+            events = list(self.pending.values())
+            self.pending.clear()
+        return {"type": "updates", "events": events}
+
+    async def next_batch(self) -> Optional[dict]:
+        """Wait for updates and return them as one message; None once closed."""
+        while not self.closed:
+            await self._event.wait()
+            if self.coalesce_seconds:
+                # Let a burst of writes accumulate into a single message.
+                await asyncio.sleep(self.coalesce_seconds)
+            message = self.drain()
+            if message is not None:
+                return message
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self.pending.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._event.set()
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._event.set()
+        else:
+            loop.call_soon_threadsafe(self._event.set)
+
+
+class Broker:
+    """Interface of the pub/sub backend used by crud and the streaming routes."""
+
+    def subscribe(
+        self,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        ids: Optional[Iterable[int]] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        coalesce_seconds: float = DEFAULT_COALESCE_SECONDS,
+    ) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        raise NotImplementedError
+
+    def publish(self, delta: Delta) -> None:
+        raise NotImplementedError
+
+    def has_subscribers(self) -> bool:
+        raise NotImplementedError
+
+
+def _grid_cell(level: int, latitude: float, longitude: float) -> tuple[int, int, int]:
+    deg = GRID_DEGS[level]
+    return level, int(latitude // deg), int(longitude // deg)
+
+
+class InProcessBroker(Broker):
+    """Broker that delivers to subscriptions held by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id: dict[int, set[Subscription]] = {}
+        self._by_cell: dict[Optional[tuple[int, int, int]], set[Subscription]] = {}
+        self._count = 0
+
+    def subscribe(
+        self,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        ids: Optional[Iterable[int]] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        coalesce_seconds: float = DEFAULT_COALESCE_SECONDS,
+    ) -> Subscription:
+        if (bbox is None) == (ids is None):
+            raise ValueError("Subscribe to either a bbox or a list of ids")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        sub = Subscription(
+            bbox=tuple(bbox) if bbox is not None else None,
+            ids=frozenset(ids) if ids is not None else None,
+            max_pending=max_pending,
+            coalesce_seconds=coalesce_seconds,
+            _loop=loop,
+        )
+        with self._lock:
+            index, keys = self._keys(sub)
+            for key in keys:
+                index.setdefault(key, set()).add(sub)
+            self._count += 1
+        return sub
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.closed:
+            return
+        subscription.close()
+        with self._lock:
+            index, keys = self._keys(subscription)
+            for key in keys:
+                bucket = index.get(key)
+                if bucket is None or subscription not in bucket:
+                    continue
+                bucket.discard(subscription)
+                if not bucket:
+                    del index[key]
+            self._count -= 1
+
+    def publish(self, delta: Delta) -> None:
+        targets = set()
+        points = [(delta.latitude, delta.longitude)]
+        if delta.previous is not None:
+            points.append(delta.previous)
+        with self._lock:
+            if not self._count:
+                return
+            targets.update(self._by_id.get(delta.parking_id, ()))
+            candidates = set(self._by_cell.get(None, ()))
+            for latitude, longitude in points:
+                if latitude is None or longitude is None:
+                    continue
+                for level in range(len(GRID_DEGS)):
+                    candidates.update(self._by_cell.get(_grid_cell(level, latitude, longitude), ()))
+        for latitude, longitude in points:
+            if latitude is None or longitude is None:
+                continue
+            for sub in candidates:
+                min_lat, min_lon, max_lat, max_lon = sub.bbox
+                if min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon:
+                    targets.add(sub)
+        for sub in targets:
+            sub.offer(delta)
+
+    def has_subscribers(self) -> bool:
+        return self._count > 0
+
+    def _keys(self, sub: Subscription) -> tuple[dict, list]:
+        """The index and keys a subscription is registered under."""
+        if sub.ids is not None:
+            return self._by_id, list(sub.ids)
+        min_lat, min_lon, max_lat, max_lon = sub.bbox
+        for level in range(len(GRID_DEGS)):
+            _, y0, x0 = _grid_cell(level, min_lat, min_lon)
+            _, y1, x1 = _grid_cell(level, max_lat, max_lon)
+            if (y1 - y0 + 1) * (x1 - x0 + 1) <= MAX_GRID_CELLS:
+                return self._by_cell, [(level, y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+        # Too wide for every grid; the None bucket is checked on every publish.
+        return self._by_cell, [None]
+
+
+broker: Broker = InProcessBroker()
+
+
+def set_broker(new_broker: Broker) -> None:
+    """Replace the broker, e.g. with a stand-in in tests or a shared one across workers."""
+    global broker
+    broker = new_broker
+
+
+def get_broker() -> Broker:
+    return broker
@@ -0,0 +1,70 @@
+"""
+Shared JSON response layer for the routers.
+
+JSONResponse(content=jsonable_encoder(...)) walks the data twice in Python:
+once to build plain dicts and once more in json.dumps. Here models, ORM
+rows and plain dicts are validated and serialized to bytes by pydantic-core
+in one pass through a cached TypeAdapter per response type.
+"""
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+JSON_MEDIA_TYPE = "application/json; charset=utf-8"
+# Clients may store responses but must revalidate them (with If-None-Match) before use.
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """Return the (cached) TypeAdapter for a response type, e.g. list[ParkingResponse]."""
+    return TypeAdapter(tp)
+
+
+def dump_json(data: Any, tp: Any = Any, from_attributes: bool = False) -> bytes:
+    """
+    Serialize data as tp. With from_attributes, ORM objects (or Row objects)
+    are first read into tp's models by pydantic-core, which also drops any
+    attribute tp does not declare.
+    """
+    adapter = type_adapter(tp)
+    if from_attributes:
+        data = adapter.validate_python(data, from_attributes=True)
+    return adapter.dump_json(data)
+
+
+class JSONBytesResponse(Response):
+    """A response whose content is already-serialized JSON bytes."""
+    media_type = JSON_MEDIA_TYPE
+
+
+def json_response(
+    data: Any,
+    tp: Any = Any,
+    from_attributes: bool = False,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> JSONBytesResponse:
+    """Build a JSON response for data serialized as tp, see dump_json."""
+    return JSONBytesResponse(
+        content=dump_json(data, tp, from_attributes),
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match lists etag (or is "*")."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    # A weak comparison is what If-None-Match calls for, so W/ tags match too.
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(etag: str) -> Response:
+    """A 304 response for an unchanged representation."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL})
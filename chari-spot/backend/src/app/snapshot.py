@@ -0,0 +1,68 @@
+"""
+Version counter and pre-serialized payloads for the parking endpoints.
+
+crud.parking bumps the version after every committed write. Responses carry
+a strong ETag built from the version (plus a per-process epoch, so a restart
+never reuses an old tag), and serialized list bodies are kept for the
+current version, so an unchanged map refresh costs an integer comparison
+and, without If-None-Match, a dictionary lookup.
+
+Like app.clusters, this assumes a single API worker process owns the writes:
+another worker's writes would not bump this process's version.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class VersionedSnapshots:
+    """A write version plus response bodies cached for that version only."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[bytes, dict]] = OrderedDict()
+
+    def bump(self) -> None:
+        """Record a write; every cached body becomes stale."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def etag(self, version: int, resource: Optional[Hashable] = None) -> str:
+        """
+        ETag for a response built at version. A per-resource ETag includes the
+        resource id, so it only matches requests for that same resource.
+        """
+        if resource is None:
+            return f'"{self.epoch}-{version}"'
+        return f'"{self.epoch}-{version}-{resource}"'
+
+    def get(self, version: int, key: Hashable) -> Optional[tuple[bytes, dict]]:
+        """Return the (body, headers) stored for key at version, if still current."""
+        with self._lock:
+            if version != self.version:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version: int, key: Hashable, body: bytes, headers: dict) -> None:
+        """
+        Store a body built from data read after `version` was taken. It is
+        dropped if a write happened since, because the data may predate it.
+        """
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (body, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+parking_snapshots = VersionedSnapshots()
@@ -1,42 +1,141 @@
-from typing import Optional
-from fastapi import HTTPException
+from typing import Iterable, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app import geo
+from app import pubsub
+from app.clusters import Cluster, cluster_index
+from app.snapshot import parking_snapshots
 from models import parking
-from schemas.parking import ParkingCreate, ParkingUpdate
-import math
+from models.payment import Payment
+from schemas.parking import ParkingCreate, ParkingResponse, ParkingUpdate
 
+# (avail_slots, total_slots) last pushed to the caches for each lot in this
+# process, so payment writes that leave the counters alone (e.g. only paid
+# changed) do not invalidate every cached page
+_published_counters: dict[int, tuple[int, int]] = {}
 
 def create_parking(db: Session, parkingCreate: ParkingCreate) -> parking.Parking:
-    """Create a new parking slot."""
-    db_parking = parking.Parking(**parkingCreate.model_dump())
+    """Create a new parking slot; avail_slots starts from total_slots minus any parked payments."""
+    db_parking = parking.Parking(**parkingCreate.model_dump(), avail_slots=parkingCreate.total_slots)
+    db_parking.geohash = geo.geohash_encode(db_parking.latitude, db_parking.longitude)
     db.add(db_parking)
+    db.flush()
+    _derive_avail_slots(db, db_parking.id)
     db.commit()
     db.refresh(db_parking)
+    _publish_parking(db_parking)
     return db_parking
 
 def get_parking(db: Session, id: int) -> Optional[parking.Parking]:
     """Fetch a slot by its primary key."""
     return db.get(parking.Parking, id)
 
-def get_parkings(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(parking.Parking).offset(skip).limit(limit).all()
+def get_parkings(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    fields: Optional[list[str]] = None,
+) -> list:
+    """
+    Fetch a page of slots ordered by id. With after_id the page starts after
+    that id (keyset pagination) and skip is ignored. With fields only those
+    columns are selected and Row objects are returned instead of models.
+    """
+    if fields:
+        query = db.query(*(getattr(parking.Parking, f) for f in fields))
+    else:
+        query = db.query(parking.Parking)
+    query = query.order_by(parking.Parking.id)
+    if after_id is not None:
+        query = query.filter(parking.Parking.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def get_parking_by_owner(db: Session, u_id: int) -> Optional[list[parking.Parking]]:
     """Fetch a list of slots by owner ID."""
     return db.query(parking.Parking).filter(parking.Parking.owner_id == u_id).all()
 
+def get_parkings_in_bbox(
+    db: Session,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+) -> list[parking.Parking]:
+    """Fetch slots inside a bounding box, narrowed through the geohash index."""
+    query = db.query(parking.Parking).filter(
+        parking.Parking.latitude.between(min_lat, max_lat),
+        parking.Parking.longitude.between(min_lon, max_lon),
+    )
+    prefixes = geo.covering_prefixes(min_lat, min_lon, max_lat, max_lon)
+    if prefixes is not None:
+        ranges = []
+        for prefix in prefixes:
+            low, high = geo.prefix_range(prefix)
+            ranges.append(and_(parking.Parking.geohash >= low, parking.Parking.geohash < high))
+        query = query.filter(or_(*ranges))
+    return query.all()
+
+def get_parkings_nearby(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    limit: Optional[int] = None,
+) -> list[tuple[parking.Parking, float]]:
+    """Fetch slots within radius_km as (slot, distance_km) pairs, nearest first."""
+    candidates = get_parkings_in_bbox(db, *geo.bounding_box(latitude, longitude, radius_km))
+    hits = []
+    for p in candidates:
+        distance = geo.haversine_km(latitude, longitude, p.latitude, p.longitude)
+        if distance <= radius_km:
+            hits.append((p, distance))
+    hits.sort(key=lambda hit: hit[1])
+    return hits[:limit] if limit is not None else hits
+
+def get_viewport_clusters(
+    db: Session,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    zoom: int,
+) -> list[Cluster]:
+    """Return precomputed clusters for the cells of a map viewport."""
+    cluster_index.ensure_loaded(db)
+    return cluster_index.query(min_lat, min_lon, max_lat, max_lon, zoom)
+
 def update_slot(db: Session, slotUpdate: ParkingUpdate) -> Optional[parking.Parking]:
-    """Update fields on a slot. Returns the updated slot, or None if not found."""
+    """
+    Update fields on a slot. Returns the updated slot, or None if not found.
+    A new total_slots re-derives avail_slots in the same transaction.
+    Raises ValueError if total_slots is below the bicycles currently parked there.
+    """
     slot = get_parking(db, slotUpdate.id)
     if not slot:
         return None
     
+    previous = (slot.latitude, slot.longitude)
     update_data = slotUpdate.model_dump(exclude_unset=True)  
     for key, value in update_data.items():
         setattr(slot, key, value)
+    if "latitude" in update_data or "longitude" in update_data:
+        slot.geohash = geo.geohash_encode(slot.latitude, slot.longitude)
+    if "total_slots" in update_data:
+        # The flush takes the write lock, so no trigger can move the count in between
+        db.flush()
+        parked = db.scalar(select(func.count()).where(Payment.spot_id == slot.id, Payment.parked))
+        if slot.total_slots < parked:
+            db.rollback()
+            raise ValueError(f"total_slots must be at least {parked}, the number of bicycles parked now.")
+        _derive_avail_slots(db, slot.id)
     
     db.commit()
     db.refresh(slot)
+    _publish_parking(slot, previous)
     return slot
 
 def delete_slot(db: Session, slot_id: int) -> bool:
@@ -45,7 +144,130 @@ def delete_slot(db: Session, slot_id: int) -> bool:
     if not slot:
         return False
     
+    position = (slot.latitude, slot.longitude)
     db.delete(slot)
     db.commit()
+    _published_counters.pop(slot_id, None)
+    parking_snapshots.bump()
+    cluster_index.remove(slot_id)
+    pubsub.get_broker().publish(pubsub.Delta(
+        key=("lot", slot_id), parking_id=slot_id, latitude=position[0], longitude=position[1],
+        payload={"type": "lot", "id": slot_id, "deleted": True},
+    ))
     
     return True
+
+def refresh_parkings(db: Session, ids: Iterable[int]) -> dict[int, parking.Parking]:
+    """
+    Reload slots whose counters may have been changed inside the database
+    (by the payment triggers or reconciliation) and push the ones whose
+    counters did change to the caches. Returns every reloaded slot.
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    slots = (
+        db.query(parking.Parking)
+        .filter(parking.Parking.id.in_(ids))
+        .execution_options(populate_existing=True)
+        .all()
+    )
+    for slot in slots:
+        if _published_counters.get(slot.id) != (slot.avail_slots, slot.total_slots):
+            _publish_parking(slot)
+    return {slot.id: slot for slot in slots}
+
+def reconcile_avail_slots(db: Session) -> list[int]:
+    """
+    Recompute avail_slots as total_slots minus the parked payments for every
+    slot, correcting drift (e.g. rows written without the triggers or values
+    entered by hand before the counter was derived). Returns the ids that
+    were corrected.
+    """
+    derived = _derived_avail_slots()
+    stmt = (
+        update(parking.Parking)
+        .where(parking.Parking.avail_slots != derived)
+        .values(avail_slots=derived)
+        .returning(parking.Parking.id)
+    )
+    corrected = list(db.scalars(stmt))
+    db.commit()
+    refresh_parkings(db, corrected)
+    return corrected
+
+def _derived_avail_slots():
+    """SQL expression for total_slots minus the parked payments of the row's lot."""
+    parked = (
+        select(func.count())
+        .where(Payment.spot_id == parking.Parking.id, Payment.parked)
+        .scalar_subquery()
+    )
+    return parking.Parking.total_slots - parked
+
+def _derive_avail_slots(db: Session, slot_id: int) -> None:
+    """Set one slot's avail_slots from its parked payments inside the current transaction."""
+    db.execute(
+        update(parking.Parking)
+        .where(parking.Parking.id == slot_id)
+        .values(avail_slots=_derived_avail_slots())
+        .execution_options(synchronize_session=False)
+    )
+
+def _publish_parking(slot: parking.Parking, previous: Optional[tuple[float, float]] = None) -> None:
+    """Push the committed state of a slot into the caches and to subscribers."""
+    _published_counters[slot.id] = (slot.avail_slots, slot.total_slots)
+    parking_snapshots.bump()
+    cluster_index.upsert(slot.id, slot.latitude, slot.longitude, slot.avail_slots, slot.total_slots)
+    broker = pubsub.get_broker()
+    if broker.has_subscribers():
+        broker.publish(pubsub.Delta(
+            key=("lot", slot.id), parking_id=slot.id, latitude=slot.latitude, longitude=slot.longitude,
+            payload={"type": "lot", **ParkingResponse.model_validate(slot).model_dump()},
+            previous=previous,
+        ))
+
+
+# Async variants for the routers; each runs the function above via AsyncSession.run_sync.
+
+async def create_parking_async(db: AsyncSession, parkingCreate: ParkingCreate) -> parking.Parking:
+    return await db.run_sync(create_parking, parkingCreate)
+
+async def get_parking_async(db: AsyncSession, id: int) -> Optional[parking.Parking]:
+    return await db.run_sync(get_parking, id)
+
+async def get_parkings_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    fields: Optional[list[str]] = None,
+) -> list:
+    return await db.run_sync(get_parkings, skip, limit, after_id, fields)
+
+async def get_parking_by_owner_async(db: AsyncSession, u_id: int) -> list[parking.Parking]:
+    return await db.run_sync(get_parking_by_owner, u_id)
+
+async def get_parkings_in_bbox_async(
+    db: AsyncSession, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> list[parking.Parking]:
+    return await db.run_sync(get_parkings_in_bbox, min_lat, min_lon, max_lat, max_lon)
+
+async def get_parkings_nearby_async(
+    db: AsyncSession, latitude: float, longitude: float, radius_km: float, limit: Optional[int] = None
+) -> list[tuple[parking.Parking, float]]:
+    return await db.run_sync(get_parkings_nearby, latitude, longitude, radius_km, limit)
+
+async def get_viewport_clusters_async(
+    db: AsyncSession, min_lat: float, min_lon: float, max_lat: float, max_lon: float, zoom: int
+) -> list[Cluster]:
+    return await db.run_sync(get_viewport_clusters, min_lat, min_lon, max_lat, max_lon, zoom)
+
+async def update_slot_async(db: AsyncSession, slotUpdate: ParkingUpdate) -> Optional[parking.Parking]:
+    return await db.run_sync(update_slot, slotUpdate)
+
+async def delete_slot_async(db: AsyncSession, slot_id: int) -> bool:
+    return await db.run_sync(delete_slot, slot_id)
+
+async def reconcile_avail_slots_async(db: AsyncSession) -> list[int]:
+    return await db.run_sync(reconcile_avail_slots)
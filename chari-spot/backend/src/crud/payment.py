@@ -1,12 +1,21 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Sequence
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app import pubsub
+from crud import parking as parking_crud
 from models.payment import Payment
-from typing import Optional
+from schemas.payment import PaymentEvent
 
 def create_payment(db: Session, payment: Payment) -> Payment:
     """Create a new payment record."""
     db.add(payment)
     db.commit()
     db.refresh(payment)
+    _publish_payments(db, [payment])
     return payment
 
 def get_payment_by_spot_and_slot(db: Session, spot_id: int, slot_id: int) -> Optional[Payment]:
@@ -16,23 +25,149 @@ def get_payment_by_spot_and_slot(db: Session, spot_id: int, slot_id: int) -> Opt
         Payment.slot_id == slot_id
     ).first()
 
-def update_payment(db: Session, spot_id: int, slot_id: int, paid: bool=None, parked: bool=None) -> Payment:
-    query = db.query(Payment).filter(
-                Payment.spot_id == spot_id,
-                Payment.slot_id == slot_id
-            )
+def update_payment(db: Session, spot_id: int, slot_id: int, paid: bool=None, parked: bool=None) -> Optional[Payment]:
+    """Update the given fields of an existing payment in one UPDATE ... RETURNING."""
+    values = {}
     if paid is not None:
-        query.update({
-            Payment.paid: paid
-        })
+        values["paid"] = paid
+    if parked is not None:
+        values["parked"] = parked
+    if not values:
+        return get_payment_by_spot_and_slot(db, spot_id, slot_id)
+
+    stmt = (
+        update(Payment)
+        .where(Payment.spot_id == spot_id, Payment.slot_id == slot_id)
+        .values(**values)
+        .returning(Payment)
+    )
+    res = db.scalars(stmt, execution_options={"populate_existing": True}).first()
+    db.commit()
+    if res is not None:
+        _publish_payments(db, [res])
+    return res
+
+def upsert_payment(db: Session, spot_id: int, slot_id: int, parked: bool=None, paid: bool=None) -> Optional[Payment]:
+    """
+    Create or update the payment for (spot_id, slot_id) in a single
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement.
+
+    A new row takes the given fields, defaulting to parked=True, paid=False.
+    An existing row only has the given fields changed. Returns None when the
+    row already exists and neither field is given.
+    """
+    stmt = sqlite_insert(Payment).values(
+        spot_id=spot_id,
+        slot_id=slot_id,
+        parked=True if parked is None else parked,
+        paid=False if paid is None else paid,
+    )
+    updates = {}
     if parked is not None:
-        query.update({
-            Payment.parked: parked
+        updates["parked"] = stmt.excluded.parked
+    if paid is not None:
+        updates["paid"] = stmt.excluded.paid
+    conflict_target = [Payment.spot_id, Payment.slot_id]
+    if updates:
+        stmt = stmt.on_conflict_do_update(index_elements=conflict_target, set_=updates)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_target)
+
+    res = db.scalars(stmt.returning(Payment), execution_options={"populate_existing": True}).first()
+    db.commit()
+    if res is not None:
+        _publish_payments(db, [res])
+    return res
+
+def upsert_payments(db: Session, events: Sequence[PaymentEvent]) -> dict[tuple[int, int], Payment]:
+    """
+    Apply a batch of slot state events in one transaction.
+
+    Events are replayed in ts order (events without ts keep their position in
+    the batch) and folded into one final state per (spot_id, slot_id), which is
+    then written with executemany INSERT ... ON CONFLICT DO UPDATE ... RETURNING,
+    one statement per combination of changed fields. Every event must set
+    parked or paid. Returns the resulting payments keyed by (spot_id, slot_id).
+    """
+    latest: dict[tuple[int, int], dict[str, bool]] = {}
+    for event in _in_time_order(events):
+        state = latest.setdefault((event.spot_id, event.slot_id), {})
+        if event.parked is not None:
+            state["parked"] = event.parked
+        if event.paid is not None:
+            state["paid"] = event.paid
+
+    groups: dict[tuple[str, ...], list[dict]] = defaultdict(list)
+    for (spot_id, slot_id), state in latest.items():
+        groups[tuple(sorted(state))].append({
+            "spot_id": spot_id,
+            "slot_id": slot_id,
+            "parked": state.get("parked", True),
+            "paid": state.get("paid", False),
         })
 
+    payments: dict[tuple[int, int], Payment] = {}
+    for fields, rows in groups.items():
+        stmt = sqlite_insert(Payment)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Payment.spot_id, Payment.slot_id],
+            set_={field: stmt.excluded[field] for field in fields},
+        ).returning(Payment)
+        for res in db.scalars(stmt, rows, execution_options={"populate_existing": True}):
+            payments[(res.spot_id, res.slot_id)] = res
     db.commit()
+    _publish_payments(db, payments.values())
+    return payments
 
-    return db.query(Payment).filter(
-        Payment.spot_id == spot_id,
-        Payment.slot_id == slot_id
-    ).first()
+def _publish_payments(db: Session, payments: Iterable[Payment]) -> None:
+    """
+    Refresh the lots whose avail_slots the occupancy triggers just changed
+    and send the committed slot states to their subscribers.
+    """
+    payments = list(payments)
+    lots = parking_crud.refresh_parkings(db, {p.spot_id for p in payments})
+    broker = pubsub.get_broker()
+    if not broker.has_subscribers():
+        return
+    for p in payments:
+        lot = lots.get(p.spot_id)
+        broker.publish(pubsub.Delta(
+            key=("slot", p.spot_id, p.slot_id), parking_id=p.spot_id,
+            latitude=lot.latitude if lot else None, longitude=lot.longitude if lot else None,
+            payload={"type": "slot", "parking_id": p.spot_id, "slot_id": p.slot_id, "parked": p.parked, "paid": p.paid},
+        ))
+
+def _in_time_order(events: Sequence[PaymentEvent]) -> Iterable[PaymentEvent]:
+    """Stable-sort events by ts; an event without ts inherits the previous event's ts."""
+    keyed = []
+    current = datetime.min.replace(tzinfo=timezone.utc)
+    for event in events:
+        if event.ts is not None:
+            current = event.ts if event.ts.tzinfo else event.ts.replace(tzinfo=timezone.utc)
+        keyed.append((current, event))
+    keyed.sort(key=lambda pair: pair[0])
+    return (event for _, event in keyed)
+
+
+# Async variants for the routers; each runs the function above via AsyncSession.run_sync.
+
+async def create_payment_async(db: AsyncSession, payment: Payment) -> Payment:
+    return await db.run_sync(create_payment, payment)
+
+async def get_payment_by_spot_and_slot_async(db: AsyncSession, spot_id: int, slot_id: int) -> Optional[Payment]:
+    return await db.run_sync(get_payment_by_spot_and_slot, spot_id, slot_id)
+
+async def update_payment_async(
+    db: AsyncSession, spot_id: int, slot_id: int, paid: bool = None, parked: bool = None
+) -> Optional[Payment]:
+    return await db.run_sync(update_payment, spot_id, slot_id, paid, parked)
+
+async def upsert_payment_async(
+    db: AsyncSession, spot_id: int, slot_id: int, parked: bool = None, paid: bool = None
+) -> Optional[Payment]:
+    return await db.run_sync(upsert_payment, spot_id, slot_id, parked, paid)
+
+async def upsert_payments_async(
+    db: AsyncSession, events: Sequence[PaymentEvent]
+) -> dict[tuple[int, int], Payment]:
+    return await db.run_sync(upsert_payments, events)
@@ -1,11 +1,13 @@
 from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import user
 from schemas import user as schemas
 from app import auth
 
-def create_user(db: Session, userCreate: schemas.UserCreate):
-    hashed_password = auth.get_password_hash(userCreate.password)
+def create_user(db: Session, userCreate: schemas.UserCreate, hashed_password: Optional[str] = None):
+    if hashed_password is None:
+        hashed_password = auth.get_password_hash(userCreate.password)
     db_user = user.User(
         username=userCreate.username,
         email=userCreate.email,
@@ -28,9 +30,14 @@ def get_user_by_email(db: Session, email: str) -> Optional[user.User]:
     """Fetch the first user matching the given email."""
     return db.query(user.User).filter(user.User.email == email).first()
 
-def list_users(db: Session, skip: int = 0, limit: int = 100) -> List[user.User]:
-    """Return a slice of users for paging."""
-    return db.query(user.User).offset(skip).limit(limit).all()
+def list_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[user.User]:
+    """Return a page of users ordered by id, starting after after_id when given."""
+    query = db.query(user.User).order_by(user.User.id)
+    if after_id is not None:
+        query = query.filter(user.User.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def update_user(db: Session, userUpdate: schemas.UserUpdate) -> Optional[user.User]:
     user_obj = get_user(db, userUpdate.id)
@@ -43,6 +50,7 @@ def update_user(db: Session, userUpdate: schemas.UserUpdate) -> Optional[user.Us
 
     db.commit()
     db.refresh(user_obj)
+    auth.principal_cache.invalidate_tag(user_obj.id)
     return user_obj
 
 
@@ -53,4 +61,33 @@ def delete_user(db: Session, user_id: int) -> bool:
         return False
     db.delete(user)
     db.commit()
+    auth.principal_cache.invalidate_tag(user_id)
     return True
+
+
+# Async variants for the routers; each runs the function above via AsyncSession.run_sync.
+
+async def create_user_async(db: AsyncSession, userCreate: schemas.UserCreate) -> user.User:
+    # Hash on the hashing pool first; run_sync executes on the event loop thread.
+    hashed_password = await auth.get_password_hash_async(userCreate.password)
+    return await db.run_sync(create_user, userCreate, hashed_password)
+
+async def get_user_async(db: AsyncSession, user_id: int) -> Optional[user.User]:
+    return await db.run_sync(get_user, user_id)
+
+async def get_user_by_name_async(db: AsyncSession, name: str) -> Optional[user.User]:
+    return await db.run_sync(get_user_by_name, name)
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[user.User]:
+    return await db.run_sync(get_user_by_email, email)
+
+async def list_users_async(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None
+) -> List[user.User]:
+    return await db.run_sync(list_users, skip, limit, after_id)
+
+async def update_user_async(db: AsyncSession, userUpdate: schemas.UserUpdate) -> Optional[user.User]:
+    return await db.run_sync(update_user, userUpdate)
+
+async def delete_user_async(db: AsyncSession, user_id: int) -> bool:
+    return await db.run_sync(delete_user, user_id)
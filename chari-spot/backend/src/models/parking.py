@@ -12,4 +12,5 @@ class Parking(Base):
     total_slots = Column(Integer, nullable=False)
     avail_slots = Column(Integer, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    geohash = Column(String, index=True)  # spatial index key, see app.geo
 
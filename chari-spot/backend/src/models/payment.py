@@ -1,12 +1,51 @@
-from sqlalchemy import Column, Integer, Boolean, ForeignKey
+from sqlalchemy import DDL, Column, Integer, Boolean, ForeignKey, Index, event
 from models import Base
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # One row per physical slot; also the conflict target of crud.payment.upsert_payment
+        Index("ux_payments_spot_slot", "spot_id", "slot_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     spot_id = Column(Integer, ForeignKey("parkings.id"), nullable=False)
     slot_id = Column(Integer, nullable=False)  
     parked = Column(Boolean, default=False)  # parking status: True for parked, False for not parked
     paid = Column(Boolean, default=False)   # payment staus: True for paid, False for unpaid
-    
\ No newline at end of file
+
+
+# Keep parkings.avail_slots in step with the parked flags: every change of a
+# payment's parked state moves the lot's counter by one inside the same
+# statement (and so the same transaction) as the payment write. SQLite
+# serializes writers, so concurrent kiosks cannot lose an update.
+# crud.parking.reconcile_avail_slots recomputes the counters from scratch.
+OCCUPANCY_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS tr_payments_occupancy_insert
+    AFTER INSERT ON payments WHEN NEW.parked
+    BEGIN
+        UPDATE parkings SET avail_slots = avail_slots - 1 WHERE id = NEW.spot_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tr_payments_occupancy_update
+    AFTER UPDATE OF parked, spot_id ON payments
+    WHEN COALESCE(OLD.parked, 0) != COALESCE(NEW.parked, 0) OR OLD.spot_id != NEW.spot_id
+    BEGIN
+        UPDATE parkings SET avail_slots = avail_slots + 1 WHERE id = OLD.spot_id AND OLD.parked;
+        UPDATE parkings SET avail_slots = avail_slots - 1 WHERE id = NEW.spot_id AND NEW.parked;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tr_payments_occupancy_delete
+    AFTER DELETE ON payments WHEN OLD.parked
+    BEGIN
+        UPDATE parkings SET avail_slots = avail_slots + 1 WHERE id = OLD.spot_id;
+    END
+    """,
+]
+
+for _trigger in OCCUPANCY_TRIGGERS:
+    event.listen(Payment.__table__, "after_create", DDL(_trigger))
+
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas import parking as schemas
 from app.auth import get_current_user
+from app.pagination import decode_cursor, encode_cursor, parse_fields
+from app.responses import (
+    JSON_MEDIA_TYPE, REVALIDATE_CACHE_CONTROL, JSONBytesResponse, dump_json, etag_matches, json_response,
+    not_modified,
+)
+from app.snapshot import parking_snapshots
 from crud import parking as crud
-from app.database import get_db
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from app.database import ReadAsyncSessionLocal, get_async_db, get_async_read_db
+from fastapi.responses import StreamingResponse
 from models import user as models
+from app.clusters import CLUSTER_MAX_ZOOM
 
 router = APIRouter(
     tags=["parking"],
@@ -16,83 +23,182 @@ router = APIRouter(
 
 # 駐輪場の新規登録
 @router.post("/register", response_model=schemas.ParkingResponse)
-def create_parking(
+async def create_parking(
     parking: schemas.ParkingCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user)
 ):
     parking.owner_id = user.id
-    created = crud.create_parking(db, parking)
-    return JSONResponse(
-        content=jsonable_encoder(schemas.ParkingResponse.model_validate(created)),
-        media_type="application/json; charset=utf-8"
-    )
+    created = await crud.create_parking_async(db, parking)
+    return json_response(created, schemas.ParkingResponse, from_attributes=True)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def _parse_page_params(cursor: Optional[str], after_id: Optional[int], fields: Optional[str]):
+    if cursor is not None:
+        try:
+            after_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        columns = parse_fields(fields, schemas.ParkingResponse.model_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return after_id, columns
 
 # 駐輪場一覧を取得（UTF-8 明示）
+# cursor / after_id でキーセット方式のページング，fields で返す列を絞り込み（id は常に含む）
+# 次ページのカーソルは X-Next-Cursor ヘッダで返す
+# 更新がなければ If-None-Match に 304 を返し，本文もバージョンごとに使い回す
 @router.get("/all", response_model=list[schemas.ParkingResponse])
-def get_all_parkings(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    parkings = crud.get_parkings(db, skip=skip, limit=limit)
-    return JSONResponse(
-        content=jsonable_encoder(parkings),
-        media_type="application/json; charset=utf-8"
-    )
+async def get_all_parkings(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Read the version before querying: data committed later then only makes the tag stale.
+    version = parking_snapshots.version
+    etag = parking_snapshots.etag(version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    after_id, columns = _parse_page_params(cursor, after_id, fields)
+    key = (skip, limit, after_id, tuple(columns or ()))
+    snapshot = parking_snapshots.get(version, key)
+    if snapshot is None:
+        parkings = await crud.get_parkings_async(db, skip=skip, limit=limit, after_id=after_id, fields=columns)
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+        if parkings and len(parkings) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(parkings[-1].id)
+        if columns:
+            body = dump_json([row._asdict() for row in parkings])
+        else:
+            body = dump_json(parkings, list[schemas.ParkingResponse], from_attributes=True)
+        snapshot = (body, headers)
+        parking_snapshots.put(version, key, body, headers)
+    body, headers = snapshot
+    return JSONBytesResponse(content=body, headers=headers)
+
+# 駐輪場を全件エクスポート（JSON配列をストリーミング，メモリ使用量は件数によらず一定）
+@router.get("/export", response_model=list[schemas.ParkingResponse])
+async def export_parkings(fields: Optional[str] = None):
+    _, columns = _parse_page_params(None, None, fields)
+    columns = columns or list(schemas.ParkingResponse.model_fields)
+
+    async def rows():
+        # The request's session is closed once the route returns, so the stream opens its own.
+        async with ReadAsyncSessionLocal() as db:
+            yield b"["
+            after_id, first = None, True
+            while True:
+                page = await crud.get_parkings_async(
+                    db, limit=EXPORT_BATCH_SIZE, after_id=after_id, fields=columns
+                )
+                if not page:
+                    break
+                chunk = dump_json([row._asdict() for row in page], list[dict[str, Any]])[1:-1]
+                yield chunk if first else b"," + chunk
+                first = False
+                after_id = page[-1].id
+                # End the read transaction between pages so writers are not held back.
+                await db.commit()
+            yield b"]"
+
+    return StreamingResponse(rows(), media_type=JSON_MEDIA_TYPE)
 
 # 駐輪場の詳細取得（owned）
 @router.get("/owned", response_model=list[schemas.ParkingResponse])
-def get_parking_by_owner(db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    parkings = crud.get_parking_by_owner(db, user.id)
-    response_data = [schemas.ParkingResponse.model_validate(p) for p in parkings]
-    return JSONResponse(
-        content=jsonable_encoder(response_data),
-        media_type="application/json; charset=utf-8"
+async def get_parking_by_owner(db: AsyncSession = Depends(get_async_read_db), user: models.User = Depends(get_current_user)):
+    parkings = await crud.get_parking_by_owner_async(db, user.id)
+    return json_response(parkings, list[schemas.ParkingResponse], from_attributes=True)
+
+# 近くの駐輪場を検索（距離の近い順）
+@router.get("/nearby", response_model=list[schemas.NearbyParkingResponse])
+async def get_nearby_parkings(
+    search: schemas.NearbySearchRequest = Depends(),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    hits = await crud.get_parkings_nearby_async(
+        db, search.latitude, search.longitude, search.radius_km, limit=search.limit
     )
+    columns = schemas.ParkingResponse.model_fields
+    response_data = [
+        {**{c: getattr(p, c) for c in columns}, "distance_km": round(distance, 4)}
+        for p, distance in hits
+    ]
+    return json_response(response_data, list[schemas.NearbyParkingResponse], from_attributes=True)
+
+# 地図の表示範囲に入る駐輪場を取得（低ズームではクラスタ、高ズームでは個別）
+@router.get("/viewport", response_model=schemas.ViewportResponse)
+async def get_viewport(
+    viewport: schemas.ViewportRequest = Depends(),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if viewport.min_lat > viewport.max_lat or viewport.min_lon > viewport.max_lon:
+        raise HTTPException(status_code=400, detail="Invalid bounding box.")
+    bbox = (viewport.min_lat, viewport.min_lon, viewport.max_lat, viewport.max_lon)
+    if viewport.zoom <= CLUSTER_MAX_ZOOM:
+        clusters = await crud.get_viewport_clusters_async(db, *bbox, viewport.zoom)
+        response_data = {"zoom": viewport.zoom, "clusters": clusters}
+    else:
+        parkings = await crud.get_parkings_in_bbox_async(db, *bbox)
+        response_data = {"zoom": viewport.zoom, "parkings": parkings}
+    return json_response(response_data, schemas.ViewportResponse, from_attributes=True)
 
 # 駐輪場の詳細取得（id指定）
 @router.get("/{parking_id}", response_model=schemas.ParkingResponse)
-def get_parking_detail(parking_id: int, db: Session = Depends(get_db)):
-    parking = crud.get_parking(db, parking_id)
+async def get_parking_detail(request: Request, parking_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    version = parking_snapshots.version
+    # An id's ETag is only issued while the lot exists and deleting it bumps the
+    # version, so a match still implies the lot exists and 304 can skip the lookup.
+    etag = parking_snapshots.etag(version, parking_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    parking = await crud.get_parking_async(db, parking_id)
     if parking is None:
         raise HTTPException(status_code=404, detail="駐輪場が見つかりません")
-    return JSONResponse(
-        content=jsonable_encoder(schemas.ParkingResponse.model_validate(parking)),
-        media_type="application/json; charset=utf-8"
+    return json_response(
+        parking, schemas.ParkingResponse, from_attributes=True,
+        headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL},
     )
 
 # 駐輪場情報の更新
 @router.put("/update", response_model=schemas.ParkingResponse)
-def update_parking(
+async def update_parking(
     slot: schemas.ParkingUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user)
 ):
-    existing = crud.get_parking(db, slot.id)
+    existing = await crud.get_parking_async(db, slot.id)
     if not existing:
         raise HTTPException(status_code=404, detail="Slot not found.")
     if existing.owner_id != user.id:
         raise HTTPException(status_code=403, detail="Not allowed to update this parking.")
 
     slot.owner_id = user.id
-    updated = crud.update_slot(db, slot)
-    return JSONResponse(
-        content=jsonable_encoder(updated),
-        media_type="application/json; charset=utf-8"
-    )
+    try:
+        updated = await crud.update_slot_async(db, slot)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return json_response(updated, schemas.ParkingResponse, from_attributes=True)
 
 # 駐輪場の削除
 @router.delete("/delete/{id}")
-def delete_parking(
+async def delete_parking(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user)
 ):
-    parking = crud.get_parking(db, id)
+    parking = await crud.get_parking_async(db, id)
     if not parking:
         raise HTTPException(status_code=404, detail="Slot not found.")
     if parking.owner_id != user.id:
         raise HTTPException(status_code=403, detail="Not allowed to delete this parking.")
 
-    crud.delete_slot(db, id)
-    return JSONResponse(
-        content={"message": "Slot deleted successfully."},
-        media_type="application/json; charset=utf-8"
-    )
+    await crud.delete_slot_async(db, id)
+    return json_response({"message": "Slot deleted successfully."})
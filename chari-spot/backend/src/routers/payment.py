@@ -1,11 +1,13 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.database import get_db
+import json
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, get_async_read_db
+from app.responses import json_response
 from crud import payment as crud
 from schemas import payment as schemas
 from app.auth import get_current_user
-from models import payment
 
 router = APIRouter(
     prefix="/payments",
@@ -15,38 +17,131 @@ router = APIRouter(
 
 
 @router.post("/", response_model=schemas.PaymentResponse)
-def update(
+async def update(
     spot_id: int = Query(..., description="Spot ID"),
     slot_id: int = Query(..., description="Slot ID"),
     parked: Optional[bool] = Query(None, description="Parking status"),
     paid: Optional[bool] = Query(None, description="Payment status"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    if crud.get_payment_by_spot_and_slot(db, spot_id, slot_id) is None:
-        paymentCreate = payment.Payment(
-            spot_id=spot_id,
-            slot_id=slot_id,
-            parked=True,
-            paid=False
-        )
-        res = crud.create_payment(db, paymentCreate)
-    elif parked is None and paid is None:
+    res = await crud.upsert_payment_async(db, spot_id=spot_id, slot_id=slot_id, parked=parked, paid=paid)
+    if res is None:
         raise HTTPException(status_code=400, detail="Either 'parked' or 'paid' must be provided")
+
+    return json_response(res, schemas.PaymentResponse, from_attributes=True)
+
+
+MAX_BATCH_EVENTS = 50_000
+# 1イベントあたり256バイトまで（ts付きのイベントでも100バイト程度）
+MAX_BATCH_BYTES = MAX_BATCH_EVENTS * 256
+_event_adapter = TypeAdapter(schemas.PaymentEvent)
+
+
+# 複数のイベント（JSON配列 または NDJSON）を1トランザクションでまとめて反映
+@router.post(
+    "/batch",
+    response_model=schemas.PaymentBatchResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": schemas.PaymentEvent.model_json_schema()}
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def update_batch(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # 大きすぎるバッチは本文を読む前に断る
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_BATCH_BYTES:
+        raise _too_large()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        parsed = []
+        async for line in _ndjson_lines(request):
+            if len(parsed) == MAX_BATCH_EVENTS:
+                raise _too_large()
+            parsed.append(_parse_event(line, _event_adapter.validate_json))
     else:
-        res = crud.update_payment(db, spot_id=spot_id, slot_id=slot_id, parked=parked, paid=paid)
-    
-    response = schemas.PaymentResponse.model_validate(res)
-    return response
+        body = b"".join([chunk async for chunk in _body_chunks(request)])
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of events")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of events")
+        if len(items) > MAX_BATCH_EVENTS:
+            raise _too_large()
+        parsed = [_parse_event(item, _event_adapter.validate_python) for item in items]
+
+    events = [event for event, _ in parsed if event is not None]
+    payments = await crud.upsert_payments_async(db, events) if events else {}
+
+    results = []
+    for index, (event, error) in enumerate(parsed):
+        if event is None:
+            results.append(schemas.PaymentEventResult(index=index, ok=False, detail=error))
+        else:
+            res = payments[(event.spot_id, event.slot_id)]
+            results.append(schemas.PaymentEventResult(
+                index=index, ok=True, payment=schemas.PaymentResponse.model_validate(res)
+            ))
+    response = schemas.PaymentBatchResponse(
+        applied=len(events), failed=len(parsed) - len(events), results=results
+    )
+    return json_response(response, schemas.PaymentBatchResponse)
+
+
+def _parse_event(raw, validate) -> tuple[Optional[schemas.PaymentEvent], Optional[str]]:
+    try:
+        event = validate(raw)
+    except ValidationError as e:
+        error = e.errors()[0]
+        return None, f"{'.'.join(str(loc) for loc in error['loc']) or 'event'}: {error['msg']}"
+    if event.parked is None and event.paid is None:
+        return None, "Either 'parked' or 'paid' must be provided"
+    return event, None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413, detail=f"At most {MAX_BATCH_EVENTS} events ({MAX_BATCH_BYTES} bytes) per batch"
+    )
+
+
+async def _body_chunks(request: Request) -> AsyncIterator[bytes]:
+    """Yield the body as it arrives, giving up once it exceeds MAX_BATCH_BYTES (e.g. chunked uploads)."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BATCH_BYTES:
+            raise _too_large()
+        yield chunk
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield non-empty lines of an NDJSON body as the chunks arrive."""
+    buffer = b""
+    async for chunk in _body_chunks(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
 
 
 # url/?spot_id=1&slot_id=2
 @router.get("/", response_model=None)
-def get_payment_by_spot_and_slot(
+async def get_payment_by_spot_and_slot(
     spot_id: int = Query(..., description="Spot ID"),
     slot_id: int = Query(..., description="Slot ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    payment = crud.get_payment_by_spot_and_slot(db, spot_id, slot_id)
+    payment = await crud.get_payment_by_spot_and_slot_async(db, spot_id, slot_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Data not found")
     
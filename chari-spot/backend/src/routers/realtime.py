@@ -0,0 +1,124 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import auth, pubsub
+from app.database import get_async_read_db
+from app.responses import dump_json
+
+# WebSocket / EventSource はヘッダを付けられないため，トークンはクエリで受け取る
+router = APIRouter(tags=["parking"], prefix="/parking")
+
+MAX_SUBSCRIBED_IDS = 500
+# SSE keep-alive so proxies do not close idle streams
+KEEPALIVE_SECONDS = 15.0
+
+
+def _subscribe(
+    min_lat: Optional[float],
+    min_lon: Optional[float],
+    max_lat: Optional[float],
+    max_lon: Optional[float],
+    ids: Optional[list[int]],
+) -> pubsub.Subscription:
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    if ids:
+        if len(ids) > MAX_SUBSCRIBED_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_SUBSCRIBED_IDS} ids per subscription")
+        return pubsub.get_broker().subscribe(ids=ids)
+    if None in bbox:
+        raise HTTPException(status_code=400, detail="Give either ids or min_lat, min_lon, max_lat and max_lon")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Invalid bounding box.")
+    return pubsub.get_broker().subscribe(bbox=bbox)
+
+
+# 空き状況の差分を WebSocket で配信（bbox または ids で購読）
+@router.websocket("/ws")
+async def parking_updates_ws(
+    websocket: WebSocket,
+    token: str,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    ids: Optional[list[int]] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if await auth.resolve_token(db, token) is None:
+        await websocket.close(code=1008)
+        return
+    await db.close()  # do not hold a pooled connection for the lifetime of the socket
+    try:
+        subscription = _subscribe(min_lat, min_lon, max_lat, max_lon, ids)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+
+    async def watch_disconnect():
+        # Clients only listen; any message or the close frame ends the loop.
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while not watcher.done():
+            batch = asyncio.create_task(subscription.next_batch())
+            await asyncio.wait({batch, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not batch.done():
+                batch.cancel()
+                break
+            message = batch.result()
+            if message is None:
+                break
+            # A slow client makes this await; meanwhile updates coalesce in the subscription.
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        pubsub.get_broker().unsubscribe(subscription)
+
+
+# 空き状況の差分を Server-Sent Events で配信
+@router.get("/stream")
+async def parking_updates_sse(
+    request: Request,
+    token: str,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    ids: Optional[list[int]] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if await auth.resolve_token(db, token) is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    await db.close()
+    subscription = _subscribe(min_lat, min_lon, max_lat, max_lon, ids)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.next_batch(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield b"event: %s\ndata: %s\n\n" % (message["type"].encode(), dump_json(message))
+        finally:
+            pubsub.get_broker().unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
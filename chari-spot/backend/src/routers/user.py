@@ -1,56 +1,45 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse  # ✅ 追加
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas import user
+from schemas.user import UserResponse
 from crud import user as crud
 from app import auth
-from app.database import get_db
+from app.responses import json_response
+from app.database import get_async_db
 from models import user as models
 
 router = APIRouter(tags=["user"])
 
 
 @router.post("/user/register", response_model=user.UserResponse)
-def register_user(user: user.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register_user(user: user.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await crud.get_user_by_email_async(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    created_user = crud.create_user(db, user)
-    return JSONResponse(
-        content={
-            "id": created_user.id,
-            "username": created_user.username,
-            "email": created_user.email,
-        },
-        media_type="application/json; charset=utf-8"
-    )
+    created_user = await crud.create_user_async(db, user)
+    return json_response(created_user, UserResponse, from_attributes=True)
 
 
 @router.get("/user/verify", response_model=None)
-def verify_user(
+async def verify_user(
     pwd: str,
-    db: Session = Depends(get_db),
     user: models.User = Depends(auth.get_current_user)
 ):
-    user_obj = crud.get_user(db, user.id)  # Ensure user exists
-
-    res = auth.verify_password(pwd, user_obj.password)
+    # get_current_user already resolved (and cached) the user
+    res = await auth.verify_password_async(pwd, user.password)
 
-    return JSONResponse(
-        content={"exists": res},
-        media_type="application/json; charset=utf-8"
-    )
+    return json_response({"exists": res})
 
 
 @router.post("/user/login", response_model=user.Token)
 async def login_for_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user_obj = auth.authenticate_user(db, form_data.username, form_data.password)
+    user_obj = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user_obj:
         raise HTTPException(
             status_code=401,
@@ -61,48 +50,28 @@ async def login_for_token(
         data={"user_id": user_obj.id},
         expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES),
     )
-    return JSONResponse(
-        content={"access_token": access_token, "token_type": "bearer"},
-        media_type="application/json; charset=utf-8"
-    )
+    return json_response({"access_token": access_token, "token_type": "bearer"})
 
 
 @router.get("/user/get")
-def get_user(db: Session = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
-    user_obj = crud.get_user(db, user.id)
-    return JSONResponse(
-        content={
-            "id": user_obj.id,
-            "username": user_obj.username,
-            "email": user_obj.email,
-        },
-        media_type="application/json; charset=utf-8"
-    )
+async def get_user(user: models.User = Depends(auth.get_current_user)):
+    return json_response(user, UserResponse, from_attributes=True)
 
 
 @router.post("/user/update")
-def update_user(
+async def update_user(
     user_up: user.UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(auth.get_current_user)
 ):
     user_up.id = user.id
-    user_up.password = auth.get_password_hash(user_up.password)
-    updated_user = crud.update_user(db, user_up)
-    return JSONResponse(
-        content={
-            "id": updated_user.id,
-            "username": updated_user.username,
-            "email": updated_user.email,
-        },
-        media_type="application/json; charset=utf-8"
-    )
+    if user_up.password is not None:
+        user_up.password = await auth.get_password_hash_async(user_up.password)
+    updated_user = await crud.update_user_async(db, user_up)
+    return json_response(updated_user, UserResponse, from_attributes=True)
 
 
 @router.delete("/user/delete")
-def delete_user(db: Session = Depends(get_db), user: models.User = Depends(auth.get_current_user)):
-    crud.delete_user(db, user.id)
-    return JSONResponse(
-        content={"message": "ユーザーを削除しました"},
-        media_type="application/json; charset=utf-8"
-    )
\ No newline at end of file
+async def delete_user(db: AsyncSession = Depends(get_async_db), user: models.User = Depends(auth.get_current_user)):
+    await crud.delete_user_async(db, user.id)
+    return json_response({"message": "ユーザーを削除しました"})
\ No newline at end of file
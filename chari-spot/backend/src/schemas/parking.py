@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
 class ParkingCreate(BaseModel):
@@ -6,8 +6,7 @@ class ParkingCreate(BaseModel):
     address: str
     latitude: float
     longitude: float
-    avail_slots: int
-    total_slots: int
+    total_slots: int  # avail_slots is derived from total_slots and the parked payments
     owner_id: int
 
 class ParkingUpdate(BaseModel):
@@ -16,7 +15,6 @@ class ParkingUpdate(BaseModel):
     address:      Optional[str]     = None
     latitude:     Optional[float]   = None
     longitude:    Optional[float]   = None
-    avail_slots:  Optional[int]     = None
     total_slots:  Optional[int]     = None
     owner_id:     Optional[int]     = None
 
@@ -33,6 +31,32 @@ class ParkingResponse(BaseModel):
     model_config = ConfigDict(from_attributes = True)
 
 class NearbySearchRequest(BaseModel):
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    radius_km: float = Field(default=1.0, gt=0, le=50)  # default radius of 1 km
+    limit: Optional[int] = Field(default=None, ge=1)
+
+class NearbyParkingResponse(ParkingResponse):
+    distance_km: float
+
+class ViewportRequest(BaseModel):
+    min_lat: float = Field(ge=-90, le=90)
+    min_lon: float = Field(ge=-180, le=180)
+    max_lat: float = Field(ge=-90, le=90)
+    max_lon: float = Field(ge=-180, le=180)
+    zoom: int = Field(ge=0, le=22)
+
+class ParkingCluster(BaseModel):
+    count: int
     latitude: float
     longitude: float
-    radius_km: float = 1.0  # default radius of 1 km
\ No newline at end of file
+    avail_slots: int
+    total_slots: int
+    parking_id: Optional[int] = None  # set when the cluster holds a single lot
+
+    model_config = ConfigDict(from_attributes = True)
+
+class ViewportResponse(BaseModel):
+    zoom: int
+    clusters: list[ParkingCluster] = []
+    parkings: list[ParkingResponse] = []
@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel, ConfigDict
 
 # class PaymentCreate(BaseModel):
@@ -13,3 +15,22 @@ class PaymentResponse(BaseModel):
     paid: bool
 
     model_config = ConfigDict(from_attributes = True)
+
+class PaymentEvent(BaseModel):
+    """One slot state change reported by a camera kiosk."""
+    spot_id: int
+    slot_id: int
+    parked: Optional[bool] = None
+    paid: Optional[bool] = None
+    ts: Optional[datetime] = None  # when the kiosk observed the change
+
+class PaymentEventResult(BaseModel):
+    index: int
+    ok: bool
+    payment: Optional[PaymentResponse] = None
+    detail: Optional[str] = None
+
+class PaymentBatchResponse(BaseModel):
+    applied: int
+    failed: int
+    results: list[PaymentEventResult]
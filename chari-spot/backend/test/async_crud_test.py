@@ -0,0 +1,59 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from models import Base
+from crud import parking as parking_crud
+from crud import payment as payment_crud
+from crud import user as user_crud
+from models.payment import Payment
+from schemas.parking import ParkingCreate, ParkingUpdate
+from schemas.user import UserCreate
+
+
+def run_with_session(test):
+    """
+    Run an async test body against a fresh in-memory aiosqlite database.
+    """
+    async def runner():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        try:
+            async with session_factory() as session:
+                await test(session)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(runner())
+
+
+def test_async_crud_round_trip():
+    async def body(db):
+        user = await user_crud.create_user_async(db, UserCreate(
+            username="owner", email="owner@example.com", password="secret"
+        ))
+        assert (await user_crud.get_user_by_email_async(db, "owner@example.com")).id == user.id
+
+        parking = await parking_crud.create_parking_async(db, ParkingCreate(
+            name="Lot A", address="123 Main St", latitude=35.68, longitude=139.76,
+            avail_slots=5, total_slots=10, owner_id=user.id
+        ))
+        updated = await parking_crud.update_slot_async(db, ParkingUpdate(id=parking.id, name="Lot B"))
+        assert updated.name == "Lot B"
+        assert [p.id for p in await parking_crud.get_parkings_async(db)] == [parking.id]
+
+        hits = await parking_crud.get_parkings_nearby_async(db, 35.68, 139.76, 1.0)
+        assert [p.id for p, _ in hits] == [parking.id]
+
+        await payment_crud.create_payment_async(db, Payment(spot_id=parking.id, slot_id=1, parked=True, paid=False))
+        paid = await payment_crud.update_payment_async(db, parking.id, 1, paid=True)
+        assert paid.paid is True and paid.parked is True
+
+        assert await parking_crud.delete_slot_async(db, parking.id) is True
+        assert await user_crud.delete_user_async(db, user.id) is True
+        assert await user_crud.get_user_async(db, user.id) is None
+
+    run_with_session(body)
@@ -0,0 +1,49 @@
+from app.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)  # e.g. a token that expires sooner
+
+    clock.now = 10
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    clock.now = 61
+    assert cache.get("a") is None
+    assert cache.stats.as_dict()["hit_ratio"] == 1 / 3
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats.evictions == 1
+
+
+def test_invalidate_tag_drops_entries_and_stale_loads():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("token-1", "alice", tag=1)
+    cache.set("token-2", "alice", tag=1)
+    cache.set("token-3", "bob", tag=2)
+
+    epoch = cache.epoch  # a load of user 1 starts here...
+    cache.invalidate_tag(1)
+    cache.set("token-4", "alice (stale)", tag=1, epoch=epoch)  # ...and finishes after the update
+
+    assert cache.get("token-1") is None and cache.get("token-2") is None
+    assert cache.get("token-4") is None
+    assert cache.get("token-3") == "bob"
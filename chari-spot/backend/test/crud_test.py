@@ -1,18 +1,28 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, update
 from sqlalchemy.orm import sessionmaker
 
 from models import Base
+from app.auth import principal_cache
+from app import pubsub
+from app.clusters import ClusterIndex, cluster_index
+from app.snapshot import parking_snapshots
 from crud.user import (
     create_user, get_user, get_user_by_name, get_user_by_email,
     list_users, update_user, delete_user
 )
 from crud.parking import (
     create_parking, get_parking, get_parkings,
-    update_slot, delete_slot
+    get_parkings_in_bbox, get_parkings_nearby, get_viewport_clusters,
+    reconcile_avail_slots, update_slot, delete_slot
 )
+from crud.payment import get_payment_by_spot_and_slot, update_payment, upsert_payment, upsert_payments
+from models.parking import Parking
+from models.payment import Payment
+from sqlalchemy.exc import IntegrityError
 from schemas.user import UserCreate, UserUpdate
 from schemas.parking import ParkingCreate, ParkingUpdate
+from schemas.payment import PaymentEvent
 
 
 @ pytest.fixture
@@ -101,7 +111,6 @@ def test_parking_crud(db_session):
         address="123 Main St",
         latitude=12.34,
         longitude=56.78,
-        avail_slots=5,
         total_slots=10,
         owner_id=owner.id
     )
@@ -109,6 +118,7 @@ def test_parking_crud(db_session):
 
     assert parking.id is not None
     assert parking.name == "Lot A"
+    assert parking.avail_slots == 10
 
     # Read parking by ID
     fetched = get_parking(db_session, parking.id)
@@ -122,10 +132,11 @@ def test_parking_crud(db_session):
     update_parking = ParkingUpdate(
         id=parking.id,
         name="Lot B",
-        avail_slots=8
+        total_slots=8
     )
     updated = update_slot(db_session, update_parking)
     assert updated.name == "Lot B"
+    assert updated.total_slots == 8
     assert updated.avail_slots == 8
 
     # Delete parking slot
@@ -135,3 +146,339 @@ def test_parking_crud(db_session):
 
     # Deleting non-existent slot returns False
     assert delete_slot(db_session, 999) is False
+
+
+def test_parking_nearby_search(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+
+    # Tokyo Station, ~0.9 km away, ~9 km away and Osaka
+    spots = {
+        "station": (35.6812, 139.7671),
+        "ginza": (35.6717, 139.7650),
+        "shinjuku": (35.6896, 139.7006),
+        "osaka": (34.7025, 135.4959),
+    }
+    for name, (lat, lon) in spots.items():
+        create_parking(db_session, ParkingCreate(
+            name=name, address=name, latitude=lat, longitude=lon,
+            total_slots=1, owner_id=owner.id
+        ))
+
+    hits = get_parkings_nearby(db_session, 35.6812, 139.7671, radius_km=2.0)
+    assert [p.name for p, _ in hits] == ["station", "ginza"]
+    assert hits[0][1] < hits[1][1] < 2.0
+
+    hits = get_parkings_nearby(db_session, 35.6812, 139.7671, radius_km=10.0, limit=2)
+    assert [p.name for p, _ in hits] == ["station", "ginza"]
+
+    in_box = get_parkings_in_bbox(db_session, 35.6, 139.6, 35.7, 139.8)
+    assert {p.name for p in in_box} == {"station", "ginza", "shinjuku"}
+
+    # Moving a slot re-indexes it
+    shinjuku = next(p for p, _ in get_parkings_nearby(db_session, 35.6896, 139.7006, 0.5))
+    update_slot(db_session, ParkingUpdate(id=shinjuku.id, latitude=35.6813, longitude=139.7672))
+    hits = get_parkings_nearby(db_session, 35.6812, 139.7671, radius_km=0.1)
+    assert {p.name for p, _ in hits} == {"station", "shinjuku"}
+
+
+def test_viewport_clusters_follow_writes(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    cluster_index.reset()
+    tokyo = (35.5, 139.5, 35.9, 139.9)
+
+    lots = []
+    for i in range(6):
+        lots.append(create_parking(db_session, ParkingCreate(
+            name=f"lot-{i}", address="x", latitude=35.65 + i * 0.02, longitude=139.7,
+            total_slots=10 + i, owner_id=owner.id
+        )))
+        if i == 2:
+            # Load the index part-way through; later writes are applied incrementally
+            get_viewport_clusters(db_session, *tokyo, zoom=5)
+
+    update_slot(db_session, ParkingUpdate(id=lots[0].id, total_slots=9))
+    update_slot(db_session, ParkingUpdate(id=lots[1].id, latitude=34.70, longitude=135.49))
+    delete_slot(db_session, lots[2].id)
+
+    (cluster,) = get_viewport_clusters(db_session, *tokyo, zoom=5)
+    assert cluster.count == 4
+    assert cluster.avail_slots == 9 + 13 + 14 + 15
+    assert cluster.total_slots == 9 + 13 + 14 + 15
+
+    # Every zoom level matches an index rebuilt from scratch
+    rebuilt = ClusterIndex()
+    rebuilt.ensure_loaded(db_session)
+    for zoom in range(rebuilt.max_zoom + 1):
+        expected = sorted(rebuilt.query(-85, -180, 85, 180, zoom), key=lambda c: (c.latitude, c.longitude))
+        actual = sorted(get_viewport_clusters(db_session, -85, -180, 85, 180, zoom), key=lambda c: (c.latitude, c.longitude))
+        assert [(c.count, c.avail_slots, c.parking_id) for c in actual] == \
+            [(c.count, c.avail_slots, c.parking_id) for c in expected]
+
+    # High zoom splits the cluster into single lots
+    singles = get_viewport_clusters(db_session, *tokyo, zoom=14)
+    assert sorted(c.parking_id for c in singles) == sorted(l.id for l in (lots[0], lots[3], lots[4], lots[5]))
+    cluster_index.reset()
+
+
+def test_payment_upsert(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=2, owner_id=owner.id
+    ))
+
+    # First event creates the row with defaults for missing fields
+    created = upsert_payment(db_session, lot.id, 1)
+    assert (created.parked, created.paid) == (True, False)
+
+    # Later events only touch the given fields
+    paid = upsert_payment(db_session, lot.id, 1, paid=True)
+    assert paid.id == created.id
+    assert (paid.parked, paid.paid) == (True, True)
+    left = upsert_payment(db_session, lot.id, 1, parked=False)
+    assert (left.parked, left.paid) == (False, True)
+
+    # Nothing to change on an existing row
+    assert upsert_payment(db_session, lot.id, 1) is None
+
+    # A new slot can start out vacant
+    other = upsert_payment(db_session, lot.id, 2, parked=False)
+    assert (other.parked, other.paid) == (False, False)
+
+    assert update_payment(db_session, lot.id, 2, paid=True).paid is True
+    assert update_payment(db_session, lot.id, 3, paid=True) is None
+    assert db_session.query(Payment).count() == 2
+    assert get_payment_by_spot_and_slot(db_session, lot.id, 1).parked is False
+
+    # (spot_id, slot_id) is unique
+    db_session.add(Payment(spot_id=lot.id, slot_id=1, parked=True, paid=False))
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_payment_batch_upsert(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=3, owner_id=owner.id
+    ))
+    upsert_payment(db_session, lot.id, 1, parked=True, paid=True)
+
+    payments = upsert_payments(db_session, [
+        # Delivered out of order: the ts order wins, so slot 1 ends up vacant
+        PaymentEvent(spot_id=lot.id, slot_id=1, parked=False, ts="2026-01-01T10:00:05Z"),
+        PaymentEvent(spot_id=lot.id, slot_id=1, parked=True, ts="2026-01-01T10:00:01Z"),
+        # Only paid is given, so parked keeps its stored value
+        PaymentEvent(spot_id=lot.id, slot_id=1, paid=False),
+        # New slots get the single-event defaults for missing fields
+        PaymentEvent(spot_id=lot.id, slot_id=2, paid=True),
+        PaymentEvent(spot_id=lot.id, slot_id=3, parked=False),
+    ])
+
+    assert set(payments) == {(lot.id, 1), (lot.id, 2), (lot.id, 3)}
+    assert (payments[(lot.id, 1)].parked, payments[(lot.id, 1)].paid) == (False, False)
+    assert (payments[(lot.id, 2)].parked, payments[(lot.id, 2)].paid) == (True, True)
+    assert (payments[(lot.id, 3)].parked, payments[(lot.id, 3)].paid) == (False, False)
+    assert db_session.query(Payment).count() == 3
+    assert get_payment_by_spot_and_slot(db_session, lot.id, 1).parked is False
+
+
+def test_user_writes_invalidate_principal_cache(db_session):
+    user = create_user(db_session, UserCreate(
+        username="alice",
+        email="alice@example.com",
+        password="secret"
+    ))
+    principal_cache.set("token", user, tag=user.id)
+
+    update_user(db_session, UserUpdate(id=user.id, username="alice2"))
+    assert principal_cache.get("token") is None
+
+    principal_cache.set("token", user, tag=user.id)
+    delete_user(db_session, user.id)
+    assert principal_cache.get("token") is None
+
+
+def test_writes_publish_deltas(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=2, owner_id=owner.id
+    ))
+    broker = pubsub.InProcessBroker()
+    original = pubsub.get_broker()
+    pubsub.set_broker(broker)
+    try:
+        by_id = broker.subscribe(ids=[lot.id])
+        by_bbox = broker.subscribe(bbox=(34.9, 138.9, 35.1, 139.1))
+
+        update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=1))
+        update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=2))
+        upsert_payment(db_session, lot.id, 1, parked=True)
+
+        events = by_id.drain()["events"]
+        assert [e["type"] for e in events] == ["lot", "slot"]
+        assert events[0]["avail_slots"] == 1  # the parked bike took a slot
+        assert events[1] == {"type": "slot", "parking_id": lot.id, "slot_id": 1, "parked": True, "paid": False}
+
+        # Moving the lot away still reaches the subscribers of the old area
+        by_bbox.drain()
+        update_slot(db_session, ParkingUpdate(id=lot.id, latitude=40.0))
+        assert by_bbox.drain()["events"][0]["latitude"] == 40.0
+        delete_slot(db_session, lot.id)
+        assert by_id.drain()["events"] == [{"type": "lot", "id": lot.id, "deleted": True}]
+    finally:
+        pubsub.set_broker(original)
+
+
+def test_parking_keyset_pages_and_projection(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    ids = [
+        create_parking(db_session, ParkingCreate(
+            name=f"Lot {i}", address="x", latitude=35.0, longitude=139.0,
+            total_slots=i, owner_id=owner.id
+        )).id
+        for i in range(5)
+    ]
+
+    first = get_parkings(db_session, limit=2)
+    second = get_parkings(db_session, limit=2, after_id=first[-1].id)
+    last = get_parkings(db_session, limit=2, after_id=second[-1].id)
+    assert [p.id for p in first + second + last] == ids
+    assert get_parkings(db_session, limit=2, after_id=ids[-1]) == []
+    # skip still works without a cursor
+    assert [p.id for p in get_parkings(db_session, skip=3)] == ids[3:]
+
+    rows = get_parkings(db_session, limit=2, fields=["id", "avail_slots"])
+    assert [row._asdict() for row in rows] == [
+        {"id": ids[0], "avail_slots": 0}, {"id": ids[1], "avail_slots": 1}
+    ]
+    assert [u.id for u in list_users(db_session, after_id=0)] == [owner.id]
+    assert list_users(db_session, after_id=owner.id) == []
+
+
+def test_parking_writes_bump_snapshot_version(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    version = parking_snapshots.version
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=2, owner_id=owner.id
+    ))
+    assert parking_snapshots.version == version + 1
+    update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=1))
+    assert parking_snapshots.version == version + 2
+    delete_slot(db_session, lot.id)
+    assert parking_snapshots.version == version + 3
+
+    # Reads and misses leave it alone
+    get_parkings(db_session)
+    assert update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=0)) is None
+    assert parking_snapshots.version == version + 3
+
+
+def test_payment_writes_bump_snapshot_version_only_when_counters_move(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=2, owner_id=owner.id
+    ))
+    version = parking_snapshots.version
+
+    upsert_payment(db_session, lot.id, 1, parked=True)
+    assert parking_snapshots.version == version + 1
+    # Only paid changes, and a repeated parked event: the counter stays at 1
+    upsert_payment(db_session, lot.id, 1, paid=True)
+    upsert_payments(db_session, [PaymentEvent(spot_id=lot.id, slot_id=1, parked=True, paid=False)])
+    assert parking_snapshots.version == version + 1
+    upsert_payments(db_session, [PaymentEvent(spot_id=lot.id, slot_id=1, parked=False)])
+    assert parking_snapshots.version == version + 2
+    assert get_parking(db_session, lot.id).avail_slots == 2
+
+
+def test_avail_slots_follow_parked_payments(db_session):
+    owner = create_user(db_session, UserCreate(
+        username="owner",
+        email="owner@example.com",
+        password="secret"
+    ))
+    lot = create_parking(db_session, ParkingCreate(
+        name="Lot A", address="x", latitude=35.0, longitude=139.0,
+        total_slots=3, owner_id=owner.id
+    ))
+    cluster_index.reset()
+    get_viewport_clusters(db_session, 34.0, 138.0, 36.0, 140.0, 10)
+
+    upsert_payment(db_session, lot.id, 1)  # a new slot row starts out parked
+    upsert_payment(db_session, lot.id, 2, parked=True)
+    upsert_payment(db_session, lot.id, 2, parked=True)  # repeated event: no change
+    upsert_payment(db_session, lot.id, 1, paid=True)
+    assert get_parking(db_session, lot.id).avail_slots == 1
+
+    upsert_payments(db_session, [
+        PaymentEvent(spot_id=lot.id, slot_id=1, parked=False),
+        PaymentEvent(spot_id=lot.id, slot_id=3, parked=False),
+    ])
+    assert get_parking(db_session, lot.id).avail_slots == 2
+    # The cluster index saw the trigger's change too
+    [cluster] = get_viewport_clusters(db_session, 34.0, 138.0, 36.0, 140.0, 10)
+    assert cluster.avail_slots == 2
+
+    # Owners edit the capacity, not the counter: it is derived again in the same transaction
+    updated = update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=5, avail_slots=5))
+    assert updated.avail_slots == 4
+    [cluster] = get_viewport_clusters(db_session, 34.0, 138.0, 36.0, 140.0, 10)
+    assert (cluster.avail_slots, cluster.total_slots) == (4, 5)
+
+    # Capacity below the bicycles parked now is refused and leaves the lot untouched
+    upsert_payment(db_session, lot.id, 3, parked=True)
+    with pytest.raises(ValueError):
+        update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=1, name="Lot A2"))
+    unchanged = get_parking(db_session, lot.id)
+    assert (unchanged.name, unchanged.total_slots, unchanged.avail_slots) == ("Lot A", 5, 3)
+    assert update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=2)).avail_slots == 0
+    upsert_payment(db_session, lot.id, 3, parked=False)
+    update_slot(db_session, ParkingUpdate(id=lot.id, total_slots=5))
+
+    # Drift from writes that bypassed the triggers is corrected, for lots without payments too
+    empty = create_parking(db_session, ParkingCreate(
+        name="Lot B", address="x", latitude=35.0, longitude=139.0, total_slots=2, owner_id=owner.id
+    ))
+    db_session.execute(update(Parking).values(avail_slots=0))
+    db_session.commit()
+    assert sorted(reconcile_avail_slots(db_session)) == [lot.id, empty.id]
+    assert get_parking(db_session, lot.id).avail_slots == 4
+    assert get_parking(db_session, empty.id).avail_slots == 2
+    assert reconcile_avail_slots(db_session) == []
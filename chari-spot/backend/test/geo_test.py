@@ -0,0 +1,28 @@
+from app import geo
+
+
+def test_geohash_encode_known_value():
+    # Reference value from the original geohash.org implementation
+    assert geo.geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_covering_prefixes_contain_every_point_in_box():
+    box = geo.bounding_box(35.6812, 139.7671, 1.5)
+    prefixes = geo.covering_prefixes(*box)
+    assert prefixes is not None and len(prefixes) <= geo.MAX_COVER_CELLS
+
+    min_lat, min_lon, max_lat, max_lon = box
+    for i in range(11):
+        for j in range(11):
+            lat = min_lat + (max_lat - min_lat) * i / 10
+            lon = min_lon + (max_lon - min_lon) * j / 10
+            assert geo.geohash_encode(lat, lon).startswith(tuple(prefixes))
+
+
+def test_covering_prefixes_whole_world():
+    assert geo.covering_prefixes(-90, -180, 90, 180) is None
+
+
+def test_haversine_km():
+    # Tokyo Station to Osaka Station is roughly 403 km as the crow flies
+    assert 400 < geo.haversine_km(35.6812, 139.7671, 34.7025, 135.4959) < 406
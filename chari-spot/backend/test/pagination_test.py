@@ -0,0 +1,21 @@
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor, parse_fields
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(1)[:-1] + "!"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_parse_fields_keeps_model_order_and_id():
+    allowed = ["id", "name", "latitude", "longitude"]
+    assert parse_fields("longitude, name", allowed) == ["id", "name", "longitude"]
+    assert parse_fields(None, allowed) is None
+    with pytest.raises(ValueError):
+        parse_fields("name,password", allowed)
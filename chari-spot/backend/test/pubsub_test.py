@@ -0,0 +1,102 @@
+import asyncio
+import random
+import threading
+import time
+
+from app import pubsub
+from app.pubsub import Delta, InProcessBroker
+
+
+def lot_delta(parking_id, latitude, longitude, avail_slots, previous=None):
+    return Delta(
+        key=("lot", parking_id), parking_id=parking_id, latitude=latitude, longitude=longitude,
+        payload={"type": "lot", "id": parking_id, "avail_slots": avail_slots},
+        previous=previous,
+    )
+
+
+def test_5k_subscribers_receive_coalesced_deltas():
+    rng = random.Random(1)
+    lots = {i: (rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)) for i in range(1, 201)}
+
+    async def main():
+        broker = InProcessBroker()
+        subs = []
+        for i in range(5000):
+            if i % 5 == 0:
+                subs.append(broker.subscribe(ids=rng.sample(sorted(lots), 5), coalesce_seconds=0.01))
+            else:
+                lat, lon = rng.uniform(35.5, 35.9), rng.uniform(139.5, 139.9)
+                size = rng.choice([0.01, 0.05, 0.2, 5.0])  # the widest boxes skip the grid
+                subs.append(broker.subscribe(bbox=(lat, lon, lat + size, lon + size), coalesce_seconds=0.01))
+
+        # A burst of 10 updates per lot, half of it published from another thread
+        deltas = [lot_delta(i, *lots[i], avail) for avail in range(10) for i in lots]
+        worker = threading.Thread(target=lambda: [broker.publish(d) for d in deltas[::2]])
+        worker.start()
+        for d in deltas[1::2]:
+            broker.publish(d)
+        worker.join()
+
+        notified = [s for s in subs if s.pending]
+        started = time.perf_counter()
+        messages = await asyncio.wait_for(asyncio.gather(*(s.next_batch() for s in notified)), timeout=30)
+        assert time.perf_counter() - started < 10
+        received = {id(s): m for s, m in zip(notified, messages)}
+
+        for sub in subs:
+            expected = {i for i, (lat, lon) in lots.items() if sub.matches(i, lat, lon)}
+            message = received.get(id(sub))
+            if not expected:
+                assert message is None
+                continue
+            events = message["events"]
+            # One event per lot, carrying the last published state
+            assert sorted(e["id"] for e in events) == sorted(expected)
+            assert all(e["avail_slots"] == 9 for e in events)
+
+        for sub in subs:
+            broker.unsubscribe(sub)
+        assert not broker.has_subscribers()
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_is_told_to_resync():
+    broker = InProcessBroker()
+    sub = broker.subscribe(bbox=(35.0, 139.0, 36.0, 140.0), max_pending=10)
+    for i in range(50):
+        broker.publish(lot_delta(i, 35.5, 139.5, 1))
+    assert len(sub.pending) <= 10
+    assert sub.drain() == {"type": "resync"}
+
+    broker.publish(lot_delta(1, 35.5, 139.5, 3))
+    assert sub.drain() == {"type": "updates", "events": [{"type": "lot", "id": 1, "avail_slots": 3}]}
+
+
+def test_lot_moving_out_of_bbox_is_delivered():
+    broker = InProcessBroker()
+    sub = broker.subscribe(bbox=(35.0, 139.0, 35.1, 139.1))
+    broker.publish(lot_delta(7, 34.0, 135.0, 1, previous=(35.05, 139.05)))
+    assert sub.drain()["events"][0]["id"] == 7
+
+
+def test_set_broker_swaps_the_backend():
+    class RecordingBroker(pubsub.Broker):
+        def __init__(self):
+            self.published = []
+
+        def publish(self, delta):
+            self.published.append(delta)
+
+        def has_subscribers(self):
+            return True
+
+    original = pubsub.get_broker()
+    stand_in = RecordingBroker()
+    pubsub.set_broker(stand_in)
+    try:
+        pubsub.get_broker().publish(lot_delta(1, 35.0, 139.0, 1))
+        assert len(stand_in.published) == 1
+    finally:
+        pubsub.set_broker(original)
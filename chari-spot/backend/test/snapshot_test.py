@@ -0,0 +1,41 @@
+from app.snapshot import VersionedSnapshots
+
+
+def test_bodies_are_served_for_their_version_only():
+    snapshots = VersionedSnapshots()
+    version = snapshots.version
+    snapshots.put(version, "all", b"[]", {"ETag": snapshots.etag(version)})
+    assert snapshots.get(version, "all") == (b"[]", {"ETag": snapshots.etag(version)})
+
+    snapshots.bump()
+    assert snapshots.get(version, "all") is None
+    assert snapshots.get(snapshots.version, "all") is None
+    assert snapshots.etag(snapshots.version) != snapshots.etag(version)
+
+
+def test_body_read_before_a_write_is_not_stored():
+    snapshots = VersionedSnapshots()
+    version = snapshots.version  # a request reads the version and queries...
+    snapshots.bump()  # ...while a write commits
+    snapshots.put(version, "all", b"[stale]", {})
+    assert snapshots.get(snapshots.version, "all") is None
+
+
+def test_etags_differ_between_processes():
+    assert VersionedSnapshots().etag(0) != VersionedSnapshots().etag(0)
+
+
+def test_least_recently_used_body_is_evicted():
+    snapshots = VersionedSnapshots(maxsize=2)
+    for key in ("a", "b", "c"):
+        snapshots.put(0, key, key.encode(), {})
+    assert snapshots.get(0, "a") is None
+    assert snapshots.get(0, "c") == (b"c", {})
+
+
+def test_resource_etags_only_match_their_resource():
+    snapshots = VersionedSnapshots()
+    version = snapshots.version
+    assert snapshots.etag(version, 1) != snapshots.etag(version, 2)
+    assert snapshots.etag(version, 1) != snapshots.etag(version)
+    assert snapshots.etag(version, 1) == snapshots.etag(version, 1)
@@ -0,0 +1,84 @@
+"""
+Benchmark: startup time, latency per frame and memory of each inference backend.
+
+Each model in --models is loaded in a fresh Python process through
+BicycleDetector (the backend is chosen by extension: .pt runs on
+ultralytics/PyTorch, .onnx on onnxruntime), so the startup time includes
+importing the runtime. The child reports:
+  * startup: import + model load,
+  * first: the first predict() (lazy initialization, allocations),
+  * latency: median and p90 of --frames predict() calls on a --width x
+    --height frame,
+  * RSS: peak resident memory of the process.
+Export the ONNX models first with app.export_model.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_backends.py --models yolov8n.pt yolov8n.onnx yolov8n-int8.onnx
+    PYTHONPATH=src python benchmarks/bench_backends.py --models yolov8n.onnx --imgsz 320
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def child(args) -> None:
+    started = time.perf_counter()
+    import numpy
+    from utils.bicycle_detector import BicycleDetector
+
+    detector = BicycleDetector(args.child, imgsz=args.imgsz, announce_once=False)
+    startup = time.perf_counter() - started
+    frame = numpy.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=numpy.uint8)
+    started = time.perf_counter()
+    detector.predict(frame)
+    first = time.perf_counter() - started
+    latencies = []
+    for _ in range(args.frames):
+        started = time.perf_counter()
+        detector.predict(frame)
+        latencies.append(time.perf_counter() - started)
+    print(json.dumps({
+        "startup": startup,
+        "first": first,
+        "p50": float(numpy.median(latencies)),
+        "p90": float(numpy.percentile(latencies, 90)),
+        # kilobytes on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["yolov8n.pt"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"{args.width}x{args.height} frames, imgsz {args.imgsz}")
+    for model in args.models:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", model, "--imgsz", str(args.imgsz), "--frames", str(args.frames),
+             "--width", str(args.width), "--height", str(args.height)],
+            capture_output=True, text=True,
+        )
+        if output.returncode != 0:
+            print(f"{model}: failed\n{output.stderr[-2000:]}")
+            continue
+        r = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{model:>32} | startup {r['startup']:5.2f} s | first {r['first'] * 1000:6.1f} ms | "
+            f"p50 {r['p50'] * 1000:6.1f} ms | p90 {r['p90'] * 1000:6.1f} ms | RSS {r['rss_mb']:6.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: age of the frames a slow consumer gets from CameraManager.
+
+A stand-in live camera produces --fps frames per second into --driver-buffers
+driver buffers, dropping new frames while they are all full, as V4L2 does.
+A consumer takes --process-ms per frame (detection, drawing, ...) and reads:
+  * sync: get_frames() reads the next buffered frame on the consumer thread,
+  * threaded: a grabber thread drains the driver and get_frames() returns
+    the latest frame.
+Reports delivered frames, frames the grabber overwrote, and the age of each
+frame when handed over (time since the camera produced it). Also times
+get_frames() on a --width x --height frame with and without a preallocated
+out= array, with a camera fast enough that it never waits.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_camera.py
+    PYTHONPATH=src python benchmarks/bench_camera.py --fps 30 --process-ms 150 --driver-buffers 8
+"""
+import argparse
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy
+
+from utils.camera_manager import CameraManager
+
+
+class LiveCapture:
+    """cv2.VideoCapture stand-in that keeps producing frames like a camera."""
+
+    def __init__(self, width: int, height: int, fps: float, buffers: int):
+        self.width, self.height, self.fps = width, height, fps
+        self.queue = deque()
+        self.buffers = buffers
+        self.produced_at = {}
+        self.condition = threading.Condition()
+        self.opened = True
+        self.base = numpy.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=numpy.uint8)
+        threading.Thread(target=self._produce, daemon=True).start()
+
+    def _produce(self):
+        index, next_at = 0, time.monotonic()
+        while self.opened:
+            next_at += 1 / self.fps
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            index += 1
+            with self.condition:
+                if len(self.queue) < self.buffers:
+                    self.produced_at[index] = time.monotonic()
+                    self.queue.append(index)
+                    self.condition.notify()
+
+    def read(self, image=None):
+        with self.condition:
+            self.condition.wait_for(lambda: self.queue or not self.opened)
+            if not self.queue:
+                return False, None
+            index = self.queue.popleft()
+        if image is None or image.shape != self.base.shape:
+            image = numpy.empty_like(self.base)
+        numpy.copyto(image, self.base)
+        # row 0 carries the frame index (unchanged by a horizontal flip)
+        image[0, :] = (index & 0xFF, (index >> 8) & 0xFF, (index >> 16) & 0xFF)
+        return True, image
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                cv2.CAP_PROP_FPS: self.fps}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+        with self.condition:
+            self.condition.notify_all()
+
+
+def make_camera(args, threaded: bool) -> CameraManager:
+    live = LiveCapture(args.width, args.height, args.fps, args.driver_buffers)
+
+    class LiveCamera(CameraManager):
+        def _open(self):
+            return live
+
+    return LiveCamera(threaded=threaded)
+
+
+def consume(args, threaded: bool):
+    camera = make_camera(args, threaded)
+    live = camera.capture
+    ages = []
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        frame = camera.get_frames()
+        if frame is None:
+            continue
+        b0, b1, b2 = frame[0, 0].tolist()
+        ages.append(time.monotonic() - live.produced_at[b0 | b1 << 8 | b2 << 16])
+        time.sleep(args.process_ms / 1000)
+    camera.release()
+    return camera.stats, numpy.array(ages) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--process-ms", type=float, default=120.0)
+    parser.add_argument("--driver-buffers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    for label, threaded in (("sync", False), ("threaded", True)):
+        stats, ages = consume(args, threaded)
+        print(
+            f"{label:>8} | delivered {stats.delivered:4d} | overwritten {stats.dropped:4d} | "
+            f"frame age p50 {numpy.median(ages):6.1f} ms | max {ages.max():6.1f} ms"
+        )
+
+    # A camera fast enough that get_frames() never waits, to time the copy/flip alone.
+    args.fps, args.driver_buffers = 1e6, 64
+    camera = make_camera(args, threaded=False)
+    out = numpy.empty((args.height, args.width, 3), dtype=numpy.uint8)
+    for label, kwargs in (("new array", {}), ("out=", {"out": out})):
+        camera.get_frames(**kwargs)
+        started = time.perf_counter()
+        for _ in range(200):
+            camera.get_frames(**kwargs)
+        print(f"get_frames {label:>9} | {(time.perf_counter() - started) / 200 * 1000:5.2f} ms/frame")
+    camera.release()
+
+
+if __name__ == "__main__":
+    main()
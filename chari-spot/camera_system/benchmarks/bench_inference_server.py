@@ -0,0 +1,105 @@
+"""
+Benchmark: N independent detectors vs one shared model behind InferenceServer.
+
+N camera threads request inference back to back for --seconds (as the infer
+stage of each camera pipeline does when inference is the bottleneck):
+  * independent: every camera owns a model instance and calls predict(frame),
+  * server: all cameras call InferenceServer.predict(camera, frame), which
+    runs one predict_batch() per micro-batch on a single shared model.
+Reports the total frames/sec across all cameras and the mean batch size.
+
+By default the model is a stand-in: two dense layers over a 64x64 downscale
+in NumPy, so CPU batching effects (weights read once per batch instead of
+once per frame) are real but the absolute numbers are not YOLO's. Pass
+--model yolov8n.pt to measure BicycleDetector itself (needs ultralytics).
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_inference_server.py
+    PYTHONPATH=src python benchmarks/bench_inference_server.py --cameras 8 --batch 8 --model yolov8n.pt
+"""
+import argparse
+import threading
+import time
+
+import cv2
+import numpy
+
+from utils.inference_server import InferenceServer
+
+WIDTH, HEIGHT = 640, 360
+
+
+class DenseStandIn:
+    """predict/predict_batch with the shape of BicycleDetector's, backed by NumPy matmuls."""
+
+    def __init__(self, seed: int = 0):
+        rng = numpy.random.default_rng(seed)
+        self.w1 = rng.standard_normal((64 * 64 * 3, 2048), dtype=numpy.float32) * 0.01
+        self.w2 = rng.standard_normal((2048, 84), dtype=numpy.float32) * 0.01
+
+    def predict_batch(self, frames):
+        x = numpy.stack([cv2.resize(frame, (64, 64)) for frame in frames]).reshape(len(frames), -1)
+        hidden = numpy.maximum(x.astype(numpy.float32) / 255 @ self.w1, 0)
+        scores = hidden @ self.w2
+        return [(bool(row.max() > 1e9), []) for row in scores]
+
+    def predict(self, frame):
+        return self.predict_batch([frame])[0]
+
+
+def make_model(path):
+    if path is None:
+        return DenseStandIn()
+    from utils.bicycle_detector import BicycleDetector
+    return BicycleDetector(model_path=path)
+
+
+def run_cameras(cameras: int, seconds: float, predict_for) -> int:
+    """Run one thread per camera calling predict_for(camera)(frame); return frames done."""
+    rng = numpy.random.default_rng(1)
+    frames = [rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=numpy.uint8) for _ in range(cameras)]
+    counts = [0] * cameras
+    deadline = time.monotonic() + seconds
+
+    def camera(i):
+        predict = predict_for(i)
+        while time.monotonic() < deadline:
+            predict(frames[i])
+            counts[i] += 1
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=8, help="max_batch_size of the server")
+    parser.add_argument("--wait-ms", type=float, default=20.0, help="max_wait_ms of the server")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    models = [make_model(args.model) for _ in range(args.cameras)]
+    done = run_cameras(args.cameras, args.seconds, lambda i: models[i].predict)
+    print(f"{'independent':>11} | {args.cameras} models | {done / args.seconds:7.1f} frames/s")
+    shared = models[0]
+    del models
+
+    server = InferenceServer(shared.predict_batch, max_batch_size=args.batch, max_wait_ms=args.wait_ms)
+    server.start()
+    done = run_cameras(args.cameras, args.seconds, lambda i: lambda frame: server.predict(i, frame))
+    server.stop()
+    stats = server.stats.as_dict()
+    print(
+        f"{'server':>11} | 1 model  | {done / args.seconds:7.1f} frames/s "
+        f"| mean batch {stats['avg_batch_size']:.1f} | mean wait {stats['avg_wait_ms']:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: share of frames MotionGate skips and the CPU time it saves.
+
+Runs a clip through two loops and compares process CPU time:
+  * every frame: the model is called on each frame,
+  * gated: MotionGate.should_infer() decides, skipped frames reuse the
+    previous detections.
+Without --video a synthetic parking-camera clip is generated and encoded
+to mp4 first: a static textured scene with sensor noise and slow lighting
+drift, where a bicycle-sized object rides in, stays parked and leaves
+every 20 s. The model is the NumPy stand-in of bench_inference_server
+unless --model is given (needs ultralytics).
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_motion_gate.py
+    PYTHONPATH=src python benchmarks/bench_motion_gate.py --video output/20250101_120000/output.mp4 --model yolov8n.pt
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy
+
+from bench_inference_server import make_model
+from utils.motion_gate import MotionGate
+
+WIDTH, HEIGHT, FPS = 640, 360, 20
+
+
+def synthesize(path: Path, seconds: float) -> None:
+    rng = numpy.random.default_rng(0)
+    scene = cv2.GaussianBlur(rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=numpy.uint8), (0, 0), 3)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for i in range(int(seconds * FPS)):
+        t = i / FPS
+        frame = cv2.convertScaleAbs(scene, alpha=1.0, beta=10 * numpy.sin(t / 30))
+        phase = t % 20
+        # 0-2 s: ride in, 2-12 s: parked, 12-14 s: ride out, then empty
+        if phase < 14:
+            x = int(min(phase, 2) / 2 * 300) if phase < 12 else int(300 + (phase - 12) / 2 * 340)
+            cv2.rectangle(frame, (x, 180), (x + 120, 260), (40, 40, 200), -1)
+        noise = rng.normal(0, 3, frame.shape)
+        writer.write(numpy.clip(frame + noise, 0, 255).astype(numpy.uint8))
+    writer.release()
+
+
+def frames_of(path: Path):
+    capture = cv2.VideoCapture(str(path))
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield frame
+    capture.release()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", type=Path, default=None)
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of the synthetic clip")
+    parser.add_argument("--threshold", type=float, default=0.01)
+    parser.add_argument("--method", choices=["diff", "mog2"], default="diff")
+    parser.add_argument("--keyframe-interval", type=float, default=5.0)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    model = make_model(args.model)
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if video is None:
+            video = Path(tmp) / "sample.mp4"
+            synthesize(video, args.seconds)
+        fps = cv2.VideoCapture(str(video)).get(cv2.CAP_PROP_FPS) or FPS
+
+        started = time.process_time()
+        frames = 0
+        for frame in frames_of(video):
+            model.predict(frame)
+            frames += 1
+        every_frame = time.process_time() - started
+
+        gate = MotionGate(threshold=args.threshold, keyframe_interval=args.keyframe_interval, method=args.method)
+        started = time.process_time()
+        for i, frame in enumerate(frames_of(video)):
+            if gate.should_infer(frame, now=i / fps):
+                model.predict(frame)
+        gated = time.process_time() - started
+
+    stats = gate.stats.as_dict()
+    print(f"{frames} frames ({frames / fps:.0f} s of video)")
+    print(
+        f"gate: triggered {stats['triggered']} | keyframes {stats['keyframes']} | skipped {stats['skipped']} "
+        f"({stats['skip_ratio']:.1%}) | check {stats['avg_check_ms']:.2f} ms/frame"
+    )
+    print(f"CPU every frame {every_frame:6.2f} s | gated {gated:6.2f} s | saved {1 - gated / every_frame:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: offline analysis throughput relative to real time.
+
+Generates --files synthetic clips (see bench_motion_gate) and analyzes them:
+  * naive: one file after another, every frame decoded and run through
+    predict() one at a time, as the live loop would,
+  * analyzer: OfflineAnalyzer with --stride, --batch-size and --workers
+    decoding threads.
+Reports analyzed frames/sec and the real-time factor (seconds of video per
+second of wall time). The model is the NumPy stand-in unless --model is
+given (needs ultralytics).
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_offline_analysis.py
+    PYTHONPATH=src python benchmarks/bench_offline_analysis.py --files 4 --model yolov8n.pt
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from bench_inference_server import make_model
+from bench_motion_gate import frames_of, synthesize
+from utils.offline_analyzer import OfflineAnalyzer
+
+
+class WithPreprocess:
+    """Adds BicycleDetector's preprocess to the stand-in model."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def preprocess(self, frame):
+        return frame
+
+    def predict(self, frame):
+        return self.model.predict(frame)
+
+    def predict_batch(self, frames):
+        return self.model.predict_batch(frames)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of each clip")
+    parser.add_argument("--stride", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    model = make_model(args.model)
+    detector = model if hasattr(model, "preprocess") else WithPreprocess(model)
+    if hasattr(detector, "if_announce_done"):
+        detector.if_announce_done = True
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.files):
+            files.append(Path(tmp) / f"clip{i}.mp4")
+            synthesize(files[-1], args.seconds)
+        video_seconds = sum(
+            cv2.VideoCapture(str(f)).get(cv2.CAP_PROP_FRAME_COUNT) / cv2.VideoCapture(str(f)).get(cv2.CAP_PROP_FPS)
+            for f in files
+        )
+
+        started = time.monotonic()
+        frames = 0
+        for path in files:
+            for frame in frames_of(path):
+                detector.predict(frame)
+                frames += 1
+        naive = time.monotonic() - started
+        print(f"{'naive':>8} | {frames:5d} frames | {frames / naive:6.1f} fps | {video_seconds / naive:5.1f}x real time")
+
+        analyzer = OfflineAnalyzer(
+            detector, stride=args.stride, batch_size=args.batch_size, decode_workers=args.workers, log_interval=1e9
+        )
+        started = time.monotonic()
+        table = analyzer.run(files)
+        elapsed = time.monotonic() - started
+        table.save(Path(tmp) / "analysis.npz")
+        analyzed = analyzer.stats.analyzed
+        print(
+            f"{'analyzer':>8} | {analyzed:5d} frames | {analyzed / elapsed:6.1f} fps | "
+            f"{video_seconds / elapsed:5.1f}x real time (stride {args.stride}, batch {args.batch_size}, "
+            f"{args.workers} decoders)"
+        )
+
+
+if __name__ == "__main__":
+    main()
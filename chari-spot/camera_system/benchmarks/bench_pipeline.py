@@ -0,0 +1,135 @@
+"""
+Benchmark: recorded frame rate with a detector slower than the camera.
+
+A synthetic camera yields --fps frames per second and a stand-in detector
+takes --infer-ms per frame. Two loops run for --seconds each:
+  * inline: capture -> detect -> draw -> write on one thread, as App.run did,
+  * pipeline: App.build_pipeline, where inference only sees the latest frame
+    and every captured frame is annotated and recorded.
+Reports captured/inferred/recorded frames and the recorded FPS. No model is
+loaded; the stand-in only sleeps, so this measures the scheduling, not YOLO.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_pipeline.py
+    PYTHONPATH=src python benchmarks/bench_pipeline.py --fps 30 --infer-ms 120 --seconds 10
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy
+
+from app.main import App
+from utils.event_recorder import EventRecorder, RecordingConfig
+from utils.video_recorder import VideoRecorder
+
+WIDTH, HEIGHT = 320, 180
+
+
+class SyntheticCapture:
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    def isOpened(self):
+        return time.monotonic() < self.deadline
+
+
+class SyntheticCamera:
+    """Paces get_frames() at the camera FPS like a real device."""
+
+    def __init__(self, fps: float, seconds: float):
+        self.fps = fps
+        self.width, self.height = WIDTH, HEIGHT
+        self.capture = SyntheticCapture(seconds)
+        self.frames = 0
+        self.captured_at = None
+        self._next = time.monotonic()
+        self._rng = numpy.random.default_rng(0)
+
+    def get_frames(self):
+        self._next += 1 / self.fps
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.frames += 1
+        self.captured_at = time.monotonic()
+        return self._rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=numpy.uint8)
+
+
+class SlowDetector:
+    """Same interface as BicycleDetector's preprocess/predict/draw_boxes."""
+
+    def __init__(self, infer_ms: float):
+        self.infer_seconds = infer_ms / 1000
+        self.inferred = 0
+
+    def preprocess(self, frame):
+        return frame
+
+    def predict(self, frame):
+        time.sleep(self.infer_seconds)
+        self.inferred += 1
+        return True, [(10, 10, 60, 60)]
+
+    def draw_boxes(self, frame, bboxes):
+        for (x1, y1, x2, y2) in bboxes:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+
+
+def count_frames(path: Path) -> int:
+    capture = cv2.VideoCapture(str(path))
+    frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return frames
+
+
+def run_inline(tmp: Path, fps: float, infer_ms: float, seconds: float):
+    camera, detector = SyntheticCamera(fps, seconds), SlowDetector(infer_ms)
+    recorder = VideoRecorder(tmp, "inline.mp4", WIDTH, HEIGHT, fps)
+    while camera.capture.isOpened():
+        frame = camera.get_frames()
+        _, bboxes = detector.predict(frame)
+        detector.draw_boxes(frame, bboxes)
+        recorder.write_frames(frame)
+    recorder.release()
+    return camera.frames, detector.inferred, count_frames(tmp / "inline.mp4")
+
+
+def run_pipeline(tmp: Path, fps: float, infer_ms: float, seconds: float):
+    camera, detector = SyntheticCamera(fps, seconds), SlowDetector(infer_ms)
+    (tmp / "pipeline").mkdir()
+    app = App.model_construct(
+        camera_manager=camera,
+        video_recorder=EventRecorder(tmp / "pipeline", "pipeline.mp4", fps, RecordingConfig(mode="continuous")),
+        record_buffer_seconds=2.0,
+    )
+    pipeline, display_buffer = app.build_pipeline(detector)
+    pipeline.start()
+    while display_buffer.get(timeout=0.1) is not None or not display_buffer.closed:
+        pass
+    pipeline.stop()
+    app.video_recorder.release()
+    pipeline.log_stats()
+    return camera.frames, detector.inferred, sum(map(count_frames, (tmp / "pipeline").iterdir()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("--infer-ms", type=float, default=150.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run in (("inline", run_inline), ("pipeline", run_pipeline)):
+            captured, inferred, recorded = run(Path(tmp), args.fps, args.infer_ms, args.seconds)
+            print(
+                f"{label:>8} | captured {captured:4d} | inferred {inferred:4d} | recorded {recorded:4d} "
+                f"| recorded fps {recorded / args.seconds:5.1f} (camera {args.fps:.0f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: turning YOLO results into bicycle boxes on crowded frames.
+
+Builds ultralytics Results holding --boxes detections (a third of them
+bicycles, random confidences) and times:
+  * loop: the previous per-box parsing, int(box.cls[0]), float(box.conf[0]),
+    model.names[...] == "bicycle" and map(int, box.xyxy[0]) for every box,
+  * vectorized: one copy of boxes.data to NumPy and filter_detections, a
+    mask over all boxes (what BicycleDetector does with backend output).
+Both are checked to return the same boxes. With --model, a full predict()
+is also timed with and without the class filter passed to the model call.
+
+Usage (from chari-spot/camera_system, needs ultralytics):
+    PYTHONPATH=src python benchmarks/bench_postprocess.py
+    PYTHONPATH=src python benchmarks/bench_postprocess.py --boxes 300 --model yolov8n.pt
+"""
+import argparse
+import time
+
+import numpy
+import torch
+from ultralytics.engine.results import Results
+
+from utils.bicycle_detector import BicycleDetector, filter_detections
+
+NAMES = {0: "person", 1: "bicycle", 2: "car", 3: "motorcycle"}
+WIDTH, HEIGHT = 1280, 720
+
+
+def loop_parse(results, names, confidence_threshold):
+    bboxes = []
+    for box in results.boxes:
+        cls_id = int(box.cls[0])
+        conf = float(box.conf[0])
+        if names[cls_id] == "bicycle" and conf > confidence_threshold:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            bboxes.append((x1, y1, x2, y2))
+    return len(bboxes) > 0, bboxes
+
+
+def crowded_results(boxes: int) -> Results:
+    rng = numpy.random.default_rng(0)
+    x1 = rng.uniform(0, WIDTH - 100, boxes)
+    y1 = rng.uniform(0, HEIGHT - 100, boxes)
+    data = numpy.stack([
+        x1, y1, x1 + rng.uniform(20, 100, boxes), y1 + rng.uniform(20, 100, boxes),
+        rng.uniform(0, 1, boxes), rng.integers(0, len(NAMES), boxes),
+    ], axis=1).astype(numpy.float32)
+    return Results(
+        numpy.zeros((HEIGHT, WIDTH, 3), dtype=numpy.uint8), path="", names=NAMES, boxes=torch.from_numpy(data)
+    )
+
+
+def timeit(fn, repeat: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boxes", type=int, default=150)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    results = crowded_results(args.boxes)
+    bicycle_id = 1
+
+    def vectorized():
+        return filter_detections(results.boxes.data.cpu().numpy(), bicycle_id, args.threshold)
+
+    found, expected = loop_parse(results, NAMES, args.threshold)
+    assert numpy.array_equal(numpy.array(expected, dtype=numpy.int32).reshape(-1, 4), vectorized())
+
+    loop_ms = timeit(lambda: loop_parse(results, NAMES, args.threshold), max(1, args.repeat // 10))
+    vector_ms = timeit(vectorized, args.repeat)
+    print(f"{args.boxes} boxes, {len(expected)} bicycles above {args.threshold}")
+    print(f"  loop       {loop_ms:8.3f} ms/frame")
+    print(f"  vectorized {vector_ms:8.3f} ms/frame ({loop_ms / vector_ms:.0f}x)")
+
+    if args.model:
+        frame = numpy.random.default_rng(1).integers(0, 255, (HEIGHT, WIDTH, 3), dtype=numpy.uint8)
+        for class_filter in (False, True):
+            detector = BicycleDetector(args.model, confidence_threshold=args.threshold, class_filter=class_filter)
+            detector.if_announce_done = True
+            predict_ms = timeit(lambda: detector.predict(frame), 20)
+            print(f"  predict() class_filter={class_filter!s:5} {predict_ms:8.1f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: capture loop latency with inference in a thread vs a process.
+
+A capture loop paced at --fps flips each frame and hands it to an infer
+thread through a latest-wins RingBuffer, as the pipeline does. The infer
+thread calls either:
+  * thread: the detector directly, in this process,
+  * process: ProcessDetector, which passes the frame through shared memory
+    to a worker process that owns the detector.
+The stand-in detector spends --post-ms of GIL-holding Python work per frame
+(like the per-box tensor conversions after a YOLO forward pass). Reports how
+late each captured frame was handled (p50/p99/max) and inference frames/sec.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_process_backend.py
+    PYTHONPATH=src python benchmarks/bench_process_backend.py --fps 30 --post-ms 40 --seconds 10
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import cv2
+import numpy
+
+from utils.pipeline import DropPolicy, RingBuffer
+from utils.process_detector import ProcessDetector
+
+WIDTH, HEIGHT = 640, 360
+
+
+class GilHeavyStandIn:
+    """predict_batch that holds the GIL for about post_ms per frame."""
+
+    def __init__(self, post_ms: float):
+        self.post_seconds = post_ms / 1000
+
+    def predict_batch(self, frames):
+        results = []
+        for frame in frames:
+            small = cv2.resize(frame, (160, 90))
+            deadline = time.perf_counter() + self.post_seconds
+            boxes = []
+            while time.perf_counter() < deadline:
+                boxes.append((int(small[0, 0, 0]), float(small[1, 1, 1])))
+                boxes = boxes[-100:]
+            results.append((False, []))
+        return results
+
+    def predict(self, frame):
+        return self.predict_batch([frame])[0]
+
+
+def run(detector, fps: float, seconds: float):
+    frames = [
+        numpy.random.default_rng(i).integers(0, 255, (HEIGHT, WIDTH, 3), dtype=numpy.uint8) for i in range(8)
+    ]
+    infer_in = RingBuffer(1, DropPolicy.LATEST)
+    inferred = [0]
+
+    def infer():
+        while True:
+            frame = infer_in.get(timeout=0.1)
+            if frame is None:
+                if infer_in.closed:
+                    return
+                continue
+            detector.predict(frame)
+            inferred[0] += 1
+
+    worker = threading.Thread(target=infer)
+    worker.start()
+    lateness = []
+    started = time.monotonic()
+    for i in range(int(fps * seconds)):
+        due = started + i / fps
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        frame = cv2.flip(frames[i % len(frames)], 1)
+        infer_in.put(frame)
+        lateness.append((time.monotonic() - due) * 1000)
+    infer_in.close()
+    worker.join()
+    elapsed = time.monotonic() - started
+    lateness.sort()
+    return {
+        "p50": statistics.median(lateness),
+        "p99": lateness[int(len(lateness) * 0.99) - 1],
+        "max": lateness[-1],
+        "infer_fps": inferred[0] / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--post-ms", type=float, default=30.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    in_thread = GilHeavyStandIn(args.post_ms)
+    in_process = ProcessDetector(
+        HEIGHT, WIDTH, slots=4, detector_factory=GilHeavyStandIn, detector_kwargs={"post_ms": args.post_ms}
+    )
+    in_process.start()
+    try:
+        for label, detector in (("thread", in_thread), ("process", in_process)):
+            stats = run(detector, args.fps, args.seconds)
+            print(
+                f"{label:>7} | capture lateness p50 {stats['p50']:6.2f} ms  p99 {stats['p99']:6.2f} ms  "
+                f"max {stats['max']:6.2f} ms | inference {stats['infer_fps']:5.1f} fps"
+            )
+    finally:
+        in_process.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark: delivering slot events from many cameras to the backend.
+
+Starts a local FastAPI stand-in for the backend (uvicorn on 127.0.0.1) that
+mimics POST /user/login, POST /payments/ and POST /payments/batch (JSON array
+or NDJSON, Bearer token required) and keeps the last state per slot. Then
+--cameras simulated cameras, each with --slots slots, report a slot change
+every --interval seconds for --seconds, through:
+  * naive: one POST /payments/ per event on a fresh connection, as a kiosk
+    would without the publisher (only the first --naive-events events),
+  * publisher: one shared EventPublisher (batched, coalesced, keep-alive
+    pool); it logs in on the first 401,
+  * outage: the same while the stand-in answers 503 for --outage seconds in
+    the middle of the run; events go to the spool and are replayed once the
+    backend is back.
+Reports events/s, requests, TCP connections seen by the server, spooled
+events and whether the server's final state matches the last event of
+every slot.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_publisher.py
+    PYTHONPATH=src python benchmarks/bench_publisher.py --cameras 500 --seconds 20 --outage 8
+"""
+import argparse
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from utils.event_publisher import EventPublisher, PublisherConfig
+from utils.slot_occupancy import SlotEvent
+
+TOKEN = "bench-token"
+
+
+class StandIn:
+    """
+    Minimal stand-in for the backend's login and payment endpoints.
+    """
+    def __init__(self):
+        from fastapi import FastAPI, HTTPException, Request
+
+        self.state = {}
+        self.connections = set()
+        self.requests = 0
+        self.unavailable = False
+        self.lock = threading.Lock()
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def count(request: Request, call_next):
+            with self.lock:
+                self.connections.add((request.client.host, request.client.port))
+                self.requests += 1
+            return await call_next(request)
+
+        def authorize(request: Request):
+            if self.unavailable:
+                raise HTTPException(status_code=503, detail="Service Unavailable")
+            if request.headers.get("authorization") != f"Bearer {TOKEN}":
+                raise HTTPException(status_code=401, detail="Not authenticated")
+
+        @app.post("/user/login")
+        async def login(request: Request):
+            form = parse_qs((await request.body()).decode())
+            if not form.get("username"):
+                raise HTTPException(status_code=401, detail="Incorrect username or password")
+            return {"access_token": TOKEN, "token_type": "bearer"}
+
+        @app.post("/payments/")
+        async def update(request: Request, spot_id: int, slot_id: int, parked: bool):
+            authorize(request)
+            with self.lock:
+                self.state[(spot_id, slot_id)] = parked
+            return {"spot_id": spot_id, "slot_id": slot_id, "parked": parked, "paid": False}
+
+        @app.post("/payments/batch")
+        async def update_batch(request: Request):
+            authorize(request)
+            body = await request.body()
+            if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+                events = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                events = json.loads(body)
+            with self.lock:
+                for event in events:
+                    self.state[(event["spot_id"], event["slot_id"])] = event["parked"]
+            return {"applied": len(events), "failed": 0,
+                    "results": [{"index": i, "ok": True} for i in range(len(events))]}
+
+        self.app = app
+
+    def serve(self) -> str:
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{port}"
+
+    def reset(self):
+        with self.lock:
+            self.state.clear()
+            self.connections.clear()
+            self.requests = 0
+
+    def shutdown(self):
+        self.server.should_exit = True
+
+
+def generate(args, publish, outage=None):
+    """
+    Every --interval seconds each camera flips one of its slots; returns the
+    last state of every slot. `outage(t)` is called with the elapsed time.
+    """
+    rng = random.Random(0)
+    state = {}
+    started = time.monotonic()
+    tick = 0
+    while time.monotonic() - started < args.seconds:
+        now = time.monotonic()
+        if outage is not None:
+            outage(now - started)
+        for camera in range(args.cameras):
+            key = (camera, rng.randrange(args.slots))
+            state[key] = not state.get(key, False)
+            publish([SlotEvent(spot_id=key[0], slot_id=key[1], parked=state[key], timestamp=now)])
+        tick += 1
+        time.sleep(max(0.0, started + tick * args.interval - time.monotonic()))
+    return state
+
+
+def naive(args, url, server: StandIn):
+    import httpx
+
+    rng = random.Random(0)
+    state = {}
+    started = time.perf_counter()
+    for _ in range(args.naive_events):
+        key = (rng.randrange(args.cameras), rng.randrange(args.slots))
+        state[key] = not state.get(key, False)
+        # a new client (and connection) per event, as a per-camera script would do
+        with httpx.Client(base_url=url) as client:
+            client.post("/payments/", params={"spot_id": key[0], "slot_id": key[1], "parked": state[key]},
+                        headers={"Authorization": f"Bearer {TOKEN}"})
+    elapsed = time.perf_counter() - started
+    print(f"{'naive':>10} | {args.naive_events / elapsed:8.0f} events/s | {server.requests:6d} requests | "
+          f"{len(server.connections):5d} connections | correct {server.state == state}")
+
+
+def published(args, url, server: StandIn, name: str, outage_seconds: float = 0.0):
+    spool_dir = Path(tempfile.mkdtemp(prefix="bench_spool_"))
+    publisher = EventPublisher(PublisherConfig(
+        base_url=url, username="kiosk@example.com", password="secret",
+        spool_dir=spool_dir, backoff_initial=0.2, backoff_max=2.0,
+    )).start()
+    window = (args.seconds - outage_seconds) / 2
+
+    def outage(t):
+        server.unavailable = window <= t < window + outage_seconds
+
+    started = time.perf_counter()
+    state = generate(args, publisher.publish, outage if outage_seconds else None)
+    server.unavailable = False
+    # wait until the spool is replayed and the final states have arrived
+    deadline = time.monotonic() + 30
+    while (server.state != state or any(spool_dir.glob("*.ndjson"))) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    publisher.stop()
+    stats = publisher.stats.as_dict()
+    print(f"{name:>10} | {stats['received'] / elapsed:8.0f} events/s | {server.requests:6d} requests | "
+          f"{len(server.connections):5d} connections | correct {server.state == state} | "
+          f"received {stats['received']} coalesced {stats['coalesced']} sent {stats['sent']} "
+          f"spooled {stats['spooled']} failures {stats['failures']} | catch-up {elapsed - args.seconds:.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cameras", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--outage", type=float, default=4.0)
+    parser.add_argument("--naive-events", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = StandIn()
+    url = server.serve()
+    print(f"{args.cameras} cameras x {args.slots} slots, a change per camera every {args.interval} s "
+          f"({args.cameras / args.interval:.0f} events/s) for {args.seconds} s")
+    try:
+        naive(args, url, server)
+        server.reset()
+        published(args, url, server, "publisher")
+        server.reset()
+        published(args, url, server, "outage", outage_seconds=args.outage)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: Python CPU time and disk usage of the recording modes.
+
+Generates a synthetic clip (see bench_motion_gate) in which a bicycle rides
+in and out every 20 s, and records it with:
+  * inline: VideoRecorder.write_frames on the calling thread for every
+    frame, as App did before,
+  * continuous: EventRecorder writing every frame on its writer thread,
+  * event: EventRecorder triggered while the bicycle moves, keeping a JPEG
+    pre-roll ring of the idle frames,
+  * event+ffmpeg: the same, encoded by an ffmpeg subprocess (skipped when
+    ffmpeg is not found; pass --ffmpeg to point at a binary).
+Frames carry clip timestamps and are fed as fast as the recorder accepts
+them. Reports wall time, CPU time of this process (the ffmpeg child is not
+included), frames written, files, size on disk and the pre-roll memory
+compared with keeping the same frames raw.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_recorder.py
+    PYTHONPATH=src python benchmarks/bench_recorder.py --seconds 120 --ffmpeg /usr/bin/ffmpeg --codec h264_v4l2m2m
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bench_motion_gate import FPS, frames_of, synthesize
+from utils.event_recorder import EventRecorder, RecordingConfig
+from utils.video_recorder import VideoRecorder
+
+
+def moving(t: float) -> bool:
+    # synthesize(): riding in at 0-2 s and out at 12-14 s of every 20 s
+    phase = t % 20
+    return phase < 2 or 12 <= phase < 14
+
+
+def record(directory: Path, frames, mode: str, config: RecordingConfig):
+    directory.mkdir()
+    height, width = frames[0].shape[:2]
+    peak_pre_roll = 0
+    wall, cpu = time.perf_counter(), time.process_time()
+    if mode == "inline":
+        recorder = VideoRecorder(directory, "inline.mp4", width, height, FPS)
+        for frame in frames:
+            recorder.write_frames(frame)
+        recorder.release()
+        written = len(frames)
+    else:
+        recorder = EventRecorder(directory, "output.mp4", FPS, config)
+        for i, frame in enumerate(frames):
+            t = i / FPS
+            if moving(t):
+                recorder.trigger(t)
+            recorder.write_frames(frame, t)
+            peak_pre_roll = max(peak_pre_roll, recorder.stats.pre_roll_bytes)
+        recorder.release()
+        written = recorder.stats.written
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    files = list(directory.iterdir())
+    size = sum(path.stat().st_size for path in files)
+    return wall, cpu, written, len(files), size, peak_pre_roll
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of the synthetic clip")
+    parser.add_argument("--pre-roll", type=float, default=2.0)
+    parser.add_argument("--post-roll", type=float, default=2.0)
+    parser.add_argument("--segment", type=float, default=30.0)
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--codec", default="libx264")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthesize(Path(tmp) / "sample.mp4", args.seconds)
+        frames = list(frames_of(Path(tmp) / "sample.mp4"))
+        raw_pre_roll = frames[0].nbytes * int(args.pre_roll * FPS)
+        print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]} ({args.seconds:.0f} s)")
+
+        common = dict(pre_roll_seconds=args.pre_roll, post_roll_seconds=args.post_roll, segment_seconds=args.segment)
+        runs = [
+            ("inline", "inline", None),
+            ("continuous", "continuous", RecordingConfig(mode="continuous", **common)),
+            ("event", "event", RecordingConfig(mode="event", **common)),
+        ]
+        if shutil.which(args.ffmpeg):
+            runs.append(("event+ffmpeg", "event", RecordingConfig(
+                mode="event", backend="ffmpeg", ffmpeg_path=args.ffmpeg, ffmpeg_codec=args.codec, **common
+            )))
+        else:
+            print("ffmpeg not found, skipping event+ffmpeg")
+
+        for label, mode, config in runs:
+            wall, cpu, written, files, size, pre_roll = record(Path(tmp) / label, frames, mode, config)
+            line = (
+                f"{label:>12} | wall {wall:5.2f} s | CPU {cpu:5.2f} s | written {written:5d} | "
+                f"{files:2d} files | {size / 1e6:6.1f} MB"
+            )
+            if mode == "event":
+                line += f" | pre-roll {pre_roll / 1e6:4.1f} MB (raw {raw_pre_roll / 1e6:.1f} MB)"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: time to the first displayed frame and to the first detection.
+
+Starts a fresh Python process per mode, feeding App.build_pipeline from the
+synthetic camera of bench_pipeline:
+  * sync: the detector is created on the main thread before the pipeline
+    starts, as App.run did,
+  * background: BackgroundDetector loads and warms up the model on a thread
+    while the pipeline already captures, displays and records.
+Times are measured from the launch of the process and include interpreter
+startup and imports. "detection" is the first frame the model has
+processed.
+
+Usage (from chari-spot/camera_system):
+    PYTHONPATH=src python benchmarks/bench_startup.py --model yolov8n.pt
+    PYTHONPATH=src python benchmarks/bench_startup.py --model yolov8n.onnx
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def child(args) -> None:
+    from bench_pipeline import HEIGHT, WIDTH, SyntheticCamera
+    from app.main import App
+    from utils.bicycle_detector import BicycleDetector
+    from utils.detector_loader import BackgroundDetector
+    from utils.event_recorder import EventRecorder, RecordingConfig
+
+    events = {"imports": time.monotonic()}
+    with tempfile.TemporaryDirectory() as tmp:
+        camera = SyntheticCamera(args.fps, seconds=args.timeout)
+        app = App.model_construct(
+            camera_manager=camera,
+            video_recorder=EventRecorder(Path(tmp), "startup.mp4", args.fps, RecordingConfig(mode="continuous")),
+            motion_threshold=None,
+        )
+        if args.child == "sync":
+            detector = BicycleDetector(args.model, announce_once=False)
+        else:
+            detector = BackgroundDetector(
+                lambda: BicycleDetector(args.model, announce_once=False), warmup_shapes=[(HEIGHT, WIDTH)]
+            ).start()
+        pipeline, display_buffer = app.build_pipeline(detector)
+        infer = next(stage for stage in pipeline.stages if stage.name == "infer")
+        pipeline.start()
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline and "detection" not in events:
+            if display_buffer.get(timeout=0.005) is not None:
+                events.setdefault("frame", time.monotonic())
+            if getattr(detector, "ready", True):
+                events.setdefault("ready", time.monotonic())
+            if infer.stats.processed:
+                events.setdefault("detection", time.monotonic())
+        pipeline.stop()
+        app.video_recorder.release()
+    print(json.dumps(events))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    for mode in ("sync", "background"):
+        launched = time.monotonic()
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--model", args.model, "--fps", str(args.fps),
+             "--timeout", str(args.timeout)],
+            capture_output=True, text=True,
+        )
+        if output.returncode != 0:
+            print(f"{mode}: failed\n{output.stderr[-2000:]}")
+            continue
+        events = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{mode:>10} | " + " | ".join(
+            f"{name} {events[name] - launched:5.2f} s" if name in events else f"{name}   -"
+            for name in ("imports", "frame", "ready", "detection")
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+録画済みの動画をまとめて解析するコマンド
+
+使い方（src ディレクトリで実行）:
+    python -m app.analyze output/20250101_120000/output.mp4
+    python -m app.analyze output --stride 10 --batch-size 16 --output analysis.csv
+"""
+import argparse
+from pathlib import Path
+
+from loguru import logger
+
+from utils.bicycle_detector import BicycleDetector
+from utils.offline_analyzer import OfflineAnalyzer, check_output_format, find_videos
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="録画済みの動画から自転車を検出し、フレームごとの結果を保存する")
+    parser.add_argument("paths", nargs="+", type=Path, help="動画ファイルまたは動画を含むディレクトリ")
+    parser.add_argument("--output", type=Path, default=Path("output") / "analysis.npz",
+                        help="出力ファイル（.npz / .csv / .parquet）")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLOモデルのパス（.onnx なら onnxruntime で推論する）")
+    parser.add_argument("--imgsz", type=int, default=640, help="推論時の入力画像の長辺")
+    parser.add_argument("--confidence", type=float, default=0.3, help="自転車とみなす信頼度")
+    parser.add_argument("--stride", type=int, default=5, help="何フレームごとに解析するか")
+    parser.add_argument("--batch-size", type=int, default=8, help="1回の推論にまとめるフレーム数")
+    parser.add_argument("--workers", type=int, default=2, help="並列にデコードするファイル数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    check_output_format(args.output)
+    files = find_videos(args.paths)
+    if not files:
+        raise SystemExit("解析する動画が見つかりませんでした")
+    logger.info(f"{len(files)}本の動画を解析します")
+
+    detector = BicycleDetector(
+        model_path=args.model, confidence_threshold=args.confidence, announce_once=False, imgsz=args.imgsz
+    )
+    analyzer = OfflineAnalyzer(detector, stride=args.stride, batch_size=args.batch_size, decode_workers=args.workers)
+    table = analyzer.run(files)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    table.save(args.output)
+    logger.info(f"解析結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+YOLOモデルを onnxruntime で動かせるONNX形式に書き出すコマンド（必要ならINT8に量子化する）
+
+使い方（src ディレクトリで実行）:
+    python -m app.export_model yolov8n.pt
+    python -m app.export_model yolov8n.pt --imgsz 480 --int8 --calibration ../output/20250101_120000
+書き出したモデルは BicycleDetector(model_path="yolov8n.onnx") のように拡張子 .onnx で指定する
+"""
+import argparse
+import itertools
+from pathlib import Path
+from typing import Iterator, List
+
+import cv2
+import numpy
+from loguru import logger
+
+from utils.inference_backend import letterbox, to_tensor
+from utils.offline_analyzer import find_videos
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="YOLOモデルをONNX形式に書き出す")
+    parser.add_argument("model", help="書き出すYOLOモデル（.pt）")
+    parser.add_argument("--imgsz", type=int, default=640, help="推論時の入力画像の長辺")
+    parser.add_argument("--int8", action="store_true", help="INT8に量子化したモデルも書き出す")
+    parser.add_argument("--calibration", type=Path, nargs="*", default=[],
+                        help="INT8の校正に使う動画・画像（ディレクトリ可）。無ければ重みだけを量子化する")
+    parser.add_argument("--calibration-frames", type=int, default=64, help="校正に使うフレーム数")
+    return parser.parse_args(argv)
+
+
+def calibration_frames(paths: List[Path], count: int) -> Iterator[numpy.ndarray]:
+    """
+    校正用のフレームを動画・画像から均等に取り出す
+    """
+    images = [p for path in paths for p in (sorted(path.rglob("*")) if path.is_dir() else [path])
+              if p.suffix.lower() in IMAGE_SUFFIXES]
+    videos = find_videos(paths)
+    per_source = max(1, -(-count // max(1, len(images) + len(videos))))
+    for path in images:
+        frame = cv2.imread(str(path))
+        if frame is not None:
+            yield frame
+    for path in videos:
+        capture = cv2.VideoCapture(str(path))
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or per_source
+        for index in numpy.linspace(0, total - 1, per_source).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = capture.read()
+            if ok:
+                yield frame
+        capture.release()
+
+
+def quantize(model_path: Path, output_path: Path, imgsz: int, calibration: List[Path], count: int) -> Path:
+    """
+    ONNXモデルをINT8に量子化する
+    校正データがあれば活性化も含めて静的に（QDQ形式）、無ければ重みだけを動的に量子化する
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if not calibration:
+        quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QUInt8)
+        return output_path
+
+    frames = list(itertools.islice(calibration_frames(calibration, count), count))
+    if not frames:
+        raise SystemExit("校正に使うフレームが見つかりませんでした")
+    logger.info(f"{len(frames)}フレームで校正します")
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter({"images": to_tensor([letterbox(frame, imgsz)[0]])} for frame in frames)
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    quantize_static(
+        str(model_path), str(output_path), Reader(),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+    )
+    return output_path
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from ultralytics import YOLO
+
+    # バッチ数・画像サイズを可変にして書き出す（カメラごとに解像度が違ってもまとめて推論できる）
+    onnx_path = Path(YOLO(args.model).export(format="onnx", imgsz=args.imgsz, dynamic=True, simplify=False))
+    logger.info(f"ONNXモデルを書き出しました: {onnx_path}")
+    if args.int8:
+        int8_path = quantize(
+            onnx_path, onnx_path.with_name(f"{onnx_path.stem}-int8.onnx"), args.imgsz,
+            args.calibration, args.calibration_frames,
+        )
+        logger.info(f"INT8モデルを書き出しました: {int8_path}")
+
+
+if __name__ == "__main__":
+    main()
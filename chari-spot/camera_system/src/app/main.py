@@ -1,97 +1,361 @@
 import cv2
+import numpy
 from pydantic import BaseModel, Field
 from loguru import logger
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
-import queue
-import numpy
+import threading
+import time
+from typing import Callable, Dict, List, Literal, Optional, Tuple, Union
 
 from utils.camera_manager import CameraManager
-from utils.video_recorder import VideoRecorder
-from utils.bicycle_detector import BicycleDetector
+from utils.event_publisher import EventPublisher, PublisherConfig
+from utils.event_recorder import EventRecorder, RecordingConfig
+from utils.bicycle_detector import NO_BOXES, BicycleDetector
+from utils.detector_loader import BackgroundDetector
+from utils.inference_server import InferenceServer
+from utils.motion_gate import MotionGate
+from utils.slot_occupancy import CameraSlotsConfig, SlotEvent, SlotsFile, SlotTracker
+from utils.process_detector import ProcessDetector
+from utils.pipeline import DropPolicy, FramePacket, LatestValue, Pipeline, RingBuffer
 
 
 class App(BaseModel):
     """
     カメラ映像を取得し、自転車の検出を行うアプリケーションクラス
+    キャプチャ → 前処理 → 動き検出 → 推論 → 描画 → 表示/録画 の各ステージを別スレッドで動かす
+    推論が追いつかない場合も最新のフレームだけを推論し、録画はカメラのFPSのまま続ける
+    映像に変化がないフレームは推論せず、直前の検出結果を描画する
+    camera_nos に複数のカメラを指定すると、1つのモデルを共有し全カメラのフレームをまとめて推論する
+    録画は自転車の検出（スロットを追跡する場合は駐輪/空きの変化）の前後だけ行い、一定時間ごとにファイルを分ける
+    モデルはバックグラウンドで読み込み・ウォームアップし、準備ができるまでは検出せずに表示・録画する
     """
     model_config = {
         "arbitrary_types_allowed": True
     }
     camera_no: int = Field(default=0, description="使用するカメラの番号")
+    camera_nos: List[int] = Field(default_factory=list, description="複数カメラモードで使うカメラの番号（空ならcamera_noのみ）")
+    source: Optional[str] = Field(default=None, description="カメラの代わりに読む動画ファイルまたはRTSPなどのURL（1台のとき）")
+    threaded_capture: bool = Field(default=True, description="バックグラウンドのスレッドでカメラから最新のフレームを読み続けるかどうか")
     video_name: str = Field(default="output.mp4", description="保存するビデオの名前")
+    max_batch_size: int = Field(default=8, description="複数カメラモードで1回の推論にまとめる最大フレーム数")
+    max_batch_wait_ms: float = Field(default=20.0, description="複数カメラモードでバッチを締め切るまでの最大待ち時間")
+    motion_threshold: Optional[float] = Field(
+        default=0.01, description="推論を行う変化画素の割合（Noneなら毎フレーム推論する）"
+    )
+    motion_roi: Optional[Tuple[int, int, int, int]] = Field(
+        default=None, description="変化を調べる範囲 (x, y, width, height)（Noneならフレーム全体）"
+    )
+    motion_method: Literal["diff", "mog2"] = Field(default="diff", description="変化の検出方法（フレーム差分または背景差分）")
+    keyframe_interval: float = Field(default=5.0, description="変化がなくても推論する間隔（秒）")
+    slots_file: Optional[Path] = Field(default=None, description="カメラごとのスロット設定ファイル（JSON）")
+    model_path: str = Field(default="yolov8n.pt", description="YOLOモデルのパス（.onnx なら onnxruntime で推論する）")
+    inference_imgsz: int = Field(default=640, description="推論時の入力画像の長辺")
+    onnx_providers: Optional[List[str]] = Field(
+        default=None, description="onnxruntime の実行プロバイダ（OpenVINOExecutionProvider など、Noneなら CPU）"
+    )
+    inference_backend: Literal["thread", "process"] = Field(
+        default="thread", description="推論の実行場所（thread: 同じプロセスのスレッド, process: 共有メモリで渡す別プロセス）"
+    )
+    inference_timeout: float = Field(
+        default=30.0, description="推論結果を待つ最大秒数（推論サーバー・推論プロセスが応答しなくても止まらないように）"
+    )
+    record_buffer_seconds: float = Field(default=2.0, description="録画待ちとして保持するフレームの秒数")
+    recording: RecordingConfig = Field(default_factory=RecordingConfig, description="録画の設定（イベント録画・分割・ffmpeg）")
+    publisher: Optional[PublisherConfig] = Field(
+        default=None, description="スロットの状態変化をバックエンドへ送る設定（Noneなら送らない）"
+    )
+    stats_interval: float = Field(default=10.0, description="ステージ統計をログに出す間隔（秒）")
     session_dir: Path = None  # セッションディレクトリを保持
-    camera_manager: CameraManager = None
-    video_recorder: VideoRecorder = None
+    camera_manager: CameraManager = None  # 1台目のカメラ
+    video_recorder: EventRecorder = None
+    event_publisher: EventPublisher = None  # 全カメラで1つの接続プールを共有する
+    camera_managers: Dict[int, CameraManager] = Field(default_factory=dict)
+    video_recorders: Dict[int, EventRecorder] = Field(default_factory=dict)
+    slot_configs: Dict[int, CameraSlotsConfig] = Field(default_factory=dict)
 
     def __init__(self, **data):
         super().__init__(**data)
         # セッションディレクトリを作成
         self.session_dir = self._create_session_dir()
-        # CameraManagerとVideoRecorderを初期化
-        self.camera_manager = CameraManager(camera_no=self.camera_no)
-        self.video_recorder = VideoRecorder(
-            session_dir=self.session_dir,
-            video_name=self.video_name,
-            width=1280,
-            height=720,
-            fps=20.0
-        )
-            
+        # カメラごとにCameraManagerとEventRecorderを初期化
+        camera_nos = self.camera_nos or [self.camera_no]
+        for camera_no in camera_nos:
+            camera_manager = CameraManager(
+                camera_no=camera_no,
+                source=self.source if len(camera_nos) == 1 else None,
+                threaded=self.threaded_capture,
+            )
+            # 解像度は実際に書き込むフレームに合わせる（サイズが違うフレームは書き込まれないため）
+            self.video_recorders[camera_no] = EventRecorder(
+                session_dir=self.session_dir,
+                video_name=self.video_name if len(camera_nos) == 1 else f"camera{camera_no}_{self.video_name}",
+                fps=camera_manager.fps or 20.0,
+                config=self.recording,
+            )
+            self.camera_managers[camera_no] = camera_manager
+        self.camera_manager = self.camera_managers[camera_nos[0]]
+        self.video_recorder = self.video_recorders[camera_nos[0]]
+        if self.slots_file is not None:
+            self.slot_configs = SlotsFile.load(self.slots_file).cameras
+            logger.info(f"スロット設定を読み込みました: {self.slots_file}")
+
     def _create_session_dir(self):
         session_start_time = datetime.now().strftime("%Y%m%d_%H%M%S")
         session_dir = Path("output") / session_start_time
         session_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"セッションディレクトリを作成しました: {session_dir}")
         return session_dir
-    
+
+    def build_pipeline(
+        self,
+        bicycle_detector: Union[BicycleDetector, BackgroundDetector],
+        camera_manager: Optional[CameraManager] = None,
+        video_recorder: Optional[EventRecorder] = None,
+        predict: Optional[Callable] = None,
+        name: str = "",
+        slot_tracker: Optional[SlotTracker] = None,
+    ) -> Tuple[Pipeline, RingBuffer]:
+        """
+        1台のカメラのステージとバッファを組み立てる
+        :param bicycle_detector: 前処理・描画（predictが無ければ推論も）に使う検出器（ready が偽の間は推論しない）
+        :param camera_manager: フレームを取得するカメラ（省略時は1台目）
+        :param video_recorder: 録画先（省略時は1台目の録画）
+        :param predict: 推論関数（複数カメラモードでは推論サーバー経由の関数を渡す）
+        :param name: ログに付けるパイプライン名
+        :param slot_tracker: スロットの駐輪/空きを追跡する場合のトラッカー
+        :return: パイプラインと、メインスレッドで表示するフレームのバッファ
+        """
+        camera_manager = camera_manager or self.camera_manager
+        video_recorder = video_recorder or self.video_recorder
+        predict = predict or bicycle_detector.predict
+        pipeline = Pipeline(name)
+        fps = camera_manager.fps or 20.0
+        record_capacity = max(1, int(fps * self.record_buffer_seconds))
+
+        raw = pipeline.buffer("raw", 2, DropPolicy.LATEST)
+        gate_in = pipeline.buffer("gate", 2, DropPolicy.LATEST)
+        # 推論は最新のフレームだけでよい
+        infer_in = pipeline.buffer("infer", 1, DropPolicy.LATEST)
+        # 描画・録画は全フレームを通す
+        annotate_in = pipeline.buffer("annotate", record_capacity, DropPolicy.BLOCK)
+        display_in = pipeline.buffer("display", 1, DropPolicy.LATEST)
+        record_in = pipeline.buffer("record", record_capacity, DropPolicy.BLOCK)
+        latest = LatestValue((False, NO_BOXES))
+        # 最新の検出結果で自転車が映っているスロット
+        observed = LatestValue(numpy.zeros(len(slot_tracker) if slot_tracker else 0, dtype=bool))
+        counter = {"index": 0}
+        motion_gate = None
+        if self.motion_threshold is not None:
+            motion_gate = MotionGate(
+                threshold=self.motion_threshold,
+                roi=self.motion_roi,
+                keyframe_interval=self.keyframe_interval,
+                method=self.motion_method,
+            )
+            pipeline.add_stats("motion-gate", motion_gate.stats.as_dict)
+        pipeline.add_stats("recorder", video_recorder.stats.as_dict)
+
+        def capture():
+            if not camera_manager.capture.isOpened():
+                raise StopIteration
+            frame = camera_manager.get_frames()
+            if frame is None:
+                logger.error("フレームの取得に失敗しました")
+                return None
+            counter["index"] += 1
+            # スレッドで読む場合は get_frames より前に取得しているので、取得した時刻を使う
+            return FramePacket(index=counter["index"], captured_at=camera_manager.captured_at, frame=frame)
+
+        def preprocess(packet: FramePacket):
+            packet.frame = bicycle_detector.preprocess(packet.frame)
+            return packet if packet.frame is not None else None
+
+        def gate(packet: FramePacket):
+            # 検出器の読み込み中は推論しない（表示・録画は先に始める）
+            if not getattr(bicycle_detector, "ready", True):
+                return None
+            # 変化のないフレームは推論せず、直前の検出結果を使い回す
+            if motion_gate is None or motion_gate.should_infer(packet.frame, now=packet.captured_at):
+                return packet
+            return None
+
+        def infer(packet: FramePacket):
+            detections = predict(packet.frame)
+            if slot_tracker is not None:
+                observed.set(slot_tracker.observe(detections[1]))
+            latest.set(detections)
+            return None
+
+        def annotate(packet: FramePacket):
+            # 推論の完了を待たず、その時点で最新の検出結果を描画する
+            detections = latest.get()
+            bboxes = detections[1]
+            if slot_tracker is not None:
+                # 推論しないフレームでも時間は進むので、毎フレーム状態を更新する
+                events = slot_tracker.update(observed.get(), packet.captured_at)
+                if events:
+                    self._handle_slot_events(events)
+                    # スロットを追跡する場合は、駐輪/空きが変わったときだけ録画する
+                    video_recorder.trigger(packet.captured_at)
+            elif len(bboxes):
+                video_recorder.trigger(packet.captured_at)
+            # 推論・変化検出のステージが同じ配列を読んでいるので、描画は別のパケットのコピーに行う
+            annotated = replace(packet, detections=detections, marks=dict(packet.marks))
+            if len(bboxes) or slot_tracker is not None:
+                annotated.frame = packet.frame.copy()
+                bicycle_detector.draw_boxes(annotated.frame, bboxes)
+                if slot_tracker is not None:
+                    slot_tracker.draw(annotated.frame, observed.get())
+            return annotated
+
+        def record(packet: FramePacket):
+            video_recorder.write_frames(packet.frame, packet.captured_at)
+            return None
+
+        pipeline.stage("capture", capture, outputs=[raw])
+        pipeline.stage("preprocess", preprocess, source=raw, outputs=[gate_in, annotate_in])
+        pipeline.stage("gate", gate, source=gate_in, outputs=[infer_in])
+        pipeline.stage("infer", infer, source=infer_in)
+        pipeline.stage("annotate", annotate, source=annotate_in, outputs=[display_in, record_in])
+        pipeline.stage("record", record, source=record_in)
+        return pipeline, display_in
+
     def run(self):
         """
-        メインアプリケーションループ
+        メインアプリケーションループ（表示はメインスレッドで行う）
         """
         cv2.startWindowThread()
-        bicycle_detector = BicycleDetector()
-        bicycle_detector.start()    
-        logger.info("自転車検出器を初期化しました")
+        if self.publisher is not None:
+            # httpx が無いなどで起動できなければ、カメラやモデルを動かす前にここで止める
+            self.event_publisher = EventPublisher(self.publisher).start()
+        # モデルの読み込みとウォームアップはバックグラウンドで行い、終わるまでは検出せずに表示・録画する
+        bicycle_detector = BackgroundDetector(
+            self._create_detector,
+            warmup_shapes=[
+                (camera_manager.height, camera_manager.width) for camera_manager in self.camera_managers.values()
+            ],
+        ).start()
+        logger.info("自転車検出器の読み込みを開始しました")
+        inference_server = None
+        if len(self.camera_managers) == 1:
+            pipelines = {
+                camera_no: self.build_pipeline(bicycle_detector, slot_tracker=self._slot_tracker(camera_no))
+                for camera_no in self.camera_managers
+            }
+        else:
+            # 全カメラで1つのモデルを共有し、フレームをまとめて推論する
+            inference_server = InferenceServer(
+                bicycle_detector.predict_batch,
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_batch_wait_ms,
+            )
+            inference_server.start()
+            pipelines = {
+                camera_no: self.build_pipeline(
+                    bicycle_detector,
+                    camera_manager=camera_manager,
+                    video_recorder=self.video_recorders[camera_no],
+                    predict=lambda frame, camera_no=camera_no: inference_server.predict(
+                        camera_no, frame, timeout=self.inference_timeout
+                    ),
+                    name=f"camera{camera_no}",
+                    slot_tracker=self._slot_tracker(camera_no),
+                )
+                for camera_no, camera_manager in self.camera_managers.items()
+            }
+        for camera_no, (pipeline, _) in pipelines.items():
+            pipeline.add_stats("camera", self.camera_managers[camera_no].stats.as_dict)
+            pipeline.start()
+        last_stats = time.monotonic()
         try:
-            while(self.camera_manager.capture.isOpened()):
-                frame = self.camera_manager.get_frames()
-                
-                if frame is None:
-                    logger.error("フレームの取得に失敗しました")
-                    continue
-                
-                try:
-                    bicycle_detector.put_to_queue(frame.copy())
-                except queue.Full:
-                    continue
-                
-                try:
-                    processed_tuple =  bicycle_detector.get_from_queue()
-                    if processed_tuple is None:
-                        logger.error("processed_frameがNoneです")
+            open_buffers = {camera_no: display_buffer for camera_no, (_, display_buffer) in pipelines.items()}
+            while open_buffers:
+                for camera_no, display_buffer in list(open_buffers.items()):
+                    packet = display_buffer.get(timeout=0.1 / len(open_buffers))
+                    if packet is None:
+                        if display_buffer.closed:
+                            del open_buffers[camera_no]
                         continue
-                    processed_frame = processed_tuple[2]
-                except queue.Empty:
-                    continue
-                
-                logger.info(f"processed_frameのサイズ: {processed_frame.shape}")
-                # 画面にフレームを表示
-                self.camera_manager.imshow("Camera", processed_frame)
-                
-                # 録画する
-                self.video_recorder.write_frames(processed_frame)
-                
+                    # 画面にフレームを表示
+                    window_name = "Camera" if len(pipelines) == 1 else f"Camera {camera_no}"
+                    self.camera_managers[camera_no].imshow(window_name, packet.frame)
+                    self.camera_managers[camera_no].stats.observe_latency(time.monotonic() - packet.captured_at)
+
+                if time.monotonic() - last_stats >= self.stats_interval:
+                    self._log_stats(pipelines, inference_server)
+                    last_stats = time.monotonic()
+
                 # 'q'キーで終了
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
-            
+
         finally:
-            # リソースの解放
-            self.camera_manager.release()
-            self.video_recorder.release()
+            # 上流から止め、録画待ちのフレームを書き切ってからリソースを解放する
+            for pipeline, _ in pipelines.values():
+                pipeline.stop()
+            if inference_server is not None:
+                inference_server.stop()
+            bicycle_detector.stop()
+            if self.event_publisher is not None:
+                # 送れなかったイベントは保存され、次に起動したときに送る
+                self.event_publisher.stop()
+            self._log_stats(pipelines, inference_server)
+            for camera_no, camera_manager in self.camera_managers.items():
+                camera_manager.release()
+                self.video_recorders[camera_no].release()
             cv2.destroyAllWindows()
-            
+
+    def _create_detector(self):
+        """
+        inference_backend に応じた検出器を作る
+        """
+        # スロットを追跡する場合はスロットが埋まるたびにアナウンスする
+        announce_once = not self.slot_configs
+        detector_kwargs = {
+            "model_path": self.model_path,
+            "imgsz": self.inference_imgsz,
+            "providers": self.onnx_providers,
+            "announce_once": announce_once,
+        }
+        if self.inference_backend == "thread":
+            return BicycleDetector(**detector_kwargs)
+        detector = ProcessDetector(
+            max_height=max(camera_manager.height for camera_manager in self.camera_managers.values()),
+            max_width=max(camera_manager.width for camera_manager in self.camera_managers.values()),
+            slots=max(2 * self.max_batch_size, 4),
+            timeout=self.inference_timeout,
+            detector_kwargs=detector_kwargs,
+        )
+        detector.start()
+        return detector
+
+    def _slot_tracker(self, camera_no: int) -> Optional[SlotTracker]:
+        config = self.slot_configs.get(camera_no)
+        return SlotTracker(config) if config is not None and config.slots else None
+
+    def _handle_slot_events(self, events: List[SlotEvent]):
+        """
+        スロットの状態変化を記録してバックエンドへ送り、駐輪が確定したらアナウンスする
+        """
+        for event in events:
+            logger.info(
+                f"駐輪場{event.spot_id} スロット{event.slot_id}: {'駐輪' if event.parked else '空き'}になりました"
+            )
+        if self.event_publisher is not None:
+            self.event_publisher.publish(events)
+        if any(event.parked for event in events):
+            threading.Thread(target=BicycleDetector.announce_bicycle_detected, daemon=True).start()
+
+    def _log_stats(self, pipelines: Dict[int, Tuple[Pipeline, RingBuffer]], inference_server: Optional[InferenceServer]):
+        for pipeline, _ in pipelines.values():
+            pipeline.log_stats()
+        if inference_server is not None:
+            inference_server.log_stats()
+        if self.event_publisher is not None:
+            self.event_publisher.log_stats()
+
 if __name__ == "__main__":
     app = App()
-    app.run()
\ No newline at end of file
+    app.run()
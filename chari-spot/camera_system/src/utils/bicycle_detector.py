@@ -1,6 +1,5 @@
-from ultralytics import YOLO
 import cv2
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 import threading
 import queue
 import numpy as np
@@ -8,19 +7,62 @@ from loguru import logger
 import subprocess
 import numpy
 
+from utils.inference_backend import BackendName, create_backend
+
+# 検出結果が無いときの空配列（x1, y1, x2, y2）
+NO_BOXES = numpy.empty((0, 4), dtype=numpy.int32)
+
+
+def filter_detections(data: numpy.ndarray, class_id: int, confidence_threshold: float) -> numpy.ndarray:
+    """
+    推論結果の全ボックスから指定クラスのボックスだけをまとめて取り出す
+    :param data: (N, 6) の x1, y1, x2, y2, 信頼度, クラスID（推論バックエンドの出力）
+    :param class_id: 取り出すクラスのID
+    :param confidence_threshold: これより信頼度の高いボックスだけを残す
+    :return: (K, 4) の int32 配列 x1, y1, x2, y2
+    """
+    if not len(data):
+        return NO_BOXES
+    keep = (data[:, 5] == class_id) & (data[:, 4] > confidence_threshold)
+    return data[keep, :4].astype(numpy.int32)
+
 
 class BicycleDetector:
     """
     フレームから自転車を検出するクラス
     """
-    def __init__(self, model_path: str = "yolov8n.pt", confidence_threshold: float = 0.3):
-        self.model = YOLO(model_path)
+    def __init__(
+        self,
+        model_path: str = "yolov8n.pt",
+        confidence_threshold: float = 0.3,
+        announce_once: bool = True,
+        class_filter: bool = True,
+        backend: BackendName = "auto",
+        imgsz: int = 640,
+        providers: Optional[List[str]] = None,
+    ):
+        """
+        :param model_path: YOLOモデルのパス
+        :param confidence_threshold: 自転車とみなす信頼度
+        :param announce_once: 最初に自転車を検出したときに音声アナウンスするか
+                              （スロットごとにアナウンスする場合はFalse）
+        :param class_filter: 自転車以外のクラスを推論中（NMSの前）に除くか
+        :param backend: 推論バックエンド（auto なら .onnx は onnxruntime、それ以外は ultralytics）
+        :param imgsz: 推論時の入力画像の長辺
+        :param providers: onnxruntime の実行プロバイダ（OpenVINOExecutionProvider など）
+        """
+        self.backend = create_backend(model_path, backend=backend, imgsz=imgsz, providers=providers)
         self.confidence_threshold = confidence_threshold
+        class_ids = {name: class_id for class_id, name in self.backend.names.items()}
+        if "bicycle" not in class_ids:
+            raise ValueError(f"モデルに bicycle クラスがありません: {model_path}")
+        self.bicycle_class_id = class_ids["bicycle"]
+        self.classes = [self.bicycle_class_id] if class_filter else None
         
         self.bicycle_frame_queue = queue.Queue(maxsize=10)
         self.bicycle_result_queue = queue.Queue(maxsize=10) 
         
-        self.if_announce_done = False
+        self.if_announce_done = not announce_once
         
         self.running = threading.Event()
         self.bicycle_detection_thread = threading.Thread(target=self.detect)
@@ -43,7 +85,7 @@ class BicycleDetector:
         if not self.bicycle_frame_queue.full():
             self.bicycle_frame_queue.put(frame, timeout=0.1)
             
-    def get_from_queue(self) -> Tuple[bool, List[Tuple[int, int, int, int]], np.ndarray]:
+    def get_from_queue(self) -> Tuple[bool, numpy.ndarray, np.ndarray]:
         """
         キューからフレームを取得する
         :return: フレーム (np.ndarray)
@@ -52,7 +94,8 @@ class BicycleDetector:
             return self.bicycle_result_queue.get(timeout=0.1)
         return None
             
-    def announce_bicycle_detected(self):
+    @staticmethod
+    def announce_bicycle_detected():
         """
         自転車が検出されたときに音声でアナウンスする
         """
@@ -62,6 +105,59 @@ class BicycleDetector:
         except Exception as e:
             logger.error(f"音声アナウンスに失敗しました: {e}")
             
+    @staticmethod
+    def preprocess(frame) -> numpy.ndarray:
+        """
+        推論に渡せる形式か確認し、必要なら変換する
+        :param frame: 入力フレーム
+        :return: uint8のBGRフレーム（不正な場合はNone）
+        """
+        if not isinstance(frame, numpy.ndarray):
+            logger.error(f"frameの型が不正です: {type(frame)}")
+            return None
+        if frame.dtype != numpy.uint8:
+            frame = frame.astype(numpy.uint8)
+        if frame.ndim != 3 or frame.shape[2] != 3:
+            logger.error(f"frameの形状が不正です: {frame.shape}")
+            return None
+        return frame
+
+    def predict(self, frame) -> Tuple[bool, numpy.ndarray]:
+        """
+        1フレームから自転車を検出する（フレームには描画しない）
+        :param frame: preprocess済みのフレーム
+        :return: 自転車が見つかったかどうかと (K, 4) のバウンディングボックス配列
+        """
+        return self.predict_batch([frame])[0]
+
+    def predict_batch(self, frames: List[numpy.ndarray]) -> List[Tuple[bool, numpy.ndarray]]:
+        """
+        複数フレームを1回の推論でまとめて処理する
+        :param frames: preprocess済みのフレームのリスト（カメラごとに解像度が違ってもよい）
+        :return: フレームと同じ順の (自転車が見つかったかどうか, (K, 4) のバウンディングボックス配列)
+        """
+        results = self.backend.infer(frames, self.confidence_threshold, classes=self.classes)
+        detections = [self._parse_result(data) for data in results]
+        if any(found for found, _ in detections):
+            self._announce_once()
+        return detections
+
+    def _parse_result(self, data: numpy.ndarray) -> Tuple[bool, numpy.ndarray]:
+        """
+        1フレーム分の推論結果から自転車のバウンディングボックスを取り出す
+        ボックスごとにPythonの値へ変換せず、全ボックスを一度にNumPyで絞り込む
+        """
+        bboxes = filter_detections(data, self.bicycle_class_id, self.confidence_threshold)
+        return len(bboxes) > 0, bboxes
+
+    def _announce_once(self):
+        """
+        自転車が検出された場合、音声アナウンスを行う（プロセス中1回のみ）
+        """
+        if not self.if_announce_done:
+            threading.Thread(target=self.announce_bicycle_detected).start()
+            self.if_announce_done = True
+
     def detect(self):
         """
         キュー内のフレームを処理し、自転車の検出を行い、バウンディングボックスを描画したフレームを返す
@@ -69,36 +165,14 @@ class BicycleDetector:
         while self.running.is_set():
             try:
                 # キューからフレームを取得
-                frame = self.bicycle_frame_queue.get(timeout=0.1)
-                if not isinstance(frame, numpy.ndarray):
-                    logger.error(f"frameの型が不正です: {type(frame)}")
-                    continue
-                if frame.dtype != numpy.uint8:
-                    frame = frame.astype(numpy.uint8)
-                if frame.ndim != 3 or frame.shape[2] != 3:
-                    logger.error(f"frameの形状が不正です: {frame.shape}")
+                frame = self.preprocess(self.bicycle_frame_queue.get(timeout=0.1))
+                if frame is None:
                     continue
-                results = self.model(frame)[0]
-                bboxes = []
-                bicycle_found = False
-
-                # 検出結果を解析
-                for box in results.boxes:
-                    cls_id = int(box.cls[0])
-                    conf = float(box.conf[0])
-
-                    if self.model.names[cls_id] == "bicycle" and conf > self.confidence_threshold:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        bboxes.append((x1, y1, x2, y2))
-                        bicycle_found = True
+                bicycle_found, bboxes = self.predict(frame)
 
                 # バウンディングボックスを描画
                 self.draw_boxes(frame, bboxes)
-                if bicycle_found and not self.if_announce_done:
-                    # 自転車が検出された場合、音声アナウンスを行う
-                    threading.Thread(target=self.announce_bicycle_detected).start()
-                    self.if_announce_done = True
-                    
+
                 # 結果をキューに追加（描画済みフレームを含む）
                 self.bicycle_result_queue.put((bicycle_found, bboxes, frame))
 
@@ -107,13 +181,14 @@ class BicycleDetector:
                 continue
 
 
-    def draw_boxes(self, frame, bboxes: List[Tuple[int, int, int, int]]):
+    @staticmethod
+    def draw_boxes(frame, bboxes):
         """
         バウンディングボックスをフレームに描画
         :param frame: 入力フレーム
-        :param bboxes: バウンディングボックスリスト
+        :param bboxes: (K, 4) のバウンディングボックス配列（タプルのリストでもよい）
         """
-        for (x1, y1, x2, y2) in bboxes:
+        for (x1, y1, x2, y2) in numpy.asarray(bboxes, dtype=numpy.int32).reshape(-1, 4).tolist():
             cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
             cv2.putText(frame, "Bicycle", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX,
                         0.5, (255, 0, 0), 2)
@@ -1,41 +1,239 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
 import cv2
 import numpy
 from loguru import logger
 
+
+@dataclass
+class CameraStats:
+    """
+    取得・受け渡し・破棄したフレームの件数とフレームの古さ
+    """
+    grabbed: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    failures: int = 0
+    handoff_seconds: float = 0.0
+    max_handoff_seconds: float = 0.0
+    latency_count: int = 0
+    latency_seconds: float = 0.0
+    max_latency_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def observe_latency(self, seconds: float):
+        """
+        表示・録画など下流に届いた時点でのフレームの古さ（取得からの秒数）を記録する
+        """
+        self.latency_count += 1
+        self.latency_seconds += seconds
+        if seconds > self.max_latency_seconds:
+            self.max_latency_seconds = seconds
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "grabbed": self.grabbed,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "capture_fps": self.grabbed / elapsed if elapsed > 0 else 0.0,
+            # get_frames で渡した時点のフレームの古さ
+            "handoff_ms": self.handoff_seconds / self.delivered * 1000 if self.delivered else 0.0,
+            "max_handoff_ms": self.max_handoff_seconds * 1000,
+            # 下流（表示）に届いた時点のフレームの古さ
+            "age_ms": self.latency_seconds / self.latency_count * 1000 if self.latency_count else 0.0,
+            "max_age_ms": self.max_latency_seconds * 1000,
+        }
+
+
 class CameraManager:
     """
     カメラ映像を取得するクラス
+    threaded=True ではバックグラウンドのスレッドがデバイスから読み続けて最新の1フレームだけを保持し、
+    get_frames は常に最新のフレームを返す（処理が遅れてもドライバのバッファに古いフレームが溜まらない）
     """
-    def __init__(self, camera_no: int = 0):
-        self.capture = cv2.VideoCapture(camera_no)
-        
-        # 画質を取得し低めに設定する
-        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH) //4)
-        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT) //4)
-        
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        
+    # 読み込み先のバッファ数（最新・受け渡し中・書き込み中）
+    BUFFERS = 3
+
+    def __init__(
+        self,
+        camera_no: int = 0,
+        source: Optional[Union[str, Path]] = None,
+        threaded: bool = False,
+        size: Optional[Tuple[int, int]] = None,
+        flip: bool = True,
+        realtime: bool = True,
+    ):
+        """
+        :param camera_no: 使用するカメラの番号
+        :param source: カメラの代わりに読む動画ファイルまたはRTSPなどのURL
+        :param threaded: バックグラウンドのスレッドで読み続けるかどうか
+        :param size: 出力するフレームのサイズ (width, height)（Noneなら取得したサイズのまま）
+        :param flip: 左右反転するかどうか
+        :param realtime: 動画ファイルをFPSどおりの速さで読むかどうか（カメラの代わりに試すとき用）
+        """
+        self.source = camera_no if source is None else str(source)
+        self.is_file = source is not None and Path(source).is_file()
+        self.flip = flip
+        self.capture = self._open()
+
+        if source is None:
+            # 画質を取得し低めに設定する
+            self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH) //4)
+            self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT) //4)
+
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
         # OpenCVが調整する場合があるので再取得
         self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        
+        self.size = size
+        if size is not None:
+            self.width, self.height = size
+
         # FPSを取得
         self.fps = self.capture.get(cv2.CAP_PROP_FPS)
         logger.info(f"カメラのFPS: {self.fps}")
 
-    def get_frames(self):
-        self.ret, self.frame = self.capture.read()
-        
-        if self.ret:
-            return cv2.flip(self.frame, 1)
-        return None
-    
+        self.stats = CameraStats()
+        # 最後に get_frames で返したフレームを取得した時刻（monotonic）
+        self.captured_at: Optional[float] = None
+        self.pace_interval = 1 / self.fps if self.is_file and realtime and self.fps else 0.0
+        self._next_read = time.monotonic()
+        self._buffers = [None] * self.BUFFERS
+        self._grabbed_at = [0.0] * self.BUFFERS
+        self._resized = None
+        self._latest = -1
+        self._reading = -1
+        self._fresh = False
+        self._condition = threading.Condition()
+        self._running = threading.Event()
+        self.thread = None
+        if threaded:
+            self._running.set()
+            self.thread = threading.Thread(target=self._grab_loop, name=f"grabber-{self.source}", daemon=True)
+            self.thread.start()
+
+    def _open(self) -> cv2.VideoCapture:
+        capture = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            # ドライバ側に古いフレームを溜めない（対応していないバックエンドでは無視される）
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def _read(self, index: int) -> bool:
+        """
+        次のフレームを buffers[index] に読み込む（同じサイズなら確保済みの配列を再利用する）
+        """
+        if self.pace_interval:
+            self._next_read += self.pace_interval
+            delay = self._next_read - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        ok, frame = self.capture.read(self._buffers[index])
+        if not ok:
+            self.stats.failures += 1
+            return False
+        self._buffers[index] = frame
+        self._grabbed_at[index] = time.monotonic()
+        self.stats.grabbed += 1
+        return True
+
+    def _grab_loop(self):
+        failures = 0
+        while self._running.is_set():
+            with self._condition:
+                index = next(i for i in range(self.BUFFERS) if i not in (self._latest, self._reading))
+            if not self._read(index):
+                if self.is_file:
+                    # 動画の終わり
+                    break
+                failures += 1
+                if failures % 50 == 0:
+                    # ストリームが切れた場合は開き直す
+                    logger.warning(f"フレームを取得できないため開き直します: {self.source}")
+                    self.capture.release()
+                    self.capture = self._open()
+                time.sleep(0.01)
+                continue
+            failures = 0
+            with self._condition:
+                if self._fresh:
+                    # 前のフレームは誰にも渡されずに上書きされた
+                    self.stats.dropped += 1
+                self._latest = index
+                self._fresh = True
+                self._condition.notify_all()
+        self._running.clear()
+        with self._condition:
+            self._condition.notify_all()
+
+    def get_frames(self, out: Optional[numpy.ndarray] = None, timeout: float = 1.0) -> Optional[numpy.ndarray]:
+        """
+        最新のフレームを返す
+        :param out: 結果を書き込む確保済みの配列（Noneなら新しく確保する。パイプラインのように
+                    フレームを後段で保持する場合は、呼び出しごとに別の配列を渡すかNoneにする）
+        :param timeout: threaded=True のとき新しいフレームを待つ最大秒数
+        :return: フレーム（取得できなければNone）
+        """
+        if self.thread is None:
+            index = 0
+            if not self._read(index):
+                if self.is_file:
+                    self.capture.release()
+                return None
+        else:
+            with self._condition:
+                if not self._condition.wait_for(lambda: self._fresh or not self._running.is_set(), timeout):
+                    return None
+                if not self._fresh:
+                    # 動画の終わりなど、グラバーが止まった
+                    self.capture.release()
+                    return None
+                index = self._latest
+                self._reading = index
+                self._fresh = False
+        try:
+            frame = self._convert(self._buffers[index], out)
+        finally:
+            self._reading = -1
+        self.captured_at = self._grabbed_at[index]
+        handoff = time.monotonic() - self.captured_at
+        self.stats.delivered += 1
+        self.stats.handoff_seconds += handoff
+        if handoff > self.stats.max_handoff_seconds:
+            self.stats.max_handoff_seconds = handoff
+        return frame
+
+    def _convert(self, frame: numpy.ndarray, out: Optional[numpy.ndarray]) -> numpy.ndarray:
+        """
+        リサイズ・左右反転して out に書き込む（読み込み用のバッファは再利用するので必ず別の配列に出す）
+        """
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            if self._resized is None:
+                self._resized = numpy.empty((self.size[1], self.size[0], 3), dtype=frame.dtype)
+            frame = cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        if out is None:
+            out = numpy.empty_like(frame)
+        if self.flip:
+            return cv2.flip(frame, 1, dst=out)
+        numpy.copyto(out, frame)
+        return out
+
     def imshow(self, window_name: str, image: numpy.ndarray):
         try:
             cv2.imshow(window_name, image)
         except Exception as e:
-            logger.error(f"画像表示/保存中のエラー: {e}")  
-            
+            logger.error(f"画像表示/保存中のエラー: {e}")
+
     def release(self):
-        self.capture.release()
\ No newline at end of file
+        if self.thread is not None:
+            self._running.clear()
+            self.thread.join(timeout=2.0)
+        self.capture.release()
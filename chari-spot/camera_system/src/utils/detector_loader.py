@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy
+from loguru import logger
+
+from utils.bicycle_detector import BicycleDetector
+
+
+class BackgroundDetector:
+    """
+    検出器をバックグラウンドのスレッドで読み込み、ダミーの推論でウォームアップしてから使えるようにするラッパー
+    読み込み中もキャプチャ・録画は始められ、ready になるまでは推論しない
+    （モデルの読み込みやtorch・onnxruntimeのimportに数秒かかるため）
+    """
+    preprocess = staticmethod(BicycleDetector.preprocess)
+    draw_boxes = staticmethod(BicycleDetector.draw_boxes)
+
+    def __init__(self, factory: Callable[[], Any], warmup_shapes: Iterable[Tuple[int, int]] = ()):
+        """
+        :param factory: predict / predict_batch を持つ検出器を作る関数（このスレッドではなく読み込みスレッドで呼ぶ）
+        :param warmup_shapes: ウォームアップに使うフレームの (height, width)（カメラの解像度）
+        """
+        self.factory = factory
+        self.warmup_shapes = sorted(set(warmup_shapes))
+        self.detector = None
+        self.error: Optional[Exception] = None
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self._ready = threading.Event()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._load, name="detector-loader", daemon=True)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self) -> "BackgroundDetector":
+        self.thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        準備ができるまで待つ
+        :return: 準備ができたかどうか
+        """
+        self._ready.wait(timeout)
+        return self.ready
+
+    def _load(self):
+        started = time.monotonic()
+        try:
+            detector = self.factory()
+            self.load_seconds = time.monotonic() - started
+            started = time.monotonic()
+            # 初回の推論はメモリ確保やカーネルの準備で遅いので、カメラと同じ解像度で先に済ませる
+            if self.warmup_shapes:
+                detector.predict_batch([numpy.zeros((height, width, 3), dtype=numpy.uint8)
+                                        for height, width in self.warmup_shapes])
+            self.warmup_seconds = time.monotonic() - started
+        except Exception as e:
+            self.error = e
+            logger.error(f"自転車検出器を読み込めませんでした（検出せずに録画を続けます）: {e}")
+            return
+        with self._lock:
+            self.detector = detector
+            stopped = self._stopped
+        if stopped:
+            # 読み込み中にアプリが終了した
+            self._stop_detector(detector)
+            return
+        self._ready.set()
+        logger.info(
+            f"自転車検出器の準備ができました（読み込み{self.load_seconds:.1f}秒 ウォームアップ{self.warmup_seconds:.1f}秒）"
+        )
+
+    def predict(self, frame: numpy.ndarray) -> Tuple[bool, numpy.ndarray]:
+        return self.predict_batch([frame])[0]
+
+    def predict_batch(self, frames: List[numpy.ndarray]) -> List[Tuple[bool, numpy.ndarray]]:
+        if not self.ready:
+            raise RuntimeError("自転車検出器の準備ができていません")
+        return self.detector.predict_batch(frames)
+
+    def stop(self):
+        """
+        検出器が stop を持つ場合（ProcessDetector）は止める
+        """
+        with self._lock:
+            self._stopped = True
+            detector = self.detector
+        self._stop_detector(detector)
+
+    @staticmethod
+    def _stop_detector(detector: Any):
+        if detector is not None and hasattr(detector, "stop"):
+            detector.stop()
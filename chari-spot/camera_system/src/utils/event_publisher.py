@@ -0,0 +1,319 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from utils.slot_occupancy import SlotEvent
+
+BATCH_PATH = "/payments/batch"
+LOGIN_PATH = "/user/login"
+
+
+class PublisherConfig(BaseModel):
+    """
+    スロットの状態変化をバックエンドへ送る設定
+    """
+    base_url: str = Field(description="バックエンドのURL（例: http://localhost:8000）")
+    token: Optional[str] = Field(default=None, description="Bearerトークン")
+    username: Optional[str] = Field(default=None, description="トークンを取得するユーザーのメールアドレス（/user/login）")
+    password: Optional[str] = Field(default=None, description="トークンを取得するユーザーのパスワード")
+    flush_interval: float = Field(default=0.5, description="イベントをまとめて送る間隔（秒）")
+    max_batch: int = Field(default=500, description="1回のリクエストで送る最大イベント数")
+    max_connections: int = Field(default=2, description="バックエンドへの最大同時接続数（keep-aliveで使い回す）")
+    timeout: float = Field(default=10.0, description="1回のリクエストのタイムアウト（秒）")
+    backoff_initial: float = Field(default=0.5, description="送信に失敗したとき最初に待つ秒数（失敗するたびに倍にする）")
+    backoff_max: float = Field(default=60.0, description="再送までに待つ最大の秒数")
+    spool_dir: Path = Field(default=Path("output") / "spool", description="送れなかったイベントを保存するディレクトリ")
+    max_spool_bytes: int = Field(default=100 * 1024 * 1024, description="保存する最大バイト数（超えたら古いものから捨てる）")
+
+
+@dataclass
+class PublisherStats:
+    """
+    受け取り・送信・保存したイベントの件数
+    """
+    received: int = 0
+    coalesced: int = 0
+    sent: int = 0
+    rejected: int = 0
+    requests: int = 0
+    failures: int = 0
+    spooled: int = 0
+    spool_dropped: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "requests": self.requests,
+            "failures": self.failures,
+            "spooled": self.spooled,
+            "spool_dropped": self.spool_dropped,
+        }
+
+
+class EventPublisher:
+    """
+    スロットの状態変化をバックエンドの POST /payments/batch にまとめて送るクラス
+    publish はどのスレッドからでも呼べ、イベントを (spot_id, slot_id) ごとの最新の状態にまとめるだけで戻る
+    送信は専用スレッドのイベントループで行い、全カメラで1つの keep-alive 接続プールを使い回す
+    送れなかったイベントはディスクに保存し、指数バックオフで再送する（再起動後も保存分から送る）
+    """
+    def __init__(self, config: PublisherConfig):
+        """
+        :param config: 送信の設定
+        """
+        self.config = config
+        self.stats = PublisherStats()
+        self.token = config.token
+        self._pending: Dict[Tuple[int, int], dict] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._started = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._stopping = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._seq = 0
+        self.config.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._spool_bytes = sum(path.stat().st_size for path in self._spool_files())
+        self.thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "EventPublisher":
+        """
+        送信スレッドを起動し、接続プールの準備ができるまで待つ
+        :param timeout: 起動を待つ最大の秒数
+        :raises ImportError: httpx がインストールされていない（poetry install --extras publisher）
+        :raises RuntimeError: 送信スレッドが timeout 秒以内に起動しなかった
+        """
+        # 呼び出し元のスレッドで import して、インストールされていなければここで例外にする
+        import httpx  # noqa: F401
+
+        self.thread.start()
+        if not self._started.wait(timeout=timeout):
+            raise RuntimeError(f"イベント送信スレッドが{timeout}秒以内に起動しませんでした")
+        if self._start_error is not None:
+            raise RuntimeError("イベント送信スレッドの起動に失敗しました") from self._start_error
+        return self
+
+    def publish(self, events: Iterable[SlotEvent]):
+        """
+        イベントを送信待ちに加える（同じスロットのまだ送っていないイベントは最新の状態で上書きする）
+        :param events: SlotTracker.update が返したイベント（timestamp は monotonic）
+        """
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            for event in events:
+                key = (event.spot_id, event.slot_id)
+                self.stats.received += 1
+                if key in self._pending:
+                    self.stats.coalesced += 1
+                self._pending[key] = {
+                    "spot_id": event.spot_id,
+                    "slot_id": event.slot_id,
+                    "parked": event.parked,
+                    "ts": datetime.fromtimestamp(event.timestamp + offset, tz=timezone.utc).isoformat(),
+                }
+            full = len(self._pending) >= self.config.max_batch
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def stop(self, timeout: float = 15.0):
+        """
+        送信待ちのイベントを送る（送れなければ保存する）してから止める
+        """
+        self._stopping = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        self.thread.join(timeout=timeout)
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except BaseException as e:
+            if self._started.is_set():
+                raise
+            self._start_error = e
+        finally:
+            # 起動に失敗しても start が待ち続けないようにする
+            self._started.set()
+
+    async def _main(self):
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.config.max_connections, max_keepalive_connections=self.config.max_connections
+        )
+        async with httpx.AsyncClient(base_url=self.config.base_url, limits=limits, timeout=self.config.timeout) as client:
+            self._wake = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+            self._started.set()
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.config.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                stopping = self._stopping
+                try:
+                    await self._flush(client)
+                except Exception as e:
+                    logger.error(f"イベントの送信でエラーが発生しました: {e}")
+                if stopping:
+                    break
+
+    def _take_pending(self) -> List[dict]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return list(pending.values())
+
+    async def _flush(self, client):
+        while True:
+            batch = self._take_pending()
+            if time.monotonic() < self._retry_at:
+                # バックオフ中は送らずに保存する
+                if batch:
+                    self._spool(batch)
+                return
+            if self._spool_files():
+                # 保存済みの古いイベントを先に送る（新しい状態を古い状態で上書きしないため）
+                if batch:
+                    self._spool(batch)
+                if not await self._drain_spool(client):
+                    return
+            elif batch:
+                for start in range(0, len(batch), self.config.max_batch):
+                    chunk = batch[start:start + self.config.max_batch]
+                    body = json.dumps(chunk).encode()
+                    if not await self._send(client, body, "application/json", len(chunk)):
+                        self._spool(batch[start:])
+                        return
+            with self._lock:
+                if len(self._pending) < self.config.max_batch:
+                    return
+
+    async def _send(self, client, body: bytes, content_type: str, count: int) -> bool:
+        """
+        :return: 送れた（または再送しても受け付けられない）かどうか。Falseなら後で再送する
+        """
+        import httpx
+
+        for attempt in range(2):
+            headers = {"Content-Type": content_type}
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+            self.stats.requests += 1
+            try:
+                response = await client.post(BATCH_PATH, content=body, headers=headers)
+            except httpx.HTTPError as e:
+                return self._failed(f"{type(e).__name__}: {e}")
+            if response.status_code == 401 and attempt == 0 and self.config.username:
+                if not await self._login(client):
+                    return self._failed("ログインできませんでした")
+                continue
+            break
+        if response.is_success:
+            self._failures = 0
+            result = response.json()
+            self.stats.sent += result.get("applied", count)
+            if result.get("failed"):
+                self.stats.rejected += result["failed"]
+                details = [r.get("detail") for r in result.get("results", []) if not r.get("ok")]
+                logger.error(f"バックエンドが{result['failed']}件のイベントを受け付けませんでした: {details[:3]}")
+            return True
+        if response.status_code in (401, 408, 429) or response.status_code >= 500:
+            return self._failed(f"HTTP {response.status_code}")
+        # 送り直しても受け付けられない
+        self.stats.rejected += count
+        logger.error(f"バックエンドがイベントを受け付けませんでした（HTTP {response.status_code}）: {response.text[:200]}")
+        return True
+
+    async def _login(self, client) -> bool:
+        import httpx
+
+        try:
+            response = await client.post(
+                LOGIN_PATH, data={"username": self.config.username, "password": self.config.password or ""}
+            )
+        except httpx.HTTPError:
+            return False
+        if not response.is_success:
+            return False
+        self.token = response.json()["access_token"]
+        return True
+
+    def _failed(self, reason: str) -> bool:
+        self._failures += 1
+        self.stats.failures += 1
+        delay = min(self.config.backoff_max, self.config.backoff_initial * 2 ** (self._failures - 1))
+        # 複数のキオスクが同時に再送しないよう揺らす
+        delay *= random.uniform(0.5, 1.0)
+        self._retry_at = time.monotonic() + delay
+        logger.warning(f"イベントを送れませんでした（{reason}）。{delay:.1f}秒後に再送します")
+        return False
+
+    def _spool_files(self) -> List[Path]:
+        return sorted(self.config.spool_dir.glob("*.ndjson"))
+
+    def _spool(self, events: List[dict]):
+        """
+        イベントをNDJSONのファイルとして保存する（書き終えてから名前を変えるので途中のファイルは読まれない）
+        """
+        self._seq += 1
+        path = self.config.spool_dir / f"{time.time_ns()}-{self._seq:06d}.ndjson"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+        tmp.rename(path)
+        self._spool_bytes += path.stat().st_size
+        self.stats.spooled += len(events)
+        files = self._spool_files()
+        while self._spool_bytes > self.config.max_spool_bytes and len(files) > 1:
+            oldest = files.pop(0)
+            self.stats.spool_dropped += self._count_lines(oldest)
+            self._spool_bytes -= oldest.stat().st_size
+            oldest.unlink()
+            logger.warning(f"保存できる容量を超えたため古いイベントを捨てました: {oldest.name}")
+
+    async def _drain_spool(self, client) -> bool:
+        """
+        保存済みのイベントを古い順にNDJSONでまとめて送る
+        :return: すべて送れたかどうか
+        """
+        files = self._spool_files()
+        while files:
+            chunk, body, count = [], b"", 0
+            while files and (not chunk or count < self.config.max_batch):
+                data = files[0].read_bytes()
+                chunk.append(files.pop(0))
+                body += data
+                count += data.count(b"\n")
+            if not await self._send(client, body, "application/x-ndjson", count):
+                return False
+            for path in chunk:
+                self._spool_bytes -= path.stat().st_size
+                path.unlink()
+        self._spool_bytes = 0
+        return True
+
+    @staticmethod
+    def _count_lines(path: Path) -> int:
+        return path.read_bytes().count(b"\n")
+
+    def log_stats(self):
+        stats = self.stats.as_dict()
+        logger.info(
+            f"[publisher] 受信{stats['received']}件 集約{stats['coalesced']}件 送信{stats['sent']}件 "
+            f"拒否{stats['rejected']}件 リクエスト{stats['requests']}回 失敗{stats['failures']}回 "
+            f"保存{stats['spooled']}件 破棄{stats['spool_dropped']}件"
+        )
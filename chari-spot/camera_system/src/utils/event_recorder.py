@@ -0,0 +1,223 @@
+import shutil
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Literal, Optional
+
+import cv2
+import numpy
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from utils.pipeline import DropPolicy, RingBuffer
+from utils.video_recorder import FfmpegVideoRecorder, VideoRecorder
+
+
+class RecordingConfig(BaseModel):
+    """
+    録画の設定
+    """
+    mode: Literal["event", "continuous"] = Field(
+        default="event", description="録画する範囲（event: 検出の前後だけ, continuous: 常に録画）"
+    )
+    pre_roll_seconds: float = Field(default=5.0, description="イベントの前から録画に含める秒数")
+    post_roll_seconds: float = Field(default=10.0, description="最後のイベントの後も録画を続ける秒数")
+    segment_seconds: float = Field(default=300.0, description="1ファイルの最大の長さ（秒）")
+    queue_seconds: float = Field(default=2.0, description="書き込み待ちとして保持するフレームの秒数")
+    jpeg_quality: int = Field(default=80, ge=1, le=100, description="プリロール用にフレームを圧縮するJPEG品質")
+    backend: Literal["opencv", "ffmpeg"] = Field(
+        default="opencv", description="エンコードの方法（opencv: 同じプロセスでmp4v, ffmpeg: サブプロセスにパイプ）"
+    )
+    ffmpeg_path: str = Field(default="ffmpeg", description="ffmpegの実行ファイル")
+    ffmpeg_codec: str = Field(default="libx264", description="ffmpegの映像エンコーダ（h264_v4l2m2m などでハードウェアエンコード）")
+    ffmpeg_args: Optional[List[str]] = Field(default=None, description="エンコーダに渡す追加の引数")
+
+
+@dataclass
+class RecorderStats:
+    """
+    録画したフレーム・ファイルの件数とプリロールの使用量
+    """
+    frames: int = 0
+    written: int = 0
+    events: int = 0
+    segments: int = 0
+    errors: int = 0
+    pre_roll_frames: int = 0
+    pre_roll_bytes: int = 0
+    encode_seconds: float = 0.0
+    write_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        idle = self.frames - self.written
+        return {
+            "frames": self.frames,
+            "written": self.written,
+            "events": self.events,
+            "segments": self.segments,
+            "errors": self.errors,
+            "pre_roll_frames": self.pre_roll_frames,
+            "pre_roll_kb": self.pre_roll_bytes / 1024,
+            "jpeg_ms": self.encode_seconds / idle * 1000 if idle > 0 else 0.0,
+            "write_ms": self.write_seconds / self.written * 1000 if self.written else 0.0,
+            "fps": self.written / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+@dataclass
+class _QueuedFrame:
+    timestamp: float
+    wall_time: float
+    frame: Optional[numpy.ndarray] = None
+    jpeg: Optional[numpy.ndarray] = None
+
+
+class EventRecorder:
+    """
+    書き込みスレッドで録画するクラス（write_frames はキューに入れるだけで戻る）
+    event モードではイベントの無い間のフレームをJPEGに圧縮してプリロールのリングバッファに保持し、
+    trigger されるとプリロールから録画を始め、最後のイベントから post_roll_seconds 後に止める
+    ファイルは segment_seconds ごと（とイベントごと）に分ける
+    """
+    def __init__(
+        self,
+        session_dir: Path,
+        video_name: str,
+        fps: float = 20.0,
+        config: Optional[RecordingConfig] = None,
+    ):
+        """
+        :param session_dir: 録画ファイルを置くディレクトリ
+        :param video_name: ファイル名（開始時刻と連番を付けて output_20250101_120000_0001.mp4 のようにする）
+        :param fps: カメラのFPS（解像度は最初のフレームに合わせる）
+        :param config: 録画の設定
+        """
+        self.config = config or RecordingConfig()
+        if self.config.backend == "ffmpeg" and shutil.which(self.config.ffmpeg_path) is None:
+            raise RuntimeError(f"ffmpegが見つかりません: {self.config.ffmpeg_path}")
+        self.session_dir = Path(session_dir)
+        self.video_name = Path(video_name)
+        self.fps = fps
+        self.stats = RecorderStats()
+        self.queue = RingBuffer(
+            max(1, int(fps * self.config.queue_seconds)), DropPolicy.BLOCK, name="recorder"
+        )
+        self.pre_roll = deque(maxlen=max(1, int(fps * self.config.pre_roll_seconds)))
+        # 録画する時刻の範囲（monotonic）。trigger で更新し、書き込みスレッドが読む
+        self.recording_from = float("inf")
+        self.recording_until = float("-inf")
+        self.segment = None
+        self.segment_started_at = 0.0
+        self.segment_shape = None
+        self.thread = threading.Thread(target=self._loop, name="recorder", daemon=True)
+        self.thread.start()
+
+    def trigger(self, timestamp: Optional[float] = None):
+        """
+        イベントを知らせる（録画中なら録画を延長する）
+        :param timestamp: イベントが起きたフレームの captured_at（monotonic）
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if timestamp > self.recording_until:
+            self.stats.events += 1
+            self.recording_from = timestamp - self.config.pre_roll_seconds
+        self.recording_until = timestamp + self.config.post_roll_seconds
+
+    def write_frames(self, frame: numpy.ndarray, timestamp: Optional[float] = None):
+        """
+        フレームを書き込みキューに入れる（キューが満杯のまま1秒経つとフレームを捨てる）
+        :param timestamp: フレームの captured_at（monotonic）
+        """
+        now = time.monotonic()
+        timestamp = now if timestamp is None else timestamp
+        self.queue.put(_QueuedFrame(timestamp, time.time() - (now - timestamp), frame=frame), timeout=1.0)
+
+    def release(self):
+        """
+        キューに残ったフレームを書き切ってからファイルを閉じる
+        """
+        self.queue.close()
+        self.thread.join()
+
+    def _loop(self):
+        while True:
+            item = self.queue.get(timeout=0.5)
+            if item is None:
+                if self.queue.closed:
+                    break
+                continue
+            self.stats.frames += 1
+            try:
+                self._handle(item)
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error(f"録画でエラーが発生しました: {e}")
+                self._close_segment()
+        self._close_segment()
+
+    def _handle(self, item: _QueuedFrame):
+        if self.config.mode == "continuous" or self.recording_from <= item.timestamp <= self.recording_until:
+            if self.segment is None:
+                # イベントの始まり: プリロールのうちイベント前 pre_roll_seconds 以内のフレームから書く
+                while self.pre_roll:
+                    queued = self.pre_roll.popleft()
+                    self.stats.pre_roll_bytes -= queued.jpeg.nbytes
+                    if queued.timestamp >= self.recording_from:
+                        queued.frame = cv2.imdecode(queued.jpeg, cv2.IMREAD_COLOR)
+                        self._write(queued)
+                self.stats.pre_roll_frames = 0
+            self._write(item)
+            return
+        # イベントの外: 録画中なら閉じ、圧縮してプリロールに保持する
+        self._close_segment()
+        started = time.perf_counter()
+        ok, jpeg = cv2.imencode(".jpg", item.frame, [cv2.IMWRITE_JPEG_QUALITY, self.config.jpeg_quality])
+        self.stats.encode_seconds += time.perf_counter() - started
+        if not ok:
+            raise RuntimeError("プリロールのフレームを圧縮できませんでした")
+        if len(self.pre_roll) == self.pre_roll.maxlen:
+            self.stats.pre_roll_bytes -= self.pre_roll[0].jpeg.nbytes
+        self.pre_roll.append(_QueuedFrame(item.timestamp, item.wall_time, jpeg=jpeg))
+        self.stats.pre_roll_bytes += jpeg.nbytes
+        self.stats.pre_roll_frames = len(self.pre_roll)
+
+    def _write(self, item: _QueuedFrame):
+        if (
+            self.segment is None
+            or item.timestamp - self.segment_started_at >= self.config.segment_seconds
+            or item.frame.shape != self.segment_shape
+        ):
+            self._close_segment()
+            self._open_segment(item)
+        started = time.perf_counter()
+        self.segment.write_frames(item.frame)
+        self.stats.write_seconds += time.perf_counter() - started
+        self.stats.written += 1
+
+    def _open_segment(self, item: _QueuedFrame):
+        height, width = item.frame.shape[:2]
+        self.stats.segments += 1
+        started = datetime.fromtimestamp(item.wall_time).strftime("%Y%m%d_%H%M%S")
+        name = f"{self.video_name.stem}_{started}_{self.stats.segments:04d}{self.video_name.suffix}"
+        if self.config.backend == "ffmpeg":
+            self.segment = FfmpegVideoRecorder(
+                self.session_dir, name, width, height, self.fps,
+                codec=self.config.ffmpeg_codec,
+                output_args=self.config.ffmpeg_args,
+                ffmpeg_path=self.config.ffmpeg_path,
+            )
+        else:
+            self.segment = VideoRecorder(self.session_dir, name, width, height, self.fps)
+        self.segment_started_at = item.timestamp
+        self.segment_shape = item.frame.shape
+        logger.info(f"録画を開始しました: {self.session_dir / name}")
+
+    def _close_segment(self):
+        if self.segment is not None:
+            self.segment.release()
+            self.segment = None
@@ -0,0 +1,178 @@
+import ast
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import cv2
+import numpy
+
+BackendName = Literal["auto", "ultralytics", "onnxruntime"]
+
+# ultralytics の既定値に合わせる
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+PAD_VALUE = 114
+
+
+def letterbox(frame: numpy.ndarray, imgsz: int, stride: int = 32, auto: bool = True) -> Tuple[numpy.ndarray, float, Tuple[int, int]]:
+    """
+    縦横比を保って縮小し、余白を埋めてモデルの入力サイズにする（ultralytics の LetterBox と同じ）
+    :param frame: BGRのフレーム
+    :param imgsz: 長辺のサイズ
+    :param stride: auto=True のとき余白を stride の倍数まで減らす
+    :param auto: Falseなら imgsz x imgsz の正方形にする
+    :return: 変換後の画像、縮小率、左上の余白 (x, y)
+    """
+    height, width = frame.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    pad_x, pad_y = imgsz - new_width, imgsz - new_height
+    if auto:
+        pad_x, pad_y = pad_x % stride, pad_y % stride
+    if (width, height) != (new_width, new_height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, left = round(pad_y / 2 - 0.1), round(pad_x / 2 - 0.1)
+    bottom, right = round(pad_y / 2 + 0.1), round(pad_x / 2 + 0.1)
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+    return frame, ratio, (left, top)
+
+
+def to_tensor(images: Sequence[numpy.ndarray]) -> numpy.ndarray:
+    """
+    letterbox済みのBGR画像を (B, 3, H, W) のRGB float32（0〜1）にまとめる
+    """
+    return numpy.ascontiguousarray(numpy.stack(images)[..., ::-1].transpose(0, 3, 1, 2), dtype=numpy.float32) / 255
+
+
+def decode_predictions(
+    output: numpy.ndarray,
+    confidence_threshold: float,
+    classes: Optional[List[int]] = None,
+) -> numpy.ndarray:
+    """
+    YOLOv8 の出力 (4 + クラス数, アンカー数) から NMS 済みのボックスを取り出す
+    :return: (N, 6) の x1, y1, x2, y2, 信頼度, クラスID（入力画像の座標）
+    """
+    scores = output[4:]
+    class_ids = scores.argmax(axis=0)
+    confidences = scores.max(axis=0)
+    keep = confidences > confidence_threshold
+    if classes is not None:
+        # ultralytics の classes 引数と同じく、最もスコアの高いクラスで NMS の前に絞る
+        keep &= numpy.isin(class_ids, classes)
+    if not keep.any():
+        return numpy.empty((0, 6), dtype=numpy.float32)
+    cx, cy, w, h = output[:4, keep]
+    confidences, class_ids = confidences[keep], class_ids[keep]
+    # クラスごとに NMS を行う
+    indices = cv2.dnn.NMSBoxesBatched(
+        numpy.stack([cx - w / 2, cy - h / 2, w, h], axis=1).tolist(),
+        confidences.tolist(),
+        class_ids.tolist(),
+        confidence_threshold,
+        IOU_THRESHOLD,
+        top_k=MAX_DETECTIONS,
+    )
+    indices = numpy.asarray(indices, dtype=numpy.int64).reshape(-1)
+    return numpy.stack([
+        cx[indices] - w[indices] / 2, cy[indices] - h[indices] / 2,
+        cx[indices] + w[indices] / 2, cy[indices] + h[indices] / 2,
+        confidences[indices], class_ids[indices],
+    ], axis=1).astype(numpy.float32)
+
+
+class UltralyticsBackend:
+    """
+    ultralytics（PyTorch）でYOLOモデルを動かすバックエンド
+    """
+    def __init__(self, model_path: str, imgsz: int = 640):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+        self.names: Dict[int, str] = dict(self.model.names)
+
+    def infer(self, frames: List[numpy.ndarray], confidence_threshold: float, classes: Optional[List[int]] = None) -> List[numpy.ndarray]:
+        """
+        :return: フレームごとの (N, 6) の x1, y1, x2, y2, 信頼度, クラスID
+        """
+        results = self.model(frames, imgsz=self.imgsz, classes=classes, conf=confidence_threshold, verbose=False)
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+
+class OnnxBackend:
+    """
+    ultralytics で書き出したONNXモデルを onnxruntime で動かすバックエンド（torch・ultralytics を読み込まない）
+    INT8に量子化したモデルもそのまま読める。providers に OpenVINOExecutionProvider を指定すると
+    onnxruntime-openvino 経由で OpenVINO を使う
+    """
+    def __init__(
+        self,
+        model_path: str,
+        imgsz: int = 640,
+        providers: Optional[List[str]] = None,
+    ):
+        """
+        :param model_path: ONNXモデルのパス
+        :param imgsz: 入力画像の長辺（入力サイズが固定のモデルではモデルのサイズを使う）
+        :param providers: onnxruntime の実行プロバイダ（Noneなら CPUExecutionProvider）
+        """
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), sess_options=options, providers=providers or ["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = {int(k): v for k, v in ast.literal_eval(metadata["names"]).items()}
+        self.stride = int(metadata.get("stride", 32))
+        height, width = model_input.shape[2:]
+        # 入力サイズが固定なら正方形に余白を足す。可変なら余白を stride の倍数まで減らす
+        self.dynamic = not (isinstance(height, int) and isinstance(width, int))
+        self.imgsz = imgsz if self.dynamic else max(height, width)
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def infer(self, frames: List[numpy.ndarray], confidence_threshold: float, classes: Optional[List[int]] = None) -> List[numpy.ndarray]:
+        """
+        :return: フレームごとの (N, 6) の x1, y1, x2, y2, 信頼度, クラスID（元のフレームの座標）
+        """
+        boxed = [letterbox(frame, self.imgsz, self.stride, auto=self.dynamic) for frame in frames]
+        outputs = [None] * len(frames)
+        # 同じ大きさの画像だけを1回の推論にまとめる（カメラごとに解像度が違う場合があるため）
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for i, (image, _, _) in enumerate(boxed):
+            groups.setdefault(image.shape, []).append(i)
+        for indices in groups.values():
+            batches = [indices] if self.dynamic_batch else [[i] for i in indices]
+            for batch in batches:
+                tensor = to_tensor([boxed[i][0] for i in batch])
+                for i, output in zip(batch, self.session.run(None, {self.input_name: tensor})[0]):
+                    outputs[i] = output
+        detections = []
+        for frame, (_, ratio, (left, top)), output in zip(frames, boxed, outputs):
+            data = decode_predictions(output, confidence_threshold, classes)
+            data[:, [0, 2]] = ((data[:, [0, 2]] - left) / ratio).clip(0, frame.shape[1])
+            data[:, [1, 3]] = ((data[:, [1, 3]] - top) / ratio).clip(0, frame.shape[0])
+            detections.append(data)
+        return detections
+
+
+def create_backend(
+    model_path: str,
+    backend: BackendName = "auto",
+    imgsz: int = 640,
+    providers: Optional[List[str]] = None,
+):
+    """
+    推論バックエンドを作る
+    :param backend: auto なら拡張子で選ぶ（.onnx は onnxruntime、それ以外は ultralytics）
+    """
+    if backend == "auto":
+        backend = "onnxruntime" if Path(model_path).suffix.lower() == ".onnx" else "ultralytics"
+    if backend == "onnxruntime":
+        return OnnxBackend(model_path, imgsz=imgsz, providers=providers)
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path, imgsz=imgsz)
+    raise ValueError(f"対応していない推論バックエンドです: {backend}")
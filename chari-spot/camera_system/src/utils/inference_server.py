@@ -0,0 +1,177 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy
+from loguru import logger
+
+
+@dataclass
+class InferenceRequest:
+    """
+    推論サーバーに送られた1フレーム分の依頼
+    """
+    camera_id: Hashable
+    frame: numpy.ndarray
+    submitted_at: float
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class InferenceServerStats:
+    """
+    バッチ推論の件数と待ち時間
+    """
+    batches: int = 0
+    frames: int = 0
+    inference_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    per_camera: Dict[Hashable, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "avg_batch_size": self.frames / self.batches if self.batches else 0.0,
+            "avg_inference_ms": self.inference_seconds / self.batches * 1000 if self.batches else 0.0,
+            "avg_wait_ms": self.wait_seconds / self.frames * 1000 if self.frames else 0.0,
+            "per_camera": dict(self.per_camera),
+        }
+
+
+class InferenceServer:
+    """
+    複数カメラのフレームを1つのモデルでまとめて推論するマイクロバッチサーバー
+    最初の依頼から max_wait_ms 経つか max_batch_size 件集まった時点、
+    または最近依頼してきた全カメラのフレームが揃った時点で1回の推論を行い、結果をカメラごとのFutureに返す
+    """
+    # この秒数以上依頼のないカメラは、バッチが揃うのを待つ対象から外す
+    ACTIVE_SECONDS = 1.0
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[numpy.ndarray]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+    ):
+        """
+        :param predict_batch: フレームのリストを受け取り、同じ順で結果を返す関数
+                              （BicycleDetector.predict_batch など）
+        :param max_batch_size: 1回の推論にまとめる最大フレーム数
+        :param max_wait_ms: 最初のフレームが届いてからバッチを締め切るまでの最大待ち時間
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = InferenceServerStats()
+        self.requests: "queue.Queue[InferenceRequest]" = queue.Queue()
+        self._last_seen: Dict[Hashable, float] = {}
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self._serve, name="inference-server", daemon=True)
+
+    def start(self):
+        """
+        スケジューラのスレッドを開始する
+        """
+        self.running.set()
+        self.stats.started_at = time.monotonic()
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        スケジューラを止め、処理されなかった依頼をキャンセルする
+        """
+        self.running.clear()
+        if self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        while True:
+            try:
+                self.requests.get_nowait().future.cancel()
+            except queue.Empty:
+                break
+
+    def submit(self, camera_id: Hashable, frame: numpy.ndarray) -> Future:
+        """
+        フレームの推論を依頼する
+        :param camera_id: 結果を振り分けるためのカメラの識別子
+        :param frame: preprocess済みのフレーム
+        :return: 推論結果が入るFuture
+        """
+        request = InferenceRequest(camera_id=camera_id, frame=frame, submitted_at=time.monotonic())
+        if not self.running.is_set():
+            request.future.cancel()
+            return request.future
+        self.requests.put(request)
+        return request.future
+
+    def predict(self, camera_id: Hashable, frame: numpy.ndarray, timeout: Optional[float] = None) -> Any:
+        """
+        推論を依頼して結果を待つ（パイプラインの推論ステージから呼ぶ）
+        """
+        return self.submit(camera_id, frame).result(timeout=timeout)
+
+    def _collect(self) -> List[InferenceRequest]:
+        """
+        1バッチ分の依頼を集める（最初の1件が届くまでは最大0.1秒待つ）
+        """
+        try:
+            first = self.requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        now = time.monotonic()
+        deadline = now + self.max_wait
+        active = {camera_id for camera_id, seen in self._last_seen.items() if now - seen < self.ACTIVE_SECONDS}
+        waiting_for = active - {first.camera_id}
+        while len(batch) < self.max_batch_size:
+            if active and not waiting_for:
+                # 各カメラは結果を受け取るまで次を送らないので、これ以上待っても増えない
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            waiting_for.discard(request.camera_id)
+        for request in batch:
+            self._last_seen[request.camera_id] = request.submitted_at
+        return batch
+
+    def _serve(self):
+        while self.running.is_set():
+            batch = [request for request in self._collect() if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                results = self.predict_batch([request.frame for request in batch])
+            except Exception as e:
+                logger.error(f"バッチ推論に失敗しました: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.monotonic()
+            self.stats.batches += 1
+            self.stats.frames += len(batch)
+            self.stats.inference_seconds += finished - started
+            for request, result in zip(batch, results):
+                self.stats.wait_seconds += started - request.submitted_at
+                self.stats.per_camera[request.camera_id] = self.stats.per_camera.get(request.camera_id, 0) + 1
+                request.future.set_result(result)
+
+    def log_stats(self):
+        stats = self.stats.as_dict()
+        logger.info(
+            f"[inference-server] {stats['frames']}フレーム {stats['fps']:.1f}fps "
+            f"平均バッチ{stats['avg_batch_size']:.1f}件 推論{stats['avg_inference_ms']:.1f}ms "
+            f"待ち{stats['avg_wait_ms']:.1f}ms カメラ別{stats['per_camera']}"
+        )
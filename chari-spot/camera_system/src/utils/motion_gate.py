@@ -0,0 +1,124 @@
+import time
+from dataclasses import dataclass
+from typing import Literal, Optional, Tuple
+
+import cv2
+import numpy
+
+
+@dataclass
+class MotionGateStats:
+    """
+    ゲートを通ったフレームと止めたフレームの件数
+    """
+    frames: int = 0
+    triggered: int = 0
+    keyframes: int = 0
+    skipped: int = 0
+    check_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "triggered": self.triggered,
+            "keyframes": self.keyframes,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / self.frames if self.frames else 0.0,
+            "avg_check_ms": self.check_seconds / self.frames * 1000 if self.frames else 0.0,
+        }
+
+
+class MotionGate:
+    """
+    映像に変化があったときだけ推論を行うための前段フィルタ
+    縮小したグレースケール画像を、最後に推論したフレームと比べる（diff）か、
+    背景差分（mog2）で前景の割合を求め、しきい値を超えたら推論する
+    変化がなくても keyframe_interval 秒ごとに1回は推論する
+    """
+    def __init__(
+        self,
+        threshold: float = 0.01,
+        pixel_threshold: int = 25,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        keyframe_interval: float = 5.0,
+        method: Literal["diff", "mog2"] = "diff",
+        downscale_width: int = 160,
+    ):
+        """
+        :param threshold: 推論を行う変化画素の割合（ROI内、0〜1）
+        :param pixel_threshold: 画素が変化したとみなす輝度差（diffのみ）
+        :param roi: 変化を調べる範囲 (x, y, width, height)（元フレームの座標、Noneなら全体）
+        :param keyframe_interval: 変化がなくても推論する間隔（秒、0以下なら行わない）
+        :param method: diff（フレーム差分）または mog2（背景差分）
+        :param downscale_width: 比較前に縮小する幅（ピクセル）
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.roi = roi
+        self.keyframe_interval = keyframe_interval
+        self.method = method
+        self.downscale_width = downscale_width
+        self.stats = MotionGateStats()
+        self.last_score = 0.0
+        self._reference: Optional[numpy.ndarray] = None
+        self._last_inferred_at: Optional[float] = None
+        self._subtractor = (
+            cv2.createBackgroundSubtractorMOG2(history=500, detectShadows=False) if method == "mog2" else None
+        )
+
+    def _small_gray(self, frame: numpy.ndarray) -> numpy.ndarray:
+        """
+        ROIを切り出し、縮小・グレースケール化・平滑化した画像を返す
+        """
+        if self.roi is not None:
+            x, y, width, height = self.roi
+            frame = frame[y:y + height, x:x + width]
+        scale = self.downscale_width / frame.shape[1]
+        if scale < 1:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def score(self, small: numpy.ndarray) -> float:
+        """
+        変化した画素の割合を求める
+        """
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+            return cv2.countNonZero(mask) / mask.size
+        if self._reference is None or self._reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self._reference)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / mask.size
+
+    def should_infer(self, frame: numpy.ndarray, now: Optional[float] = None) -> bool:
+        """
+        このフレームを推論すべきか判定する
+        :param frame: BGRフレーム
+        :param now: 現在時刻（time.monotonic、省略時は現在）
+        :return: 推論すべきならTrue（推論しない場合は前回の検出結果を使い回す）
+        """
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        small = self._small_gray(frame)
+        self.last_score = self.score(small)
+        self.stats.frames += 1
+        if self.last_score >= self.threshold:
+            self.stats.triggered += 1
+            infer = True
+        elif (
+            self.keyframe_interval > 0
+            and (self._last_inferred_at is None or now - self._last_inferred_at >= self.keyframe_interval)
+        ):
+            self.stats.keyframes += 1
+            infer = True
+        else:
+            self.stats.skipped += 1
+            infer = False
+        if infer:
+            # 少しずつ進む変化も積み重なれば検出できるよう、最後に推論したフレームと比べる
+            self._reference = small
+            self._last_inferred_at = now
+        self.stats.check_seconds += time.perf_counter() - started
+        return infer
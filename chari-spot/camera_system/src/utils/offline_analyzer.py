@@ -0,0 +1,257 @@
+import csv
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, List
+
+import cv2
+import numpy
+from loguru import logger
+
+from utils.pipeline import DropPolicy, RingBuffer
+
+VIDEO_SUFFIXES = {".mp4", ".avi", ".mov", ".mkv"}
+COLUMNS = ("file_id", "frame", "time", "count", "x1", "y1", "x2", "y2")
+
+
+def find_videos(paths: Iterable[Path]) -> List[Path]:
+    """
+    動画ファイルとディレクトリ（再帰的に探す）から解析する動画の一覧を作る
+    """
+    videos = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            videos.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in VIDEO_SUFFIXES))
+        else:
+            videos.append(path)
+    return videos
+
+
+def check_output_format(path: Path):
+    """
+    出力ファイルの形式に対応しているか確かめる（解析を始める前に呼ぶ）
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix not in (".npz", ".csv", ".parquet"):
+        raise ValueError(f"対応していない出力形式です: {suffix}")
+    if suffix == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquetで保存するには pyarrow が必要です（.npz か .csv を使ってください）")
+
+
+@dataclass
+class DecodedFrame:
+    """
+    デコード済みの1フレーム
+    """
+    file_id: int
+    index: int
+    time: float
+    frame: numpy.ndarray
+
+
+@dataclass
+class AnalysisStats:
+    """
+    解析の進み具合
+    """
+    files: int = 0
+    files_done: int = 0
+    decoded: int = 0
+    analyzed: int = 0
+    detections: int = 0
+    video_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "files": f"{self.files_done}/{self.files}",
+            "decoded": self.decoded,
+            "analyzed": self.analyzed,
+            "detections": self.detections,
+            "analyzed_fps": self.analyzed / elapsed if elapsed > 0 else 0.0,
+            # 動画の長さに対して何倍の速さで解析できているか
+            "realtime_factor": self.video_seconds / elapsed if elapsed > 0 else 0.0,
+            "elapsed": elapsed,
+        }
+
+
+class DetectionTable:
+    """
+    フレームごとの検出結果を列ごとの配列として貯め、NPZ / CSV / Parquet に書き出すクラス
+    検出が無いフレームも count=0 の1行として残す（ボックスは-1）
+    """
+    def __init__(self, files: List[Path]):
+        self.files = [str(path) for path in files]
+        self._chunks: List[numpy.ndarray] = []
+        self._times: List[numpy.ndarray] = []
+
+    def add(self, file_id: int, index: int, timestamp: float, bboxes: numpy.ndarray):
+        bboxes = numpy.asarray(bboxes, dtype=numpy.int32).reshape(-1, 4)
+        count = len(bboxes)
+        if not count:
+            bboxes = numpy.full((1, 4), -1, dtype=numpy.int32)
+        rows = numpy.empty((len(bboxes), 7), dtype=numpy.int32)
+        rows[:, 0] = file_id
+        rows[:, 1] = index
+        rows[:, 2] = count
+        rows[:, 3:] = bboxes
+        self._chunks.append(rows)
+        self._times.append(numpy.full(len(bboxes), timestamp, dtype=numpy.float64))
+
+    def columns(self) -> dict:
+        rows = numpy.concatenate(self._chunks) if self._chunks else numpy.empty((0, 7), dtype=numpy.int32)
+        times = numpy.concatenate(self._times) if self._times else numpy.empty(0)
+        # ファイル・フレーム順に並べる（複数ファイルを並列にデコードするため到着順はばらばら）
+        order = numpy.lexsort((rows[:, 1], rows[:, 0]))
+        rows, times = rows[order], times[order]
+        return {
+            "file_id": rows[:, 0], "frame": rows[:, 1], "time": times, "count": rows[:, 2],
+            "x1": rows[:, 3], "y1": rows[:, 4], "x2": rows[:, 5], "y2": rows[:, 6],
+        }
+
+    def save(self, path: Path):
+        """
+        拡張子に応じた形式で書き出す（.npz / .csv / .parquet）
+        file_id列はファイル一覧の添字で、一覧は NPZ では files 配列、CSV・Parquet では path 列として保存する
+        """
+        path = Path(path)
+        check_output_format(path)
+        columns = self.columns()
+        suffix = path.suffix.lower()
+        if suffix == ".npz":
+            numpy.savez_compressed(path, files=numpy.array(self.files), **columns)
+        elif suffix == ".csv":
+            with path.open("w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(("path",) + COLUMNS)
+                paths = numpy.array(self.files, dtype=object)[columns["file_id"]] if self.files else []
+                writer.writerows(zip(paths, *(columns[name].tolist() for name in COLUMNS)))
+        else:
+            import pyarrow
+            import pyarrow.parquet
+            table = pyarrow.table({"path": numpy.array(self.files, dtype=object)[columns["file_id"]], **columns})
+            pyarrow.parquet.write_table(table, path)
+
+
+class OfflineAnalyzer:
+    """
+    録画済みの動画を画面に表示せずに解析するクラス
+    複数のファイルを別スレッドで並列にデコードし、stride フレームごとに1枚を取り出して
+    ファイルをまたいで batch_size 枚ずつまとめて推論する
+    """
+    def __init__(
+        self,
+        detector: Any,
+        stride: int = 5,
+        batch_size: int = 8,
+        decode_workers: int = 2,
+        queue_size: int = 64,
+        log_interval: float = 5.0,
+    ):
+        """
+        :param detector: preprocess / predict_batch を持つ検出器
+        :param stride: 何フレームごとに解析するか（1なら全フレーム）
+        :param batch_size: 1回の推論にまとめるフレーム数
+        :param decode_workers: 並列にデコードするファイル数
+        :param queue_size: デコード済みで推論待ちにできるフレーム数
+        :param log_interval: 進み具合をログに出す間隔（秒）
+        """
+        if stride < 1:
+            raise ValueError("stride must be at least 1")
+        self.detector = detector
+        self.stride = stride
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.queue_size = queue_size
+        self.log_interval = log_interval
+        self.stats = AnalysisStats()
+
+    def _decode(self, files, decoded: RingBuffer, lock: threading.Lock):
+        for file_id, path in files:
+            capture = cv2.VideoCapture(str(path))
+            if not capture.isOpened():
+                logger.error(f"動画を開けませんでした: {path}")
+                continue
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            index = 0
+            try:
+                while True:
+                    if index % self.stride:
+                        # 解析しないフレームは色変換（retrieve）を省く
+                        if not capture.grab():
+                            break
+                    else:
+                        ok, frame = capture.read()
+                        if not ok:
+                            break
+                        decoded.put(DecodedFrame(file_id, index, index / fps, frame))
+                        with lock:
+                            self.stats.decoded += 1
+                    index += 1
+            finally:
+                capture.release()
+            with lock:
+                self.stats.files_done += 1
+                self.stats.video_seconds += index / fps
+
+    def run(self, files: List[Path]) -> DetectionTable:
+        """
+        動画を解析し、フレームごとの検出結果を返す
+        :param files: 解析する動画ファイル
+        """
+        table = DetectionTable(files)
+        self.stats = AnalysisStats(files=len(files))
+        decoded = RingBuffer(self.queue_size, DropPolicy.BLOCK, name="decoded")
+        jobs = iter(list(enumerate(files)))
+        lock = threading.Lock()
+
+        def next_file():
+            # 各デコードスレッドは空いたら次のファイルを取る
+            while True:
+                with lock:
+                    job = next(jobs, None)
+                if job is None:
+                    return
+                yield job
+
+        workers = [
+            threading.Thread(target=self._decode, args=(next_file(), decoded, lock), daemon=True)
+            for _ in range(max(1, min(self.decode_workers, len(files))))
+        ]
+        for worker in workers:
+            worker.start()
+        closer = threading.Thread(target=lambda: ([w.join() for w in workers], decoded.close()), daemon=True)
+        closer.start()
+
+        last_log = time.monotonic()
+        while True:
+            batch = [item for item in itertools.islice(iter(lambda: decoded.get(timeout=0.5), None), self.batch_size)]
+            if not batch:
+                if decoded.closed and not len(decoded):
+                    break
+                continue
+            frames = [self.detector.preprocess(item.frame) for item in batch]
+            for item, (_, bboxes) in zip(batch, self.detector.predict_batch(frames)):
+                table.add(item.file_id, item.index, item.time, bboxes)
+                self.stats.detections += len(bboxes)
+            self.stats.analyzed += len(batch)
+            if time.monotonic() - last_log >= self.log_interval:
+                self.log_stats()
+                last_log = time.monotonic()
+        closer.join()
+        self.log_stats()
+        return table
+
+    def log_stats(self):
+        stats = self.stats.as_dict()
+        logger.info(
+            f"ファイル{stats['files']} デコード{stats['decoded']}枚 解析{stats['analyzed']}枚 "
+            f"検出{stats['detections']}件 {stats['analyzed_fps']:.1f}fps "
+            f"実時間の{stats['realtime_factor']:.1f}倍 経過{stats['elapsed']:.1f}秒"
+        )
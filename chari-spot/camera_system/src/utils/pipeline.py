@@ -0,0 +1,317 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy
+from loguru import logger
+
+
+class DropPolicy(str, Enum):
+    """
+    バッファが満杯のときの振る舞い
+    """
+    LATEST = "latest"  # 最も古い要素を捨てて新しい要素を入れる（推論・表示向け）
+    BLOCK = "block"    # 空きができるまで待つ（録画向け、フレームを落とさない）
+
+
+class RingBuffer:
+    """
+    ステージ間をつなぐ固定長のリングバッファ
+    要素の出し入れはdeque（GILの下でアトミック）で行い、ロックは空/満杯で待つときだけ使う
+    """
+    def __init__(self, capacity: int, policy: DropPolicy = DropPolicy.LATEST, name: str = ""):
+        """
+        :param capacity: 保持できる要素数
+        :param policy: 満杯時の振る舞い
+        :param name: ログ・統計用の名前
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.policy = DropPolicy(policy)
+        self.name = name
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._not_empty = threading.Condition()
+        self._not_full = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """
+        要素を追加する
+        :param item: 追加する要素
+        :param timeout: BLOCKのときに待つ最大秒数（Noneなら無制限）
+        :return: 追加できたかどうか（クローズ済み・タイムアウト時はFalse）
+        """
+        if self.closed:
+            return False
+        if self.policy is DropPolicy.LATEST:
+            if len(self._items) >= self.capacity:
+                try:
+                    self._items.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    pass  # 取り出し側が先に空にした
+            self._items.append(item)
+        else:
+            if len(self._items) >= self.capacity:
+                with self._not_full:
+                    if not self._not_full.wait_for(
+                        lambda: len(self._items) < self.capacity or self.closed, timeout
+                    ) or self.closed:
+                        self.dropped += 1
+                        return False
+            self._items.append(item)
+        with self._not_empty:
+            self._not_empty.notify()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        最も古い要素を取り出す
+        :param timeout: 空のときに待つ最大秒数（Noneなら無制限）
+        :return: 要素（タイムアウト、またはクローズ済みで空のときはNone）
+        """
+        try:
+            item = self._items.popleft()
+        except IndexError:
+            with self._not_empty:
+                if not self._not_empty.wait_for(lambda: self._items or self.closed, timeout):
+                    return None
+            try:
+                item = self._items.popleft()
+            except IndexError:
+                return None
+        if self.policy is DropPolicy.BLOCK:
+            with self._not_full:
+                self._not_full.notify()
+        return item
+
+    def close(self):
+        """
+        以降のputを拒否し、待っているスレッドを起こす（残りの要素はgetで取り出せる）
+        """
+        self.closed = True
+        for condition in (self._not_empty, self._not_full):
+            with condition:
+                condition.notify_all()
+
+
+class LatestValue:
+    """
+    最新の値を1つだけ保持する入れ物（参照の差し替えのみなのでロック不要）
+    """
+    def __init__(self, value: Any = None):
+        self.value = value
+        self.updated_at: Optional[float] = None
+
+    def set(self, value: Any):
+        self.value = value
+        self.updated_at = time.monotonic()
+
+    def get(self) -> Any:
+        return self.value
+
+
+@dataclass
+class FramePacket:
+    """
+    パイプラインを流れる1フレーム分のデータ
+    """
+    index: int
+    captured_at: float
+    frame: numpy.ndarray
+    detections: Any = None
+    # 各ステージを通過した時刻（レイテンシ計測用）
+    marks: dict = field(default_factory=dict)
+
+
+@dataclass
+class StageStats:
+    """
+    ステージごとの処理時間と件数
+    """
+    processed: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def record(self, seconds: float):
+        self.processed += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+            "avg_ms": self.total_seconds / self.processed * 1000 if self.processed else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+class Stage:
+    """
+    入力バッファから要素を取り出して処理し、結果を出力バッファ群へ配るスレッド
+    """
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        source: Optional[RingBuffer] = None,
+        outputs: Optional[List[RingBuffer]] = None,
+    ):
+        """
+        :param name: ステージ名
+        :param func: 1要素を処理する関数（Noneを返すと下流へ流さない）
+                     sourceがNoneの場合は引数なしで呼ばれ、要素を生成する
+        :param source: 入力バッファ（Noneならfuncが生成元になる）
+        :param outputs: 結果を配る出力バッファ（ファンアウト）
+        """
+        self.name = name
+        self.func = func
+        self.source = source
+        self.outputs = outputs or []
+        self.stats = StageStats()
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name=f"stage-{name}", daemon=True)
+
+    def start(self):
+        self.running.set()
+        self.stats.started_at = time.monotonic()
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        ステージを止める（入力バッファに残った要素は処理してから終わる）
+        """
+        self.running.clear()
+        if self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def _loop(self):
+        while True:
+            if self.source is None:
+                if not self.running.is_set():
+                    break
+                item = None
+            else:
+                item = self.source.get(timeout=0.1)
+                if item is None:
+                    if self.source.closed or not self.running.is_set():
+                        break
+                    continue
+            started = time.perf_counter()
+            try:
+                result = self.func() if self.source is None else self.func(item)
+            except StopIteration:
+                break
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error(f"ステージ{self.name}でエラーが発生しました: {e}")
+                continue
+            self.stats.record(time.perf_counter() - started)
+            if result is None:
+                continue
+            if isinstance(result, FramePacket):
+                result.marks[self.name] = time.monotonic()
+            for i, output in enumerate(self.outputs):
+                if i and isinstance(result, FramePacket):
+                    # 下流のステージが属性を書き換えても他の出力先に影響しないよう、2つ目以降には別のパケットを渡す
+                    # （frame の配列は共有するので、書き換える場合はコピーに描く）
+                    output.put(replace(result, marks=dict(result.marks)))
+                else:
+                    output.put(result)
+        # 下流のステージに終わりを伝える
+        for output in self.outputs:
+            output.close()
+
+
+class Pipeline:
+    """
+    ステージとバッファをまとめて起動・停止し、統計を集めるクラス
+    """
+    def __init__(self, name: str = ""):
+        """
+        :param name: ログに付ける名前（複数カメラのときはカメラごとに付ける）
+        """
+        self.name = name
+        self.stages: List[Stage] = []
+        self.buffers: List[RingBuffer] = []
+        self.reporters: Dict[str, Callable[[], dict]] = {}
+
+    def buffer(self, name: str, capacity: int, policy: DropPolicy) -> RingBuffer:
+        """
+        バッファを作成して登録する
+        """
+        ring = RingBuffer(capacity, policy, name=name)
+        self.buffers.append(ring)
+        return ring
+
+    def stage(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        source: Optional[RingBuffer] = None,
+        outputs: Optional[List[RingBuffer]] = None,
+    ) -> Stage:
+        """
+        ステージを作成して登録する
+        """
+        stage = Stage(name, func, source=source, outputs=outputs)
+        self.stages.append(stage)
+        return stage
+
+    def add_stats(self, name: str, reporter: Callable[[], dict]):
+        """
+        ステージ以外（動き検出ゲートなど）の統計をログ・stats()に含める
+        :param name: 統計の名前
+        :param reporter: 統計のdictを返す関数
+        """
+        self.reporters[name] = reporter
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        上流から順に止める（各ステージは入力が閉じられると残りを処理して終わる）
+        """
+        for stage in self.stages:
+            stage.stop(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "stages": {stage.name: stage.stats.as_dict() for stage in self.stages},
+            "buffers": {
+                ring.name: {"size": len(ring), "capacity": ring.capacity, "dropped": ring.dropped}
+                for ring in self.buffers
+            },
+            "extra": {name: reporter() for name, reporter in self.reporters.items()},
+        }
+
+    def log_stats(self):
+        prefix = f"{self.name}/" if self.name else ""
+        all_stats = self.stats()
+        for name, stats in all_stats["stages"].items():
+            logger.info(
+                f"[{prefix}{name}] {stats['processed']}件 {stats['fps']:.1f}fps "
+                f"平均{stats['avg_ms']:.1f}ms 最大{stats['max_ms']:.1f}ms エラー{stats['errors']}件"
+            )
+        for name, stats in all_stats["buffers"].items():
+            logger.info(f"[{prefix}{name}] {stats['size']}/{stats['capacity']} 破棄{stats['dropped']}件")
+        for name, stats in all_stats["extra"].items():
+            values = " ".join(f"{key}={value:.3g}" if isinstance(value, float) else f"{key}={value}"
+                              for key, value in stats.items())
+            logger.info(f"[{prefix}{name}] {values}")
@@ -0,0 +1,245 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy
+from loguru import logger
+
+from utils.bicycle_detector import BicycleDetector
+
+
+def _frame_view(buffer, slot: int, slot_bytes: int, height: int, width: int) -> numpy.ndarray:
+    """
+    共有メモリ上のスロットをコピーせずに (height, width, 3) の配列として見る
+    """
+    return numpy.ndarray((height, width, 3), dtype=numpy.uint8, buffer=buffer, offset=slot * slot_bytes)
+
+
+def _worker_main(
+    shm_name: str,
+    slot_bytes: int,
+    requests,
+    responses,
+    detector_factory: Callable[..., Any],
+    detector_kwargs: dict,
+):
+    """
+    推論プロセスの本体。モデルはこのプロセスだけが持つ
+    :param shm_name: フレームを置く共有メモリの名前
+    :param slot_bytes: 1スロットのバイト数
+    :param requests: (seq, [(slot, height, width), ...]) を受け取るキュー（Noneで終了）
+    :param responses: (seq, 結果のリスト, エラー文字列) を返すキュー
+    :param detector_factory: predict_batch を持つ検出器を作る関数
+    :param detector_kwargs: detector_factory に渡す引数
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            detector = detector_factory(**detector_kwargs)
+        except Exception as e:
+            responses.put((None, None, repr(e)))
+            return
+        responses.put((None, None, None))  # 準備完了
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            seq, entries = message
+            frames = [_frame_view(shm.buf, slot, slot_bytes, height, width) for slot, height, width in entries]
+            try:
+                responses.put((seq, detector.predict_batch(frames), None))
+            except Exception as e:
+                responses.put((seq, None, repr(e)))
+            finally:
+                del frames
+    finally:
+        shm.close()
+
+
+class ProcessDetector:
+    """
+    推論を別プロセスで行う検出器（BicycleDetector と同じ predict / predict_batch を持つ）
+    フレームは共有メモリ上のリングバッファに1回書き込むだけで渡し、推論プロセスはコピーせずに読む
+    後処理を含むPythonの処理は推論プロセスで行われるため、キャプチャ・描画・録画とGILを取り合わない
+    """
+    preprocess = staticmethod(BicycleDetector.preprocess)
+    draw_boxes = staticmethod(BicycleDetector.draw_boxes)
+
+    def __init__(
+        self,
+        max_height: int,
+        max_width: int,
+        slots: int = 8,
+        detector_factory: Callable[..., Any] = BicycleDetector,
+        detector_kwargs: Optional[dict] = None,
+        start_timeout: float = 120.0,
+        timeout: Optional[float] = 30.0,
+    ):
+        """
+        :param max_height: 受け付けるフレームの最大の高さ
+        :param max_width: 受け付けるフレームの最大の幅
+        :param slots: リングバッファのスロット数（同時に推論待ちにできるフレーム数）
+        :param detector_factory: 推論プロセスで検出器を作る関数（pickle可能なトップレベルの関数・クラス）
+        :param detector_kwargs: detector_factory に渡す引数
+        :param start_timeout: モデルの読み込みを待つ最大秒数
+        :param timeout: predict / predict_batch で結果を待つ既定の最大秒数（Noneなら無制限）
+        """
+        self.max_height = max_height
+        self.max_width = max_width
+        self.slots = slots
+        self.slot_bytes = max_height * max_width * 3
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        # torchのスレッドを引き継がないようspawnで起動する
+        context = multiprocessing.get_context("spawn")
+        self.requests = context.Queue()
+        self.responses = context.Queue()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.shm.name, self.slot_bytes, self.requests, self.responses,
+                  detector_factory, detector_kwargs or {}),
+            name="bicycle-detector",
+            daemon=True,
+        )
+        self._seq = itertools.count()
+        # 空きスロットの数。スロットはリング順に割り当て、推論プロセスも依頼順に処理するので順に空く
+        self._free_slots = threading.Semaphore(slots)
+        self._next_slot = 0
+        self._submit_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[Future, int]] = {}
+        self._pending_lock = threading.Lock()
+        # 推論プロセスが異常終了したときのエラー（以降の依頼はすぐにこのエラーで失敗させる）
+        self.dead: Optional[RuntimeError] = None
+        self._stopping = False
+        self._reader = threading.Thread(target=self._read_responses, name="bicycle-detector-reader", daemon=True)
+
+    def start(self):
+        """
+        推論プロセスを起動し、モデルの読み込みが終わるまで待つ
+        """
+        self.process.start()
+        try:
+            _, _, error = self.responses.get(timeout=self.start_timeout)
+        except queue.Empty:
+            self.stop()
+            raise RuntimeError("推論プロセスの起動がタイムアウトしました")
+        if error is not None:
+            self.stop()
+            raise RuntimeError(f"推論プロセスでモデルを読み込めませんでした: {error}")
+        self._reader.start()
+        logger.info(f"推論プロセスを起動しました: pid={self.process.pid}")
+
+    def stop(self):
+        """
+        推論プロセスを止め、共有メモリを解放する
+        """
+        self._stopping = True
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        # 異常終了した推論プロセスがキューのロックを持ったままの場合があるので、終了時にキューを書き切るのを待たない
+        self.requests.cancel_join_thread()
+        self.responses.cancel_join_thread()
+        if self._reader.is_alive():
+            self._reader.join(timeout=2.0)
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future, _ in pending.values():
+            future.cancel()
+        self.shm.close()
+        self.shm.unlink()
+
+    def submit_batch(self, frames: List[numpy.ndarray]) -> Future:
+        """
+        フレームを共有メモリに書き込み、推論を依頼する
+        :param frames: preprocess済みのフレーム（slots枚以下）
+        :return: フレームと同じ順の結果のリストが入るFuture
+        """
+        if len(frames) > self.slots:
+            raise ValueError(f"1回に依頼できるのは{self.slots}フレームまでです")
+        for frame in frames:
+            if frame.shape[0] > self.max_height or frame.shape[1] > self.max_width:
+                raise ValueError(f"フレームが大きすぎます: {frame.shape}")
+        if self.dead is not None:
+            raise self.dead
+        future = Future()
+        with self._submit_lock:
+            acquired = 0
+            while acquired < len(frames):
+                # 推論プロセスが終了するとスロットは空かないので、待つ間も確認する
+                if self._free_slots.acquire(timeout=0.5):
+                    acquired += 1
+                elif self.dead is not None:
+                    self._release_slots(acquired)
+                    raise self.dead
+            entries = []
+            for frame in frames:
+                slot = self._next_slot
+                self._next_slot = (slot + 1) % self.slots
+                height, width = frame.shape[:2]
+                _frame_view(self.shm.buf, slot, self.slot_bytes, height, width)[...] = frame
+                entries.append((slot, height, width))
+            seq = next(self._seq)
+            with self._pending_lock:
+                # 読み取りスレッドが終了を検知した後に依頼すると結果が返らないので、同じロックの中で確認する
+                if self.dead is not None:
+                    self._release_slots(acquired)
+                    raise self.dead
+                self._pending[seq] = (future, len(frames))
+            self.requests.put((seq, entries))
+        return future
+
+    def predict_batch(self, frames: List[numpy.ndarray], timeout: Optional[float] = None) -> List[Any]:
+        """
+        複数フレームを推論プロセスでまとめて処理する（結果を待つ間GILは解放される）
+        :param timeout: 結果を待つ最大秒数（Noneなら初期化時の timeout）
+        """
+        return self.submit_batch(frames).result(timeout=self.timeout if timeout is None else timeout)
+
+    def predict(self, frame: numpy.ndarray, timeout: Optional[float] = None) -> Any:
+        """
+        1フレームを推論プロセスで処理する
+        """
+        return self.predict_batch([frame], timeout=timeout)[0]
+
+    def _release_slots(self, count: int):
+        for _ in range(count):
+            self._free_slots.release()
+
+    def _read_responses(self):
+        while True:
+            try:
+                seq, results, error = self.responses.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping:
+                    break
+                if self.process.is_alive():
+                    continue
+                self._fail_pending(RuntimeError(f"推論プロセスが終了しました: exitcode={self.process.exitcode}"))
+                break
+            with self._pending_lock:
+                future, used_slots = self._pending.pop(seq)
+            self._release_slots(used_slots)
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(results)
+
+    def _fail_pending(self, error: RuntimeError):
+        """
+        推論プロセスが終了したとき、結果を待っている依頼をすべて失敗させてスロットを空ける
+        """
+        logger.error(f"{error}（以降の推論は失敗します）")
+        with self._pending_lock:
+            self.dead = error
+            pending, self._pending = self._pending, {}
+        for future, used_slots in pending.values():
+            self._release_slots(used_slots)
+            future.set_exception(error)
@@ -0,0 +1,182 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy
+from pydantic import BaseModel, Field
+
+
+class SlotConfig(BaseModel):
+    """
+    1台分の駐輪スロットの範囲
+    """
+    slot_id: int = Field(description="スロットの番号（バックエンドの slot_id）")
+    polygon: List[Tuple[float, float]] = Field(
+        min_length=3, description="スロットの範囲の頂点 (x, y)（キャプチャ後のフレームの座標）"
+    )
+
+
+class CameraSlotsConfig(BaseModel):
+    """
+    1台のカメラに映るスロットと判定のパラメータ
+    """
+    spot_id: int = Field(description="駐輪場のID（バックエンドの spot_id）")
+    slots: List[SlotConfig] = Field(default_factory=list, description="カメラに映るスロット")
+    occupied_after: float = Field(default=2.0, description="駐輪とみなすまで自転車が映り続ける秒数")
+    vacant_after: float = Field(default=5.0, description="空きとみなすまで自転車が映らない秒数")
+    iou_threshold: float = Field(default=0.3, description="接地点が範囲外でもスロットに割り当てるIoU")
+
+
+class SlotsFile(BaseModel):
+    """
+    スロット設定ファイル（JSON）の形式
+    {"cameras": {"0": {"spot_id": 1, "slots": [{"slot_id": 0, "polygon": [[x, y], ...]}]}}}
+    """
+    cameras: Dict[int, CameraSlotsConfig] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "SlotsFile":
+        return cls.model_validate_json(Path(path).read_text(encoding="utf-8"))
+
+
+@dataclass(frozen=True)
+class SlotEvent:
+    """
+    スロットの状態が変わったことを表すイベント
+    """
+    spot_id: int
+    slot_id: int
+    parked: bool
+    timestamp: float
+
+
+class SlotTracker:
+    """
+    検出した自転車をスロットに割り当て、スロットごとの駐輪/空きをデバウンスして追跡するクラス
+    割り当ては全ボックス×全スロットをNumPyで一度に計算する
+    """
+    def __init__(self, config: CameraSlotsConfig):
+        """
+        :param config: カメラのスロット設定
+        """
+        self.config = config
+        self.slot_ids = numpy.array([slot.slot_id for slot in config.slots], dtype=numpy.int64)
+        # 頂点数の違う多角形は最後の頂点を繰り返して (S, V, 2) にそろえる（長さ0の辺は交差判定に影響しない）
+        max_vertices = max((len(slot.polygon) for slot in config.slots), default=3)
+        self.polygons = numpy.zeros((len(config.slots), max_vertices, 2), dtype=numpy.float64)
+        for i, slot in enumerate(config.slots):
+            points = numpy.asarray(slot.polygon, dtype=numpy.float64)
+            self.polygons[i, :len(points)] = points
+            self.polygons[i, len(points):] = points[-1]
+        # IoU用の外接矩形 (S, 4)
+        self.slot_rects = numpy.concatenate([self.polygons.min(axis=1), self.polygons.max(axis=1)], axis=1)
+        self.occupied = numpy.zeros(len(config.slots), dtype=bool)
+        # 観測が現在の状態と食い違い始めた時刻（食い違っていなければNaN）
+        self.pending_since = numpy.full(len(config.slots), numpy.nan)
+
+    def __len__(self) -> int:
+        return len(self.slot_ids)
+
+    def contains(self, points: numpy.ndarray) -> numpy.ndarray:
+        """
+        各点が各スロットの多角形の内側にあるか（交差数判定）
+        :param points: (B, 2) の点
+        :return: (B, S) のbool配列
+        """
+        px = points[:, 0, None, None]
+        py = points[:, 1, None, None]
+        xi, yi = self.polygons[None, :, :, 0], self.polygons[None, :, :, 1]
+        xj = numpy.roll(self.polygons[:, :, 0], 1, axis=1)[None]
+        yj = numpy.roll(self.polygons[:, :, 1], 1, axis=1)[None]
+        straddles = (yi > py) != (yj > py)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            cross_x = (xj - xi) * (py - yi) / (yj - yi) + xi
+        crossings = straddles & (px < cross_x)
+        return (crossings.sum(axis=2) % 2).astype(bool)
+
+    def iou(self, boxes: numpy.ndarray) -> numpy.ndarray:
+        """
+        各ボックスと各スロットの外接矩形のIoU
+        :param boxes: (B, 4) の x1, y1, x2, y2
+        :return: (B, S) の配列
+        """
+        rects = self.slot_rects[None]
+        boxes = boxes[:, None]
+        ix1 = numpy.maximum(boxes[..., 0], rects[..., 0])
+        iy1 = numpy.maximum(boxes[..., 1], rects[..., 1])
+        ix2 = numpy.minimum(boxes[..., 2], rects[..., 2])
+        iy2 = numpy.minimum(boxes[..., 3], rects[..., 3])
+        inter = numpy.clip(ix2 - ix1, 0, None) * numpy.clip(iy2 - iy1, 0, None)
+        box_area = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+        rect_area = (rects[..., 2] - rects[..., 0]) * (rects[..., 3] - rects[..., 1])
+        union = box_area + rect_area - inter
+        return numpy.divide(inter, union, out=numpy.zeros_like(inter), where=union > 0)
+
+    def assign(self, boxes) -> numpy.ndarray:
+        """
+        各ボックスを1つのスロットに割り当てる
+        接地点（下辺の中点）が多角形内にあるスロットを優先し、なければIoUがしきい値以上のスロットを選ぶ
+        :param boxes: (B, 4) の x1, y1, x2, y2（リストでもよい）
+        :return: (B,) のスロットの添字（割り当てなしは-1）
+        """
+        boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+        if not len(boxes) or not len(self):
+            return numpy.full(len(boxes), -1, dtype=numpy.int64)
+        anchors = numpy.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+        inside = self.contains(anchors)
+        iou = self.iou(boxes)
+        score = numpy.where(inside, 1.0 + iou, numpy.where(iou >= self.config.iou_threshold, iou, 0.0))
+        best = score.argmax(axis=1)
+        return numpy.where(score[numpy.arange(len(boxes)), best] > 0, best, -1)
+
+    def observe(self, boxes) -> numpy.ndarray:
+        """
+        このフレームで自転車が映っているスロット
+        :param boxes: (B, 4) の x1, y1, x2, y2
+        :return: (S,) のbool配列
+        """
+        assignment = self.assign(boxes)
+        observed = numpy.zeros(len(self), dtype=bool)
+        observed[assignment[assignment >= 0]] = True
+        return observed
+
+    def update(self, observed: numpy.ndarray, now: float) -> List[SlotEvent]:
+        """
+        観測を状態に反映し、状態が変わったスロットのイベントを返す
+        駐輪は occupied_after 秒、空きは vacant_after 秒続けて観測されたときに確定する
+        :param observed: observe() の結果
+        :param now: 観測した時刻（秒）
+        """
+        differs = observed != self.occupied
+        self.pending_since[~differs] = numpy.nan
+        starting = differs & numpy.isnan(self.pending_since)
+        self.pending_since[starting] = now
+        wait = numpy.where(self.occupied, self.config.vacant_after, self.config.occupied_after)
+        flipped = differs & (now - self.pending_since >= wait)
+        if not flipped.any():
+            return []
+        self.occupied[flipped] = ~self.occupied[flipped]
+        self.pending_since[flipped] = numpy.nan
+        return [
+            SlotEvent(
+                spot_id=self.config.spot_id,
+                slot_id=int(self.slot_ids[i]),
+                parked=bool(self.occupied[i]),
+                timestamp=now,
+            )
+            for i in numpy.flatnonzero(flipped)
+        ]
+
+    def draw(self, frame: numpy.ndarray, observed: Optional[numpy.ndarray] = None):
+        """
+        スロットの範囲を状態に応じた色で描画する（駐輪: 赤, 空き: 緑, 判定待ち: 黄）
+        """
+        for i, polygon in enumerate(self.polygons):
+            if self.occupied[i]:
+                color = (0, 0, 255)
+            elif observed is not None and observed[i]:
+                color = (0, 255, 255)
+            else:
+                color = (0, 255, 0)
+            cv2.polylines(frame, [polygon.astype(numpy.int32)], True, color, 2)
@@ -1,5 +1,10 @@
-import cv2
+import subprocess
 from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy
+from loguru import logger
 
 class VideoRecorder:
     """
@@ -7,13 +12,69 @@ class VideoRecorder:
     """
     def __init__(self, session_dir: Path, video_name: str, width: int, height: int, fps: float = 20.0):
         self.video_writer = self._create_writer(session_dir / video_name, width, height, fps)
-    
+
     def _create_writer(self, path, width, height, fps):
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         return cv2.VideoWriter(str(path), fourcc, fps, (width, height))
-    
+
     def write_frames(self, frame):
         self.video_writer.write(frame)
-    
+
     def release(self):
-        self.video_writer.release()
\ No newline at end of file
+        self.video_writer.release()
+
+
+class FfmpegVideoRecorder:
+    """
+    フレームをffmpegのサブプロセスにパイプで渡して録画するクラス
+    エンコードは別プロセスで行われるため、Pythonプロセスのスレッドは書き込みを待つだけになる
+    codec に h264_v4l2m2m（Raspberry Pi）や h264_nvenc などを指定するとハードウェアでエンコードする
+    """
+    def __init__(
+        self,
+        session_dir: Path,
+        video_name: str,
+        width: int,
+        height: int,
+        fps: float = 20.0,
+        codec: str = "libx264",
+        output_args: Optional[List[str]] = None,
+        ffmpeg_path: str = "ffmpeg",
+    ):
+        """
+        :param codec: ffmpegの映像エンコーダ
+        :param output_args: エンコーダに渡す追加の引数（Noneなら libx264 向けの既定値）
+        :param ffmpeg_path: ffmpegの実行ファイル
+        """
+        if output_args is None:
+            output_args = ["-preset", "veryfast", "-crf", "23"] if codec == "libx264" else []
+        self.path = session_dir / video_name
+        self.process = subprocess.Popen(
+            [
+                ffmpeg_path, "-loglevel", "error", "-nostats", "-y",
+                "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:g}", "-i", "-",
+                "-c:v", codec, *output_args, "-pix_fmt", "yuv420p", str(self.path),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+    def write_frames(self, frame):
+        try:
+            self.process.stdin.write(numpy.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpegが終了しています: {self._stderr()}")
+
+    def release(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.process.wait(timeout=30) != 0:
+            logger.error(f"ffmpegがエラーで終了しました（{self.path}）: {self._stderr()}")
+
+    def _stderr(self) -> str:
+        if self.process.poll() is None:
+            return ""
+        return self.process.stderr.read().decode(errors="replace").strip()
@@ -0,0 +1,122 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from utils.event_publisher import EventPublisher, PublisherConfig
+from utils.slot_occupancy import SlotEvent
+
+pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+TOKEN = "test-token"
+
+
+class StandIn:
+    """Minimal stand-in for the backend's POST /payments/batch that records every request."""
+    def __init__(self):
+        from fastapi import FastAPI, HTTPException, Request
+
+        self.state = {}
+        self.batches = []
+        self.unavailable = False
+        app = FastAPI()
+
+        @app.post("/payments/batch")
+        async def update_batch(request: Request):
+            if self.unavailable:
+                raise HTTPException(status_code=503, detail="Service Unavailable")
+            if request.headers.get("authorization") != f"Bearer {TOKEN}":
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            body = await request.body()
+            content_type = request.headers.get("content-type", "")
+            if content_type.startswith("application/x-ndjson"):
+                events = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                events = json.loads(body)
+            self.batches.append((content_type, events))
+            for event in events:
+                self.state[(event["spot_id"], event["slot_id"])] = event["parked"]
+            return {"applied": len(events), "failed": 0,
+                    "results": [{"index": i, "ok": True} for i in range(len(events))]}
+
+        self.app = app
+
+
+@pytest.fixture
+def backend():
+    import uvicorn
+
+    stand_in = StandIn()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stand_in.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    stand_in.url = f"http://127.0.0.1:{port}"
+    yield stand_in
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def wait_until(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def event(slot_id: int, parked: bool) -> SlotEvent:
+    return SlotEvent(spot_id=1, slot_id=slot_id, parked=parked, timestamp=time.monotonic())
+
+
+def test_events_for_the_same_slot_are_coalesced(backend, tmp_path):
+    # A long flush interval keeps everything pending until stop() flushes it
+    publisher = EventPublisher(PublisherConfig(
+        base_url=backend.url, token=TOKEN, flush_interval=60.0, spool_dir=tmp_path
+    )).start()
+    publisher.publish([event(1, True), event(2, True)])
+    publisher.publish([event(1, False)])
+    publisher.publish([event(1, True)])
+    publisher.stop()
+
+    assert len(backend.batches) == 1
+    content_type, events = backend.batches[0]
+    assert content_type.startswith("application/json")
+    assert sorted((e["slot_id"], e["parked"]) for e in events) == [(1, True), (2, True)]
+    assert publisher.stats.received == 4
+    assert publisher.stats.coalesced == 2
+    assert publisher.stats.sent == 2
+
+
+def test_events_are_spooled_during_an_outage_and_replayed_after_it(backend, tmp_path):
+    backend.unavailable = True
+    publisher = EventPublisher(PublisherConfig(
+        base_url=backend.url, token=TOKEN, flush_interval=0.05,
+        backoff_initial=0.05, backoff_max=0.2, spool_dir=tmp_path,
+    )).start()
+    try:
+        publisher.publish([event(1, True)])
+        assert wait_until(lambda: any(tmp_path.glob("*.ndjson")))
+        publisher.publish([event(2, True)])
+        assert wait_until(lambda: publisher.stats.spooled >= 2)
+        assert backend.batches == []
+
+        backend.unavailable = False
+        assert wait_until(lambda: backend.state == {(1, 1): True, (1, 2): True} and not any(tmp_path.glob("*")))
+        # The spool went out as NDJSON, oldest first
+        content_type, events = backend.batches[0]
+        assert content_type.startswith("application/x-ndjson")
+        assert events[0]["slot_id"] == 1
+        assert publisher.stats.failures >= 1
+        assert publisher.stats.sent == 2
+    finally:
+        publisher.stop()
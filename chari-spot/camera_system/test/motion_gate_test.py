@@ -0,0 +1,36 @@
+import numpy
+
+from utils.motion_gate import MotionGate
+
+
+def frame(fill: int = 100) -> numpy.ndarray:
+    return numpy.full((240, 320, 3), fill, dtype=numpy.uint8)
+
+
+def test_static_frames_are_skipped_until_the_keyframe_interval():
+    gate = MotionGate(keyframe_interval=5.0)
+    # Nothing to compare against yet
+    assert gate.should_infer(frame(), now=0.0)
+    assert [gate.should_infer(frame(), now=now) for now in (1.0, 2.5, 4.9)] == [False, False, False]
+    assert gate.should_infer(frame(), now=5.0)
+    assert not gate.should_infer(frame(), now=6.0)
+    stats = gate.stats.as_dict()
+    assert (stats["frames"], stats["triggered"], stats["keyframes"], stats["skipped"]) == (6, 1, 1, 4)
+
+
+def test_only_changes_inside_the_roi_trigger_inference():
+    gate = MotionGate(roi=(0, 0, 160, 120), keyframe_interval=0)
+    assert gate.should_infer(frame(), now=0.0)
+
+    outside = frame()
+    outside[140:240, 180:320] = 255
+    assert not gate.should_infer(outside, now=1.0)
+    assert gate.last_score == 0.0
+
+    inside = frame()
+    inside[20:80, 40:120] = 255
+    assert gate.should_infer(inside, now=2.0)
+    assert gate.last_score >= gate.threshold
+    # The changed frame is the new reference, so the same view does not trigger again
+    assert not gate.should_infer(inside, now=3.0)
+    assert gate.stats.triggered == 2
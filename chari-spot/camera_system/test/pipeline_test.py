@@ -0,0 +1,88 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+from app.main import App
+from utils.bicycle_detector import BicycleDetector
+from utils.slot_occupancy import CameraSlotsConfig, SlotConfig, SlotTracker
+
+FRAMES = 30
+BOX = numpy.array([[10, 10, 60, 60]], dtype=numpy.float32)
+
+
+class StubCamera:
+    """Yields black frames, then reports the capture as closed."""
+    fps = 30.0
+
+    def __init__(self):
+        self.remaining = FRAMES
+        self.captured_at = 0.0
+        self.capture = SimpleNamespace(isOpened=lambda: self.remaining > 0)
+
+    def get_frames(self):
+        self.remaining -= 1
+        self.captured_at = time.monotonic()
+        time.sleep(0.005)
+        return numpy.zeros((120, 160, 3), dtype=numpy.uint8)
+
+
+class StubDetector:
+    """Records the pixel sum of every frame it is asked to detect on."""
+    preprocess = staticmethod(BicycleDetector.preprocess)
+    draw_boxes = staticmethod(BicycleDetector.draw_boxes)
+
+    def __init__(self):
+        self.sums = []
+        self.lock = threading.Lock()
+
+    def predict(self, frame):
+        with self.lock:
+            self.sums.append(int(frame.sum()))
+        # annotate runs while detection is slow, so it draws on frames the infer stage has not read yet
+        time.sleep(0.02)
+        return True, BOX
+
+
+class StubRecorder:
+    def __init__(self):
+        self.stats = SimpleNamespace(as_dict=dict)
+        self.sums = []
+
+    def trigger(self, ts):
+        pass
+
+    def write_frames(self, frame, ts):
+        self.sums.append(int(frame.sum()))
+
+
+def run_pipeline(slot_tracker):
+    detector, recorder = StubDetector(), StubRecorder()
+    app = App.model_construct()
+    pipeline, display = app.build_pipeline(
+        detector, camera_manager=StubCamera(), video_recorder=recorder, slot_tracker=slot_tracker
+    )
+    pipeline.start()
+    deadline = time.monotonic() + 10
+    while not display.closed and time.monotonic() < deadline:
+        display.get(timeout=0.1)
+    pipeline.stop()
+    return detector, recorder
+
+
+@pytest.mark.parametrize("with_slots", [False, True])
+def test_predict_receives_frames_without_annotations(with_slots):
+    slot_tracker = None
+    if with_slots:
+        slot_tracker = SlotTracker(CameraSlotsConfig(
+            spot_id=1, slots=[SlotConfig(slot_id=0, polygon=[(0, 0), (80, 0), (80, 80), (0, 80)])],
+            occupied_after=60.0,
+        ))
+    detector, recorder = run_pipeline(slot_tracker)
+
+    assert detector.sums
+    assert all(total == 0 for total in detector.sums)
+    # the recorded frames do carry the boxes (and polygons)
+    assert any(total > 0 for total in recorder.sums)
@@ -0,0 +1,34 @@
+import os
+import time
+
+import numpy
+import pytest
+
+from utils.process_detector import ProcessDetector
+
+
+class CrashingDetector:
+    """Exits the worker process without answering when it sees a non-black frame."""
+    def predict_batch(self, frames):
+        if any(frame.any() for frame in frames):
+            os._exit(3)
+        return [(False, numpy.zeros((0, 4)))] * len(frames)
+
+
+def test_pending_and_later_requests_fail_when_the_worker_dies():
+    detector = ProcessDetector(32, 32, slots=2, detector_factory=CrashingDetector, start_timeout=60.0)
+    detector.start()
+    try:
+        black = numpy.zeros((32, 32, 3), dtype=numpy.uint8)
+        assert detector.predict(black)[0] is False
+
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="exitcode=3"):
+            detector.predict(numpy.full_like(black, 255), timeout=None)
+        assert time.monotonic() - started < 10
+        # The slots were released and new requests fail right away instead of blocking
+        for _ in range(3):
+            with pytest.raises(RuntimeError, match="exitcode=3"):
+                detector.predict_batch([black, black])
+    finally:
+        detector.stop()
@@ -0,0 +1,63 @@
+import numpy
+
+from utils.slot_occupancy import CameraSlotsConfig, SlotConfig, SlotEvent, SlotTracker
+
+SQUARE = [(0, 0), (100, 0), (100, 100), (0, 100)]
+BIKE = [(20, 20, 80, 90)]
+
+
+def tracker(*polygons, **params) -> SlotTracker:
+    return SlotTracker(CameraSlotsConfig(
+        spot_id=7,
+        slots=[SlotConfig(slot_id=10 + i, polygon=polygon) for i, polygon in enumerate(polygons)],
+        **params,
+    ))
+
+
+def test_slot_becomes_vacant_only_after_vacant_after():
+    slots = tracker(SQUARE, occupied_after=2.0, vacant_after=5.0)
+    assert slots.update(slots.observe(BIKE), now=0.0) == []
+    assert slots.update(slots.observe(BIKE), now=2.0) == [SlotEvent(spot_id=7, slot_id=10, parked=True, timestamp=2.0)]
+
+    # The bicycle is gone from t=3; the slot stays occupied for vacant_after seconds
+    for now in (3.0, 5.0, 7.9):
+        assert slots.update(slots.observe([]), now=now) == []
+        assert slots.occupied[0]
+    assert slots.update(slots.observe([]), now=8.0) == [SlotEvent(spot_id=7, slot_id=10, parked=False, timestamp=8.0)]
+    assert not slots.occupied[0]
+    assert numpy.isnan(slots.pending_since[0])
+
+
+def test_flicker_shorter_than_occupied_after_resets_the_timer():
+    slots = tracker(SQUARE, occupied_after=2.0, vacant_after=5.0)
+    assert slots.update(slots.observe(BIKE), now=0.0) == []
+    assert slots.pending_since[0] == 0.0
+    # One frame without the bicycle cancels the pending change
+    assert slots.update(slots.observe([]), now=1.5) == []
+    assert numpy.isnan(slots.pending_since[0])
+
+    # The timer starts over, so 2 s after the first sighting is not enough
+    assert slots.update(slots.observe(BIKE), now=2.0) == []
+    assert slots.pending_since[0] == 2.0
+    assert slots.update(slots.observe(BIKE), now=3.9) == []
+    assert not slots.occupied[0]
+    [event] = slots.update(slots.observe(BIKE), now=4.0)
+    assert (event.slot_id, event.parked) == (10, True)
+
+
+def test_ground_point_inside_a_polygon_wins_over_higher_iou():
+    # The box almost covers slot 10, but its bottom-center (50, 100) stands in the small slot 11 below
+    slots = tracker(
+        [(0, 0), (100, 0), (100, 90), (0, 90)],
+        [(40, 95), (60, 95), (50, 110)],
+        iou_threshold=0.3,
+    )
+    box = numpy.array([[0, 0, 100, 100]], dtype=numpy.float64)
+    assert slots.iou(box)[0, 0] > 0.8 > slots.iou(box)[0, 1]
+    assert slots.contains(numpy.array([[50.0, 100.0]])).tolist() == [[False, True]]
+    assert slots.assign(box).tolist() == [1]
+    assert slots.observe(box).tolist() == [False, True]
+
+    # Without a containing polygon the box falls back to IoU, and below the threshold to no slot
+    assert slots.assign([[0, 0, 100, 92]]).tolist() == [0]
+    assert slots.assign([[200, 200, 220, 220]]).tolist() == [-1]